@@ -1,70 +1,93 @@
-import os, json
+import os, logging, contextlib, functools, time
 import backtrader as bt
-from backtrader.feeds import GenericCSVData
-from datetime import datetime, timedelta
-from utils.commission import GenericCommInfo
-import matplotlib.pyplot as plt
-from backtrader import TimeFrame
-import seaborn as sns
-import numpy as np
-from matplotlib.ticker import FormatStrFormatter
+from datetime import datetime
+from utils.commission import GenericCommInfo, load_commission
+from utils.indicator_cache import INDICATOR_CACHE
+from utils.analytics import add_analyzers, analyzer_metrics
+from utils.store import BarStore, BarStoreData, ensure_store, period_timeframe
+from utils.results import ResultStore, RunCache, data_fingerprint, param_key
+from utils.logger import get_logger, quiet
+
+# matplotlib 只在绘图方法中导入，无界面批量运行不加载绘图库
+LOG = get_logger('backtest')
+
+
+def _headless(method):
+    """headless 时方法执行期间日志只保留 WARNING 及以上，结束后恢复，不影响同进程的其他 BackTester"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with quiet(self.headless):
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class BackTester():
     def __init__(self, name: str, 
                  symbol: str, 
                  period: str, 
                  beginning: datetime, end: datetime, 
-                 cash=10000):
+                 cash=10000, headless=False, fill_model=None, profile=None, cache=None):
+        """
+        Args:
+            headless (bool, optional): 无界面批量模式：不绘图，策略与优化过程日志只保留 WARNING 及以上
+            fill_model (FillModel, optional): 滑点与成交量限制，缺省为 BackBroker 默认撮合
+            profile (Profiler | bool, optional): 性能剖析（见 utils.profiling），True 为只计时；缺省不启用
+            cache (RunCache | bool, optional): 单次回测结果缓存，True 为默认路径的 RunCache；缺省不启用
+        """
         self.name = name
         self.symbol = symbol
         self.period = period
         self.beginning = beginning
         self.end = end
+        self.headless = headless
         
         self.cerebro = bt.Cerebro()
+        self.fill_model = fill_model
+        if fill_model is not None:
+            from utils.fills import FillBroker
+            self.cerebro.broker = FillBroker(fillmodel=fill_model)
         self.cash = cash
         self.comm ={}
         self.contract_specs = {}
-        self._setup()
+        self.results = ResultStore()  # 优化结果库，逐组合写入，可断点续跑
+        self._fingerprint = None
+        self._recorder_added = False
+        self.record = None  # 最近一次 run() 的 RunRecord
+        self.cache = RunCache() if cache is True else (cache or None)
+        self._strategies = []  # add_strategy 添加的 (策略类, 参数)，用于结果缓存的键
+        if profile is True:
+            from utils.profiling import Profiler
+            profile = Profiler()
+        self.profiler = profile or None
+        with quiet(headless):
+            self._setup()
         
         
     def _setup(self):
-        self._load()
+        with self._phase('加载数据'):
+            self._load()
         
         self.cerebro.broker.setcash(self.cash)
         self.cerebro.broker.addcommissioninfo(self.comm)
-        # 收益率
-        self.cerebro.addanalyzer(
-            bt.analyzers.Returns, 
-            _name='returns',
-            
-        )
-        # 回撤
-        self.cerebro.addanalyzer(
-            bt.analyzers.DrawDown, 
-            _name='drawdown'
-        )
-        self.cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.02, _name="sharpe",timeframe=TimeFrame.Days,compression=1)
-        self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+        add_analyzers(self.cerebro)
+        if self.profiler is not None:
+            analyzer, name, kwargs = self.profiler.analyzer()
+            self.cerebro.addanalyzer(analyzer, _name=name, **kwargs)
+
+    def _phase(self, name):
+        """性能剖析的阶段计时，未启用时为空上下文"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(name)
+
+    def _merge_profile(self, strategy):
+        """并入一次回测的 ProfileAnalyzer 结果（策略实例或 optreturn 的 OptReturn）"""
+        if self.profiler is not None:
+            self.profiler.merge(strategy.analyzers.profiler.get_analysis())
         
     def _get_commmission(self):
-        fp = os.path.join(
-            "data/commission/commission.json",
-        )
-        
-        with open(fp, 'r') as f:
-            comm = json.load(f)
-            my_comm = comm[self.name]
-            commtype_map = {
-                "COMM_FIXED": bt.CommInfoBase.COMM_FIXED,
-                "COMM_PERC": bt.CommInfoBase.COMM_PERC
-            }
-            my_comm['commtype'] = commtype_map[my_comm['commtype']]
-            self.contract_specs["mult"] = my_comm['mult']
-            self.contract_specs['margin'] = my_comm['margin']
-            self.contract_specs['unit'] = my_comm['unit']
-            result ={k: v for k,v in my_comm.items() if k != "unit"}
-            return result
+        comm, specs = load_commission(self.name)
+        self.contract_specs.update(specs)
+        return comm
 
     def _load(self):
         fp = os.path.join(
@@ -72,43 +95,309 @@ class BackTester():
             f"{self.symbol}_{self.period}.csv"
         )
         
-        data = GenericCSVData(
-            dataname="./data/RB2505_daily.csv",
+        # CSV首次使用（或更新后）转换为列式存储，之后直接内存映射读取
+        self.datapath = fp
+        if os.path.exists(fp):
+            self.store = ensure_store(fp, self.symbol, self.period)
+        else:
+            self.store = BarStore()
+        self.timeframe, self.compression = period_timeframe(self.period)
+
+        data = BarStoreData(
+            symbol=self.symbol,
+            period=self.period,
+            store=self.store,
             fromdate=self.beginning,
             todate=self.end,
-            nullvalue=0,
-            dtformat="%Y-%m-%d %H:%M:%S",
-            datetime=0,
-            open=1,high=2,low=3,close=4,volume=5,openinterest=6
+            timeframe=self.timeframe,
+            compression=self.compression
         )
-        
+
         self.cerebro.adddata(data)
         comm = self._get_commmission()
+        self.comm_kwargs = comm  # 进程池工作进程据此重建佣金对象
         self.comm = GenericCommInfo(
             **comm
-        )
-        
-    def add_strategy(self, strategy):
-        self.cerebro.addstrategy(strategy, **self.contract_specs)
+        ).bind(data)  # 分时段费率按当前K线时间计费
         
-    def run(self):
-        results = self.cerebro.run()
-        self._print_analysis(results[0])
-        self.cerebro.plot(style="candlestick")
+    def add_strategy(self, strategy, **params):
+        from utils.recorder import Recorder
+
+        self.cerebro.addstrategy(strategy, **self.contract_specs, **params)
+        self._strategies.append((strategy, params))
+        # 单次回测记录权益、持仓、成交和交易；优化不挂载，避免逐组合回传数组
+        if not self._recorder_added:
+            self.cerebro.addanalyzer(Recorder, _name='recorder')
+            self._recorder_added = True
         
+    @_headless
+    def run(self, plot=None):
+        """运行回测并打印报告
+
+        Args:
+            plot (bool, optional): 是否绘制K线图，缺省时非 headless 模式绘图
+
+        启用结果缓存且命中时不运行 cerebro，返回的是 OptReturn 形式的缓存结果（绘图时总是重新回测）
+        """
+        if plot is None:
+            plot = not self.headless
+        key = self._cache_key() if not plot else None
+        if key is not None:
+            with self._phase('结果缓存'):
+                cached = self.cache.get(key)
+            if cached is not None:
+                self.record = cached.analyzers.recorder.result()
+                with self._phase('报告'):
+                    self._print_analysis(cached, cached.value)
+                    self._print_cache_stats()
+                return [cached]
+
+        t0 = time.perf_counter()
+        with self._phase('回测'):
+            results = self.cerebro.run()
+        elapsed = time.perf_counter() - t0
+        self._merge_profile(results[0])
+        self.record = results[0].analyzers.recorder.result()
+        if key is not None:
+            strategy, params = self._strategies[0]
+            self.cache.put(key, strategy, self.data_fingerprint(), params,
+                           results[0].analyzers.performance.get_analysis(), self.record,
+                           self.cerebro.broker.getvalue(), elapsed)
+        with self._phase('报告'):
+            self._print_analysis(results[0])
+            if key is not None:
+                self._print_cache_stats()
+        if plot:
+            with self._phase('绘图'):
+                self.cerebro.plot(style="candlestick")
+
         return results
     
+    def _cache_key(self):
+        """结果缓存的键；未启用缓存或添加了多个策略时为 None"""
+        if self.cache is None or len(self._strategies) != 1 or len(self.cerebro.strats) != 1:
+            return None
+        strategy, params = self._strategies[0]
+        return self.cache.key(self.data_fingerprint(), strategy, params)
+
+    def _print_cache_stats(self):
+        stats = self.cache.stats()
+        print(f"\n结果缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.1%}, "
+              f"节省 {stats['saved_s']:.2f}s, {stats['entries']} 条共 {stats['nbytes']/1024:.1f} KB")
+
+    @_headless
     def run_optimization(self, maxcpus=1):
-        """执行参数优化"""
+        """执行参数优化（结果库中已有的组合不再重复回测）"""
         print(f"\n{'='*30} 开始参数优化 {'='*30}")
-        results = self.cerebro.run(maxcpus=maxcpus)
-        self._analyze_optimization_results(results)
+        pending = self._pending_combos()
+        results = []
+        if pending:
+            # 用剩余组合替换 optstrategy 展开的全网格，每个组合完成即写入结果库
+            self.cerebro.strats[self._opt_index] = [
+                (self.opt_strategy, (), {**combo, **self.contract_specs}) for combo in pending
+            ]
+            if not self._optcallback_added:
+                self.cerebro.optcallback(self._on_optimization_result)
+                self._optcallback_added = True
+            with self._phase('参数优化'):
+                results = self.cerebro.run(maxcpus=maxcpus)
+        with self._phase('报告'):
+            self._analyze_optimization_results()
+        
+        stats = INDICATOR_CACHE.stats()
+        print(f"\n指标缓存（主进程）: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+              f"命中率 {stats['hit_rate']:.1%}, 占用 {stats['nbytes']/1024:.1f} KB")
         return results
     
-    def _analyze_optimization_results(self, results):
-        """分析优化结果"""
-        import pandas as pd
+    @_headless
+    def run_vectorized_optimization(self, param_ranges):
+        """向量化参数优化（仅适用于DualMovingAverageStrategy），输出与run_optimization一致"""
+        from engine.vectorized import VectorizedDualMA
+        from strategy.dual_ma import DualMovingAverageStrategy
+        
+        print(f"\n{'='*30} 开始向量化参数优化 {'='*30}")
+        self.param_ranges = param_ranges
+        engine = VectorizedDualMA.from_tester(self)
+        df = engine.run(param_ranges)
+        self.opt_strategy = DualMovingAverageStrategy
+        self._save_performance(df.to_dict('records'))
+        self._analyze_optimization_results()
+        return df
+
+    @_headless
+    def run_parallel_optimization(self, workers=None, chunksize=None):
+        """进程池参数优化：K线放共享内存，工作进程只回传指标记录，边完成边汇总
+
+        需先调用 add_optimization_strategy，输出与run_optimization一致
+        """
+        from engine.scheduler import OptimizationScheduler
+
+        print(f"\n{'='*30} 开始并行参数优化 {'='*30}")
+        scheduler = OptimizationScheduler(self, workers=workers, chunksize=chunksize)
+        with self._phase('参数优化'):
+            for records in scheduler.run(self.opt_strategy, combos=self._pending_combos()):
+                self._save_performance(records)
+                print(f"已完成 {scheduler.completed}/{scheduler.total} 个参数组合")
+        with self._phase('报告'):
+            return self._analyze_optimization_results()
+
+    @_headless
+    def run_adaptive_optimization(self, budget=None, method='tpe', **kwargs):
+        """自适应参数搜索：按预算只评估部分组合（需先调用 add_optimization_strategy）
+
+        Args:
+            budget: 'tpe' 为最多评估的组合数（默认网格的1/3），
+                'halving' 为折算的完整区间回测次数（默认第一级评估全部组合）
+            method (str): 'tpe'（TPE采样）或 'halving'（按数据窗口逐级减半）
+            **kwargs: 传给搜索器的其他参数，如 seed、gamma、eta
+
+        启用性能剖析时用 backtrader 评估（向量化引擎没有可剖析的回调）
+        """
+        from engine.search import (TPESearch, SuccessiveHalving,
+                                   vectorized_evaluator, backtrader_evaluator)
+        from strategy.dual_ma import DualMovingAverageStrategy
+
+        print(f"\n{'='*30} 开始自适应参数优化 {'='*30}")
+        if self.opt_strategy is DualMovingAverageStrategy and self.fill_model is None and self.profiler is None:
+            evaluate, n_bars = vectorized_evaluator(self)
+        else:
+            evaluate, n_bars = backtrader_evaluator(self, self.opt_strategy)
+        searcher = {'tpe': TPESearch, 'halving': SuccessiveHalving}[method](evaluate, n_bars, **kwargs)
+        with self._phase('参数优化'):
+            records = searcher.run(self.param_ranges, budget)
+
+        # 返回的都是完整区间上的结果，写入结果库后穷举优化可直接跳过这些组合
+        self._save_performance(records)
+        for k, v in searcher.summary().items():
+            print(f"{k}: {v:.1%}" if k == '节省比例' else f"{k}: {v}")
+        self._report_performance(records)
+        return records
+
+    @_headless
+    def run_walk_forward(self, in_sample, out_sample, anchored=False, workers=None):
+        """滚动样本外检验（需先调用 add_optimization_strategy）
+
+        Args:
+            in_sample (int): 样本内K线数
+            out_sample (int): 样本外K线数
+            anchored (bool): True 为锚定式窗口，False 为滚动式
+            workers (int, optional): 并行窗口的进程数
+
+        Returns:
+            (pd.DataFrame, pd.Series): 各窗口最优参数与样本内外指标，拼接的样本外权益曲线
+        """
+        from engine.walkforward import WalkForward
+
+        print(f"\n{'='*30} 开始滚动样本外检验 {'='*30}")
+        wf = WalkForward(self, self.opt_strategy, self.param_ranges, in_sample, out_sample,
+                         anchored=anchored, workers=workers)
+        with self._phase('滚动检验'):
+            table, equity = wf.run()
+
+        print(table.to_string(index=False))
+        print(f"\n样本外期末权益: {equity.iloc[-1]:.2f}（初始资金 {self.cash:.2f}）")
+        table.to_csv('滚动优化结果.csv', index=False)
+        equity.to_csv('样本外权益曲线.csv')
+        print("窗口结果已保存至 滚动优化结果.csv，样本外权益已保存至 样本外权益曲线.csv")
+        return table, equity
+
+    @_headless
+    def run_monte_carlo(self, n_sims=10000, method='blocks', params=None, block=None, workers=None, seed=0):
+        """对最优参数做蒙特卡洛稳健性检验（需先完成一次参数优化）
+
+        Args:
+            n_sims (int): 模拟次数
+            method (str): 'trades'（交易自助法）或 'blocks'（收益率块自助法）
+            params (dict, optional): 检验的参数组合，缺省为结果库中夏普比率最高的组合
+            block (int, optional): 块自助法的块长度（K线数）
+            workers (int, optional): 模拟的进程数，默认CPU核数
+            seed (int, optional): 随机数种子
+
+        Returns:
+            pd.DataFrame: 各指标的模拟分位数表
+        """
+        import numpy as np
+        from engine.montecarlo import MonteCarlo
+        from engine.scheduler import run_single
+        from utils.recorder import Recorder
+        from utils.store import COLUMNS, feed_datetimes
+
+        print(f"\n{'='*30} 开始蒙特卡洛检验 {'='*30}")
+        if params is None:
+            def sharpe(r):
+                s = r['夏普比率']
+                return float('-inf') if s is None or s != s else s
+            best = max(self._stored_performance(), key=sharpe, default=None)
+            if best is None:
+                print("没有有效结果")
+                return None
+            params = {k: best[k] for k in self.param_ranges}
+        print("检验参数：" + ", ".join(f"{k}={v}" for k, v in params.items()))
+
+        bars = self.store.load(self.symbol, self.period, self.beginning, self.end)
+        matrix = np.vstack([feed_datetimes(bars['datetime'], self.timeframe)] +
+                           [np.asarray(bars[col], dtype=np.float64) for col in COLUMNS])
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = run_single(matrix, self.timeframe, self.compression, self.comm_kwargs, self.opt_strategy,
+                                {**self.contract_specs, **params}, self.cash,
+                                analyzers=[(Recorder, 'recorder', {'fields': ('value',)})],
+                                fill_model=self.fill_model)
+        mc = MonteCarlo(result.analyzers.recorder.result(), self.cash, self.timeframe, self.compression)
+        table = mc.run(n_sims, method=method, block=block, workers=workers, seed=seed)
+
+        print(f"\n{n_sims} 次模拟（{method}）指标分位数：")
+        print(table.to_string(index=False))
+        table.to_csv('蒙特卡洛分位数.csv', index=False)
+        print("\n分位数表已保存至 蒙特卡洛分位数.csv")
+        return table
+
+    def _analyze_optimization_results(self):
+        """分析优化结果：从结果库读取当前参数网格的全部组合（含此前运行已完成的部分）"""
+        performance = self._stored_performance()
+        self._report_performance(performance)
+        return performance
+
+    def data_fingerprint(self):
+        """回测区间数据 + 资金/佣金/合约参数（及成交模型）的指纹，结果库按它区分不同输入"""
+        if self._fingerprint is None:
+            bars = self.store.load(self.symbol, self.period, self.beginning, self.end)
+            # 成交模型只在设置时计入，默认撮合的结果库记录保持可用
+            fill = {'fill_model': repr(self.fill_model)} if self.fill_model is not None else {}
+            self._fingerprint = data_fingerprint(
+                bars, cash=self.cash, comm=self.comm_kwargs, contract_specs=self.contract_specs, **fill)
+        return self._fingerprint
+
+    def _grid_keys(self):
+        from engine.vectorized import expand_grid
+        return {param_key(combo): combo for combo in expand_grid(self.param_ranges)}
+
+    def _pending_combos(self):
+        """参数网格中尚未写入结果库的组合"""
+        grid = self._grid_keys()
+        done = self.results.done_keys(self.opt_strategy.__name__, self.data_fingerprint())
+        pending = [combo for key, combo in grid.items() if key not in done]
+        if len(pending) < len(grid):
+            print(f"结果库中已有 {len(grid) - len(pending)} 个组合，剩余 {len(pending)} 个待回测")
+        return pending
+
+    def _on_optimization_result(self, runstrat):
+        """cerebro.optcallback：每个组合回测完成即写入结果库"""
+        if runstrat:
+            self._merge_profile(runstrat[0])
+        self._save_performance(self._collect_performance([runstrat]))
+
+    def _save_performance(self, performance):
+        """把一批组合的指标追加到结果库"""
+        self.results.append(self.opt_strategy.__name__, self.data_fingerprint(),
+                            performance, self.param_ranges)
+
+    def _stored_performance(self):
+        """结果库中属于当前参数网格的记录"""
+        return self.results.records(self.opt_strategy.__name__, self.data_fingerprint(),
+                                    keys=set(self._grid_keys()))
         
+    def _collect_performance(self, results):
+        """从每个参数组合的分析器中提取关键指标"""
         performance = []
         for strat_run in results:  # 遍历每个参数组合
             if not strat_run:
@@ -123,33 +412,27 @@ class BackTester():
                 if k in self.param_ranges
             }
             
-            # 获取分析器数据
+            # 获取分析器数据并计算关键指标
             try:
-                returns_an = strategy.analyzers.returns.get_analysis()
-                sharpe_an = strategy.analyzers.sharpe.get_analysis()
-                drawdown_an = strategy.analyzers.drawdown.get_analysis()
-                trade_an = strategy.analyzers.trades.get_analysis()
+                metrics = analyzer_metrics(strategy)
             except Exception as e:
-                print(f"分析器数据获取失败: {e}")
+                LOG.warning("分析器数据获取失败", extra={'fields': {'error': repr(e)}})
                 continue
 
-            # 计算关键指标
-            print("="*20)
-            print(trade_an)
-            print("="*20)
-            total_trades = trade_an.total.closed if trade_an.total.total !=0 else 0
-            win_rate = (trade_an.won.total/total_trades*100) if total_trades > 0 else 0
+            if LOG.isEnabledFor(logging.DEBUG):
+                LOG.debug("交易统计", extra={'fields': {**filtered_params,
+                                                     **strategy.analyzers.performance.get_analysis()}})
             
             performance.append({
                 **filtered_params,
-                '总收益率 (%)': returns_an['rtot'],
-                '年化收益率 (%)': returns_an['rnorm100'],
-                '夏普比率': sharpe_an['sharperatio'],
-                '最大回撤 (%)': drawdown_an.max.drawdown,
-                '交易次数': total_trades,
-                '胜率 (%)': win_rate
+                **metrics
             })
-
+        return performance
+    
+    def _report_performance(self, performance):
+        """排序、保存并打印优化结果"""
+        import pandas as pd
+        
         # 生成分析报告
         if not performance:
             print("没有有效结果")
@@ -174,153 +457,59 @@ class BackTester():
     def add_optimization_strategy(self, strategy, param_ranges):
         """添加参数优化策略"""
         self.param_ranges = param_ranges  # 保存参数范围
+        self.opt_strategy = strategy
+        self._opt_index = len(self.cerebro.strats)
+        self._optcallback_added = False
         self.cerebro.optstrategy(
             strategy,
             **param_ranges,
             **self.contract_specs
         )
     
-    def _print_analysis(self, result):
-        """打印专业化的回测报告"""
-        analyzers = result.analyzers
+    def _print_analysis(self, result, value=None):
+        """打印专业化的回测报告（value 为期末资金，缺省取 broker）"""
+        perf = result.analyzers.performance.get_analysis()
+        if value is None:
+            value = self.cerebro.broker.getvalue()
         
         print("\n========== 专业回测分析报告 ==========")
         print(f"初始资金: {self.cash:.2f}")
-        print(f"期末资金: {self.cerebro.broker.getvalue():.2f}")
-        print(f"总收益率: {analyzers.returns.get_analysis()['rtot']:.2f}%")
-        print(f"年化收益率: {analyzers.returns.get_analysis()['rnorm100']:.2f}%")
-        print(f"夏普比率: {analyzers.sharpe.get_analysis()['sharperatio']}")
-        print(f"最大回撤: {analyzers.drawdown.get_analysis().max.drawdown:.2f}%")
-        print(f"最长回撤周期: {analyzers.drawdown.get_analysis().max.len} 根K线")
+        print(f"期末资金: {value:.2f}")
+        print(f"总收益率: {perf['总收益率 (%)']:.2f}%")
+        print(f"年化收益率: {perf['年化收益率 (%)']:.2f}%")
+        print(f"夏普比率: {perf['夏普比率']}")
+        print(f"索提诺比率: {perf['索提诺比率']}")
+        print(f"最大回撤: {perf['最大回撤 (%)']:.2f}%")
+        print(f"最长回撤周期: {perf['最长回撤周期']} 根K线")
         
-        trade_analysis = analyzers.trades.get_analysis()
         print("\n====== 交易统计 ======")
-        #print(f"总交易次数: {trade_analysis.total.closed}")
-        #print(f"胜率: {trade_analysis.won.total/trade_analysis.total.closed*100:.1f}%")
-        #print(f"盈亏比: {trade_analysis.won.pnl.average/abs(trade_analysis.lost.pnl.average):.2f}")
+        print(f"总交易次数: {perf['交易次数']}")
+        print(f"胜率: {perf['胜率 (%)']:.1f}%")
+        print(f"盈利因子: {perf['盈利因子']:.2f}")
     
-    def plot_optimization_results(self, csv_path='优化结果.csv'):
-        """可视化优化结果（需先运行过优化）"""
-        # 读取优化结果
-        import pandas as pd
-        import seaborn as sns
-        df = pd.read_csv(csv_path)
-        
-        # 设置专业金融图表样式
-        #plt.style.use('seaborn-whitegrid')
-        plt.rcParams.update({
-            'font.sans-serif': 'Microsoft YaHei',  # 中文显示
-            'axes.unicode_minus': False,
-            'figure.dpi': 150,
-            'figure.figsize': (12, 8)
-        })
-
-        # 生成参数组合列表
-        params = [col for col in df.columns if col not in [
-            '总收益率 (%)', '年化收益率 (%)', '夏普比率', 
-            '最大回撤 (%)', '交易次数', '胜率 (%)'
-        ]]
-
-        # 绘制热力图矩阵
-        for metric in ['夏普比率', '最大回撤 (%)', '总收益率 (%)']:
-            if len(params) >= 2:
-                self._plot_heatmap(df, params[0], params[1], metric)
-            if len(params) >= 3:
-                self._plot_3d_surface(df, params[0], params[1], params[2], metric)
-
-    def _plot_heatmap(self, df, x_col, y_col, metric_col):
-        """二维参数热力图"""
-        pivot = df.pivot_table(
-            values=metric_col,
-            index=y_col,
-            columns=x_col,
-            aggfunc='mean'
-        )
-
-        plt.figure(figsize=(10, 8))
-        ax = sns.heatmap(
-            pivot, 
-            annot=True, 
-            fmt=".2f",
-            cmap='RdYlGn', 
-            linewidths=0.5,
-            annot_kws={'size': 8},
-            cbar_kws={'label': metric_col}
-        )
-        
-        plt.title(f'参数优化热力图: {x_col} vs {y_col} → {metric_col}', pad=20)
-        plt.xlabel(x_col, labelpad=15)
-        plt.ylabel(y_col, labelpad=15)
-        plt.xticks(rotation=45)
-        plt.yticks(rotation=0)
-        plt.tight_layout()
-        plt.savefig(f'热力图_{x_col}vs{y_col}_{metric_col}.png')
-        plt.close()
-
-    def _plot_3d_surface(self, df, x_col, y_col, z_col, metric_col):
-        """三维参数曲面图"""
-        from mpl_toolkits.mplot3d import Axes3D
-
-        fig = plt.figure(figsize=(14, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        # 创建数据透视表
-        pivot = df.pivot_table(
-            values=metric_col,
-            index=[x_col, y_col],
-            columns=z_col,
-            aggfunc='mean'
-        )
+    def plot_optimization_results(self, csv_path=None, out_dir='.'):
+        """生成优化结果报告（需先运行过优化）：优化报告.png 与内嵌该图的 优化报告.html
 
-        # 生成网格数据
-        X, Y = np.meshgrid(pivot.columns, pivot.index.levels[1])
-        Z = pivot.unstack().values.reshape(X.shape)
+        默认直接读取结果库中当前参数网格的记录，指定 csv_path 时读取导出的CSV；
+        聚合与绘图见 utils.report
+        """
+        import pandas as pd
+        from utils.report import OptimizationReport
+        if csv_path is None:
+            df = pd.DataFrame(self._stored_performance())
+        else:
+            df = pd.read_csv(csv_path)
+        if df.empty:
+            print("没有有效结果")
+            return None
 
-        # 绘制曲面
-        surf = ax.plot_surface(
-            X, Y, Z, 
-            cmap='viridis',
-            edgecolor='k',
-            alpha=0.8
-        )
-        
-        # 添加颜色条
-        fig.colorbar(surf, shrink=0.5, label=metric_col)
-        
-        # 设置坐标轴
-        ax.set_xlabel(z_col, labelpad=15)
-        ax.set_ylabel(y_col, labelpad=15)
-        ax.set_zlabel(metric_col, labelpad=15)
-        ax.xaxis.set_major_formatter(FormatStrFormatter('%.0f'))
-        ax.yaxis.set_major_formatter(FormatStrFormatter('%.0f'))
-        
-        plt.title(f'三维参数优化: {x_col} × {y_col} × {z_col} → {metric_col}', pad=20)
-        plt.savefig(f'3D曲面_{x_col}×{y_col}×{z_col}_{metric_col}.png')
-        plt.close()
+        with self._phase('绘图'):
+            report = OptimizationReport.aggregate(df)
+            png, path = report.write(out_dir)
+        print(f"\n优化报告已保存至 {path}（图表 {png}）")
+        return report
 
 if __name__=="__main__":
-    from strategy.dual_ma import DualMovingAverageStrategy
-    
-    today = datetime.today()
-    diff = timedelta(days=200)
-    start = today - diff
-    tester = BackTester("RB", "RB2505", "daily", start, today)
-    tester.add_strategy(DualMovingAverageStrategy)
-    tester.run()
-    # 定义参数网格
-    #param_grid = {
-    #    'fast_period': range(5, 10, 1),    # [5, 10, 15, 20]
-    #    'slow_period': range(15, 20, 1),  # [20, 30, 40, 50]
-    #    'rsi_upper': [70, 75, 80]
-    #}
-    
-    # 添加优化策略
-    #tester.add_optimization_strategy(
-    #    DualMovingAverageStrategy,
-    #    param_ranges=param_grid
-    #)
-    
-    # 执行参数优化
-    #tester.run_optimization()
-    #tester.plot_optimization_results()
-        
\ No newline at end of file
+    # 命令行参数见 cli.py，例如: python backtest_runner.py RB2505 --start 2024-05-01 --plot
+    from cli import main
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+绩效指标计算开销：backtrader 逐K线分析器 vs Performance 向量化计算
+
+1. 单次回测：同一份合成分钟线分别挂载之前的 Returns/DrawDown/SharpeRatio/TradeAnalyzer
+   和 Performance，比较回测耗时，并确认指标一致
+2. 矩阵模式：N 条权益曲线一次 performance() vs 逐条计算
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_analytics [K线数，默认100000]
+"""
+import sys
+import time
+
+import backtrader as bt
+import numpy as np
+from backtrader import TimeFrame
+
+from benchmark.synthetic import generate_bars
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.analytics import Performance, performance
+from utils.commission import GenericCommInfo, load_commission
+from utils.logger import set_quiet
+from utils.store import COLUMNS, ArrayData, feed_datetimes
+
+LEGACY = [
+    (bt.analyzers.Returns, 'returns', {}),
+    (bt.analyzers.DrawDown, 'drawdown', {}),
+    (bt.analyzers.SharpeRatio, 'sharpe', {'riskfreerate': 0.02, 'timeframe': TimeFrame.Days, 'compression': 1}),
+    (bt.analyzers.TradeAnalyzer, 'trades', {}),
+]
+
+
+def _run(matrix, analyzers, comm, specs, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        cerebro = bt.Cerebro(stdstats=False)
+        cerebro.adddata(ArrayData(dtnum=matrix[0], columns={c: matrix[i] for i, c in enumerate(COLUMNS, 1)},
+                                  timeframe=TimeFrame.Minutes, compression=1))
+        cerebro.broker.setcash(10000)
+        cerebro.broker.addcommissioninfo(GenericCommInfo(**comm))
+        for cls, name, kw in analyzers:
+            cerebro.addanalyzer(cls, _name=name, **kw)
+        cerebro.addstrategy(DualMovingAverageStrategy, **specs)
+        t0 = time.perf_counter()
+        strategy = cerebro.run()[0]
+        best = min(best, time.perf_counter() - t0)
+    return strategy, best
+
+
+def run(n=100_000):
+    set_quiet()
+    df = generate_bars(n, freq='min', seed=11)
+    ns = df['datetime'].astype('datetime64[ns]').astype(np.int64).to_numpy()
+    matrix = np.vstack([feed_datetimes(ns, TimeFrame.Minutes)] + [df[c].to_numpy(np.float64) for c in COLUMNS])
+    comm, specs = load_commission('RB')
+
+    _, base = _run(matrix, [], comm, specs)
+    old, legacy_s = _run(matrix, LEGACY, comm, specs)
+    new, perf_s = _run(matrix, [(Performance, 'performance', {})], comm, specs)
+    perf = new.analyzers.performance.get_analysis()
+    assert perf['总收益率 (%)'] == old.analyzers.returns.get_analysis()['rtot']
+    assert perf['最大回撤 (%)'] == old.analyzers.drawdown.get_analysis().max.drawdown
+
+    print(f"\n{'='*20} 单次回测（{n:,} 根分钟线，取3次最小值）{'='*20}")
+    print(f"{'分析器':<24}{'回测耗时':>10}{'分析器开销':>12}")
+    print(f"{'无':<24}{base:>9.2f}s{'-':>12}")
+    print(f"{'Returns/DrawDown/Sharpe/Trade':<24}{legacy_s:>9.2f}s{legacy_s - base:>11.2f}s")
+    print(f"{'Performance':<24}{perf_s:>9.2f}s{perf_s - base:>11.2f}s")
+    print(f"分析器开销降低 {1 - (perf_s - base) / (legacy_s - base):.1%}，单次回测提速 {legacy_s / perf_s - 1:.1%}")
+
+    # 矩阵模式：随机游走权益曲线
+    runs, bars = 500, min(n, 20_000)
+    rng = np.random.default_rng(0)
+    equity = 10000 * np.exp(np.cumsum(rng.normal(0, 1e-3, (bars, runs)), axis=0))
+    dt = matrix[0][:bars]
+    t0 = time.perf_counter()
+    batch = performance(equity, 10000, dt, timeframe=TimeFrame.Minutes)
+    matrix_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    single = [performance(equity[:, j], 10000, dt, timeframe=TimeFrame.Minutes) for j in range(runs)]
+    loop_s = time.perf_counter() - t0
+    assert np.allclose(batch['夏普比率'], [s['夏普比率'] for s in single], rtol=1e-12)
+    print(f"\n矩阵模式（{runs} 条 × {bars:,} 根）: 一次计算 {matrix_s:.3f}s  逐条计算 {loop_s:.3f}s  "
+          f"加速比 {loop_s / matrix_s:.1f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
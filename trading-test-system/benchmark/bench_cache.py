@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+回测结果缓存：脚本/notebook 式的重复回测
+
+同一份合成分钟线上，从少量参数组合中有放回地抽取若干次 BackTester.run（模拟反复重跑单元格），
+分别在不启用缓存和启用 RunCache 时运行，比较总耗时、命中率和节省的时间，并检查命中结果与重新回测一致。
+两种方式在各自的 spawn 子进程中运行。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_cache [K线数，默认200000] [运行次数，默认20]
+"""
+import sys
+import tempfile
+import time
+
+from benchmark.suite import _enter, _in_subprocess, _prepare_workdir
+
+COMBOS = [{'fast_period': f, 'slow_period': s} for f in (5, 7, 10) for s in (20, 30)]
+
+
+def _bench(use_cache, n, runs, workdir):
+    _enter(workdir)
+    import contextlib
+    import io
+
+    import numpy as np
+
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.results import RunCache
+    from utils.store import BarStore
+
+    symbol = 'SYNCACHE'
+    df = generate_bars(n, freq='min', seed=7)
+    if not BarStore().exists(symbol, '1m'):
+        BarStore().write(symbol, '1m', df)
+    beginning, end = df['datetime'].iloc[0].to_pydatetime(), df['datetime'].iloc[-1].to_pydatetime()
+    del df
+
+    cache = RunCache() if use_cache else None
+    rng = np.random.default_rng(0)
+    values, times = [], []
+    for i in rng.integers(0, len(COMBOS), runs):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tester = BackTester("RB", symbol, '1m', beginning, end, headless=True, cache=cache)
+            tester.add_strategy(DualMovingAverageStrategy, **COMBOS[i])
+            tester.run(plot=False)
+        times.append(time.perf_counter() - t0)
+        values.append((int(i), float(tester.record.equity[-1]), len(tester.record.fills)))
+    return {'total_s': sum(times), 'times': times, 'values': values, 'stats': cache and cache.stats()}
+
+
+def run(n=200_000, runs=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        plain = _in_subprocess(_bench, False, n, runs, workdir)
+        cached = _in_subprocess(_bench, True, n, runs, workdir)
+
+    assert plain['values'] == cached['values']
+    stats = cached['stats']
+    seen, hit_times = set(), []
+    for t, (i, *_) in zip(cached['times'], cached['values']):
+        if i in seen:
+            hit_times.append(t)
+        seen.add(i)
+    print(f"\n{'='*20} 回测结果缓存（{n:,} 根分钟线，{runs} 次运行，{len(COMBOS)} 个参数组合）{'='*20}")
+    print(f"不启用缓存: {plain['total_s']:.1f}s")
+    print(f"启用缓存:   {cached['total_s']:.1f}s（加速 {plain['total_s'] / cached['total_s']:.1f}x）")
+    print(f"命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.1%}, "
+          f"节省 {stats['saved_s']:.1f}s, {stats['entries']} 条共 {stats['nbytes'] / 2**20:.1f} MB")
+    if hit_times:
+        print(f"命中时单次耗时（含构造 BackTester 与数据指纹）: {1e3 * sum(hit_times) / len(hit_times):.0f}ms")
+    return {'plain_s': plain['total_s'], 'cached_s': cached['total_s'], **stats}
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+多合约采集耗时：串行 AkshareCollector vs 并发 CollectorManager
+
+数据源为 StubDailySource（每次调用模拟固定网络延迟），完全离线。
+依次测量：串行全量下载、不同并发数的全量下载、5个交易日后的增量更新、缓存命中。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_collector [合约数，默认100] [延迟秒数，默认0.05]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmark.synthetic import StubDailySource
+from utils.collector import CollectorManager
+from utils.data import AkshareCollector
+
+WORKERS = (1, 4, 16, 32)
+
+
+def _serial(symbols, source, data_dir):
+    # 原有方式：逐个合约同步请求并整文件写出
+    for symbol in symbols:
+        collector = AkshareCollector(symbol, source=source)
+        collector.get_daily_data()
+        collector.daily_data.to_csv(os.path.join(data_dir, f"{symbol}_daily.csv"), index=False)
+
+
+def _timed(func, *args):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return time.perf_counter() - t0, result
+
+
+def run(n_symbols=100, latency=0.05):
+    symbols = [f"SYN{i:03d}" for i in range(n_symbols)]
+    rows = []
+    print(f"\n{'='*20} 采集 {n_symbols} 个合约（模拟延迟 {latency * 1000:.0f}ms/次）{'='*20}")
+    print(f"{'方式':<24}{'耗时':>10}{'合约/秒':>10}{'传输K线':>12}")
+
+    def report(name, seconds, source):
+        rows.append((name, seconds, n_symbols / seconds, source.rows))
+        print(f"{name:<24}{seconds:>9.2f}s{n_symbols / seconds:>10.1f}{source.rows:>12,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = StubDailySource(end='2025-05-23', latency=latency).warmup(symbols)
+        seconds, _ = _timed(_serial, symbols, source, tmp)
+        report("串行全量", seconds, source)
+
+        for workers in WORKERS:
+            data_dir = os.path.join(tmp, f"w{workers}")
+            source = StubDailySource(end='2025-05-23', latency=latency).warmup(symbols)
+            manager = CollectorManager(symbols, source=source, data_dir=data_dir, workers=workers)
+            seconds, _ = _timed(manager.collect)
+            report(f"并发全量 workers={workers}", seconds, source)
+
+        # 5个交易日后刷新：只请求并追加新K线
+        source.end = pd.Timestamp('2025-05-30')
+        source.rows = 0
+        seconds, result = _timed(manager.collect)
+        assert (result['status'] == 'incremental').all()
+        report(f"增量更新 workers={WORKERS[-1]}", seconds, source)
+
+        manager.max_age = 3600
+        source.rows = 0
+        seconds, result = _timed(manager.collect)
+        assert (result['status'] == 'cached').all()
+        report("缓存命中", seconds, source)
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+成交模型开销：BackBroker 默认撮合 vs FillBroker + FillModel
+
+同一份合成分钟线分别用默认 BackBroker、不加滑点的 FillModel、以及滑点 + 成交量限制的 FillModel
+回测，每种方式在独立的 spawn 子进程中运行，比较回测耗时。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_fills [K线数，默认1000000]
+"""
+import sys
+import tempfile
+import time
+
+from benchmark.suite import _enter, _in_subprocess, _prepare_workdir
+
+MODELS = {
+    '默认 BackBroker': None,
+    'FillModel（不加滑点）': {},
+    '固定滑点 1': {'slippage': 'fixed', 'slip': 1},
+    '比例滑点 0.02%': {'slippage': 'pct', 'slip': 0.0002},
+    '冲击成本 + 成交量 5%': {'slippage': 'volume', 'slip': 0.05, 'participation': 0.05},
+}
+
+
+def _bench(kwargs, n, workdir):
+    _enter(workdir)
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.fills import FillModel
+    from utils.store import BarStore
+
+    symbol = 'SYNFILL'
+    df = generate_bars(n, freq='min', seed=7)
+    if not BarStore().exists(symbol, '1m'):
+        BarStore().write(symbol, '1m', df)
+    beginning, end = df['datetime'].iloc[0].to_pydatetime(), df['datetime'].iloc[-1].to_pydatetime()
+    del df
+
+    fill_model = None if kwargs is None else FillModel(**kwargs)
+    tester = BackTester("RB", symbol, '1m', beginning, end, headless=True, fill_model=fill_model)
+    tester.add_strategy(DualMovingAverageStrategy)
+    t0 = time.perf_counter()
+    strategy = tester.cerebro.run()[0]
+    elapsed = time.perf_counter() - t0
+    return {
+        'run_s': elapsed,
+        'fills': len(strategy.analyzers.recorder.result().fills),
+        'value': tester.cerebro.broker.getvalue(),
+    }
+
+
+def run(n=1_000_000):
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        for name, kwargs in MODELS.items():
+            rows[name] = _in_subprocess(_bench, kwargs, n, workdir)
+
+    base = rows['默认 BackBroker']
+    print(f"\n{'='*20} 成交模型开销（{n:,} 根分钟线）{'='*20}")
+    print(f"{'方式':<24}{'回测':>9}{'开销':>9}{'成交笔数':>10}{'期末资金':>14}")
+    for name, r in rows.items():
+        print(f"{name:<24}{r['run_s']:>8.1f}s{r['run_s'] / base['run_s'] - 1:>9.1%}{r['fills']:>10}"
+              f"{r['value']:>14.2f}")
+    assert rows['FillModel（不加滑点）']['value'] == base['value']
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+headless 模式的耗时对比
+
+1. 导入 backtest_runner 的耗时，以及是否加载了 matplotlib/seaborn
+2. 单次回测：默认模式（成交日志 + 回测后绘图）vs headless（不绘图、日志静默）
+3. 参数优化 run_optimization：默认模式 vs headless
+
+日志写入 os.devnull（仍包含格式化与I/O开销），绘图使用 Agg 后端，不弹出窗口。
+每种模式在独立的 spawn 子进程中运行，互不影响日志级别和指标缓存。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_headless [K线数，默认10000]
+"""
+import contextlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark.suite import ROOT, _enter, _in_subprocess, _prepare_workdir
+
+GRID = {'fast_period': [5, 6, 7, 8, 9], 'slow_period': [15, 20]}
+
+
+def _import_time():
+    code = ("import sys, time; t = time.perf_counter(); import backtest_runner; "
+            "print(time.perf_counter() - t, 'matplotlib' in sys.modules, 'seaborn' in sys.modules)")
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                         env={**os.environ, 'MPLBACKEND': 'Agg'}, check=True).stdout.split()
+    return float(out[0]), out[1] == 'True', out[2] == 'True'
+
+
+def _bench_mode(headless, n, workdir):
+    _enter(workdir)
+    import warnings
+
+    import backtrader.plot  # noqa: F401  导入时会切换到 TkAgg，之后改回 Agg 以便无界面测量绘图耗时
+    import matplotlib
+    matplotlib.use('Agg')
+    warnings.filterwarnings('ignore', module='matplotlib')
+
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.store import BarStore
+
+    symbol = 'SYNHL'
+    df = generate_bars(n, freq='min', seed=11)
+    if not BarStore().exists(symbol, '1m'):
+        BarStore().write(symbol, '1m', df)
+    beginning = df['datetime'].iloc[0].to_pydatetime()
+    end = df['datetime'].iloc[-1].to_pydatetime()
+
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        tester = BackTester("RB", symbol, '1m', beginning, end, headless=headless)
+        tester.add_strategy(DualMovingAverageStrategy)
+        t0 = time.perf_counter()
+        tester.run()
+        run_time = time.perf_counter() - t0
+        value = tester.cerebro.broker.getvalue()
+
+        tester = BackTester("RB", symbol, '1m', beginning, end, headless=headless)
+        tester.add_optimization_strategy(DualMovingAverageStrategy, GRID)
+        tester.results.delete(DualMovingAverageStrategy.__name__)
+        t0 = time.perf_counter()
+        tester.run_optimization()
+        opt_time = time.perf_counter() - t0
+    return run_time, opt_time, value
+
+
+def run(n=10_000):
+    seconds, mpl, sns = _import_time()
+    print(f"\n{'='*20} headless 模式（{n} 根分钟线，{len(GRID['fast_period']) * len(GRID['slow_period'])} 个参数组合）{'='*20}")
+    print(f"import backtest_runner: {seconds:.3f}s  加载matplotlib: {mpl}  加载seaborn: {sns}")
+
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        for name, headless in (('默认（日志+绘图）', False), ('headless', True)):
+            rows[name] = _in_subprocess(_bench_mode, headless, n, workdir)
+
+    print(f"{'模式':<18}{'单次回测':>10}{'参数优化':>10}{'期末资金':>14}")
+    for name, (run_time, opt_time, value) in rows.items():
+        print(f"{name:<18}{run_time:>9.2f}s{opt_time:>9.2f}s{value:>14.2f}")
+    (r0, o0, v0), (r1, o1, v1) = rows.values()
+    assert v0 == v1
+    print(f"单次回测耗时减少 {1 - r1 / r0:.1%}，参数优化耗时减少 {1 - o1 / o0:.1%}")
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+组合回测吞吐量 vs 品种数
+
+每个品种一条合成日线（随机剔除约2%的K线以检验对齐），佣金与合约参数均取RB。
+输出加载对齐耗时、回测耗时和每秒处理的K线数（品种数 × 时间轴长度 / 回测耗时）。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_portfolio [每个品种的K线数，默认2000]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark.synthetic import generate_bars
+from engine.portfolio import PortfolioTester
+from utils.store import BarStore
+
+SYMBOL_COUNTS = (1, 5, 10, 25, 50)
+
+
+def run(n_bars=2000, counts=SYMBOL_COUNTS):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, 'store'))
+        symbols = [f"SYN{i:02d}" for i in range(max(counts))]
+        for i, symbol in enumerate(symbols):
+            df = generate_bars(n_bars, freq='D', seed=i)
+            keep = np.random.default_rng(1000 + i).random(n_bars) > 0.02
+            keep[0] = True
+            store.write(symbol, 'daily', df[keep])
+        beginning = df['datetime'].iloc[0].to_pydatetime()
+        end = df['datetime'].iloc[-1].to_pydatetime()
+
+        print(f"\n{'='*20} 组合回测吞吐量（每品种约 {n_bars} 根日线）{'='*20}")
+        print(f"{'品种数':<6}{'加载对齐':>10}{'回测':>10}{'K线/秒':>12}{'期末资金':>16}")
+        for count in counts:
+            chosen = symbols[:count]
+            t0 = time.perf_counter()
+            tester = PortfolioTester(chosen, 'daily', beginning, end, cash=1_000_000,
+                                     names={s: 'RB' for s in chosen}, store=store)
+            tester.add_strategy()
+            load_time = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tester.cerebro.run()
+            run_time = time.perf_counter() - t0
+
+            bars = count * len(tester.datetimes)
+            rows.append((count, load_time, run_time, bars / run_time))
+            print(f"{count:<6}{load_time:>9.3f}s{run_time:>9.2f}s{bars / run_time:>12,.0f}"
+                  f"{tester.cerebro.broker.getvalue():>16,.2f}")
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+性能剖析开销：未启用 / 只计时 / cProfile / tracemalloc
+
+同一份合成分钟线在独立的 spawn 子进程中分别回测，比较 cerebro.run 耗时；
+未启用时回测路径与不带 profile 参数完全相同，开销应在测量误差之内。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_profiling [K线数，默认200000]
+"""
+import sys
+import tempfile
+import time
+
+from benchmark.suite import _enter, _in_subprocess, _prepare_workdir
+
+MODES = {
+    '未启用': None,
+    '计时': {},
+    '计时 + cProfile': {'cprofile': True},
+    '计时 + tracemalloc': {'tracemalloc': True},
+}
+
+
+def _bench(kwargs, n, workdir):
+    _enter(workdir)
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.profiling import Profiler
+    from utils.store import BarStore
+
+    symbol = 'SYNPROF'
+    df = generate_bars(n, freq='min', seed=7)
+    if not BarStore().exists(symbol, '1m'):
+        BarStore().write(symbol, '1m', df)
+    beginning, end = df['datetime'].iloc[0].to_pydatetime(), df['datetime'].iloc[-1].to_pydatetime()
+    del df
+
+    profiler = None if kwargs is None else Profiler(**kwargs)
+    tester = BackTester("RB", symbol, '1m', beginning, end, headless=True, profile=profiler)
+    tester.add_strategy(DualMovingAverageStrategy)
+    t0 = time.perf_counter()
+    tester.cerebro.run()
+    elapsed = time.perf_counter() - t0
+    return {'run_s': elapsed, 'value': tester.cerebro.broker.getvalue()}
+
+
+def run(n=200_000):
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        for name, kwargs in MODES.items():
+            rows[name] = _in_subprocess(_bench, kwargs, n, workdir)
+
+    base = rows['未启用']
+    print(f"\n{'='*20} 性能剖析开销（{n:,} 根分钟线）{'='*20}")
+    print(f"{'方式':<22}{'回测':>9}{'开销':>9}{'期末资金':>14}")
+    for name, r in rows.items():
+        print(f"{name:<22}{r['run_s']:>8.1f}s{r['run_s'] / base['run_s'] - 1:>9.1%}{r['value']:>14.2f}")
+        assert r['value'] == base['value']
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
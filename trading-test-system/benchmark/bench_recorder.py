@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+逐K线记录的内存占用：Python 列表 vs Recorder 预分配数组
+
+之前：策略每根K线 portfolio_value.append(broker.getvalue())，不记录持仓、成交
+之后：Recorder 分析器记录账户价值 + 持仓 + 成交 + 已平仓交易
+
+每种方式在独立的 spawn 子进程中运行同一份合成分钟线，输出：
+记录数据本身占用的内存、序列化后的字节数（pickle 列表 vs RunRecord.dumps）、
+回测耗时与子进程峰值内存（ru_maxrss，含 backtrader 自身的行缓冲区）。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_recorder [K线数，默认1000000]
+"""
+import pickle
+import resource
+import sys
+import tempfile
+import time
+
+from benchmark.suite import _enter, _in_subprocess, _prepare_workdir
+
+
+def _bench(mode, n, workdir):
+    _enter(workdir)
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.store import BarStore
+
+    class ListStrategy(DualMovingAverageStrategy):
+        """复现之前的逐K线列表记录"""
+
+        def __init__(self):
+            super().__init__()
+            self.values = []
+
+        def next(self):
+            self.values.append(self.broker.getvalue())
+            super().next()
+
+    symbol = 'SYNREC'
+    df = generate_bars(n, freq='min', seed=5)
+    if not BarStore().exists(symbol, '1m'):
+        BarStore().write(symbol, '1m', df)
+    beginning, end = df['datetime'].iloc[0].to_pydatetime(), df['datetime'].iloc[-1].to_pydatetime()
+    del df
+
+    tester = BackTester("RB", symbol, '1m', beginning, end, headless=True)
+    if mode == 'list':
+        tester.cerebro.addstrategy(ListStrategy, **tester.contract_specs)
+    else:
+        tester.add_strategy(DualMovingAverageStrategy)
+    t0 = time.perf_counter()
+    strategy = tester.cerebro.run()[0]
+    elapsed = time.perf_counter() - t0
+
+    trades = strategy.analyzers.trades.get_analysis()
+    if mode == 'list':
+        values = strategy.values
+        nbytes = value_bytes = sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+        payload = len(pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL))
+        count = len(values)
+    else:
+        record = strategy.analyzers.recorder.result()
+        nbytes, value_bytes = record.nbytes, record.equity.nbytes
+        payload = len(record.dumps())
+        count = len(record.equity) - record.first_next
+    return {
+        'bars': count,
+        'nbytes': nbytes,
+        'value_bytes': value_bytes,
+        'payload': payload,
+        'trade_analysis_bytes': len(pickle.dumps(trades, protocol=pickle.HIGHEST_PROTOCOL)),
+        'run_s': elapsed,
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'value': tester.cerebro.broker.getvalue(),
+    }
+
+
+def run(n=1_000_000):
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        for name, mode in (('列表（之前）', 'list'), ('Recorder（之后）', 'recorder')):
+            rows[name] = _in_subprocess(_bench, mode, n, workdir)
+
+    print(f"\n{'='*20} 逐K线记录（{n:,} 根分钟线）{'='*20}")
+    print(f"{'方式':<16}{'记录内容':<22}{'内存':>10}{'序列化':>10}{'回测':>9}{'峰值内存':>10}")
+    contents = {'列表（之前）': '账户价值', 'Recorder（之后）': '价值+持仓+成交+交易'}
+    for name, r in rows.items():
+        print(f"{name:<16}{contents[name]:<22}{r['nbytes'] / 2**20:>8.1f}MB{r['payload'] / 2**20:>8.1f}MB"
+              f"{r['run_s']:>8.1f}s{r['peak_mb']:>8.0f}MB")
+    before, after = rows.values()
+    assert before['value'] == after['value']
+    print(f"仅账户价值：列表 {before['value_bytes'] / 2**20:.1f}MB -> 数组 {after['value_bytes'] / 2**20:.1f}MB"
+          f"（减少 {1 - after['value_bytes'] / before['value_bytes']:.1%}）；"
+          f"记录全部字段仍减少 {1 - after['nbytes'] / before['nbytes']:.1%}")
+    print(f"TradeAnalyzer 结果 pickle 后 {after['trade_analysis_bytes']:,} 字节")
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
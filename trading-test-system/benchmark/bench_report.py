@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+优化结果报告：原 seaborn 逐指标热力图 vs utils.report 一次聚合、一次绘图
+
+合成 50×100×10 = 50,000 行的三参数优化结果。原实现（按 plot_optimization_results 的旧写法）
+对每个指标做一次 pivot_table，用 seaborn 逐格标注数值并各自保存一张图；其三维曲面在完整的三参数网格上
+reshape 失败，这里不计入。新实现为 OptimizationReport.aggregate + write（9 张热力图 + 9 条边际曲线，一张 PNG + HTML）。
+两种方式各在独立的 spawn 子进程中运行，峰值内存取子进程的 ru_maxrss。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_report
+"""
+import resource
+import tempfile
+import time
+
+from benchmark.suite import _enter, _in_subprocess, _prepare_workdir
+
+
+def _results():
+    import numpy as np
+    import pandas as pd
+
+    from utils.analytics import METRICS
+
+    f, s, r = np.meshgrid(np.arange(5, 55), np.arange(20, 120), np.arange(60, 80, 2), indexing='ij')
+    df = pd.DataFrame({'fast_period': f.ravel(), 'slow_period': s.ravel(), 'rsi_upper': r.ravel()})
+    rng = np.random.default_rng(0)
+    for m in METRICS:
+        df[m] = rng.normal(size=len(df))
+    return df
+
+
+def _legacy(workdir):
+    _enter(workdir)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    from utils.analytics import METRICS
+
+    df = _results()
+    t0 = time.perf_counter()
+    params = [col for col in df.columns if col not in METRICS]
+    for metric in ['夏普比率', '最大回撤 (%)', '总收益率 (%)']:
+        pivot = df.pivot_table(values=metric, index=params[1], columns=params[0], aggfunc='mean')
+        plt.figure(figsize=(10, 8))
+        sns.heatmap(pivot, annot=True, fmt=".2f", cmap='RdYlGn', linewidths=0.5,
+                    annot_kws={'size': 8}, cbar_kws={'label': metric})
+        plt.tight_layout()
+        plt.savefig(f'热力图_{metric}.png')
+        plt.close()
+    return {'seconds': time.perf_counter() - t0, 'charts': 3,
+            'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def _batched(workdir):
+    _enter(workdir)
+    from utils.report import OptimizationReport
+
+    df = _results()
+    t0 = time.perf_counter()
+    report = OptimizationReport.aggregate(df)
+    aggregate = time.perf_counter() - t0
+    report.write('.')
+    return {'seconds': time.perf_counter() - t0, 'aggregate_s': aggregate,
+            'charts': len(report.pivots) + len(report.marginals),
+            'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        rows = {'原实现（seaborn 逐格标注）': _in_subprocess(_legacy, workdir),
+                'OptimizationReport': _in_subprocess(_batched, workdir)}
+
+    print(f"\n{'='*20} 优化结果报告（50,000 行）{'='*20}")
+    print(f"{'方式':<28}{'耗时':>9}{'图表数':>8}{'峰值内存':>12}")
+    for name, r in rows.items():
+        print(f"{name:<28}{r['seconds']:>8.2f}s{r['charts']:>8}{r['peak_mb']:>10.0f}MB")
+    print(f"其中聚合: {rows['OptimizationReport']['aggregate_s'] * 1e3:.1f}ms")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+tick重采样吞吐量与峰值内存
+
+对比两种方式把同一份tick CSV合成 1m/5m/15m/60m/daily 五个周期：
+1. 流式：utils.resample.ingest 按块读取，一次遍历生成全部周期
+2. 一次性：pd.read_csv 整个文件后逐周期 DataFrame.resample
+
+每种方式在独立的子进程中运行，峰值内存取子进程的 ru_maxrss（含解释器与依赖库本身）。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_resample [tick数，默认2000000]
+"""
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+PERIODS = ('1m', '5m', '15m', '60m', 'daily')
+_RULES = {'1m': '1min', '5m': '5min', '15m': '15min', '60m': '60min', 'daily': '1D'}
+
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _streaming(path, store_dir, chunksize):
+    from utils.resample import ingest
+    from utils.store import BarStore
+
+    stats = ingest(path, 'TICK', PERIODS, store=BarStore(store_dir), chunksize=chunksize,
+                   dtformat="%Y-%m-%d %H:%M:%S.%f")
+    return stats['seconds'], _peak_mb(), stats['bars']
+
+
+def _full_load(path):
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    frame = pd.read_csv(path)
+    frame['datetime'] = pd.to_datetime(frame['datetime'], format="%Y-%m-%d %H:%M:%S.%f")
+    frame = frame.set_index('datetime')
+    bars = {}
+    for period in PERIODS:
+        label = 'left' if period == 'daily' else 'right'
+        g = frame.resample(_RULES[period], closed='left', label=label)
+        df = pd.DataFrame({
+            'open': g['price'].first(), 'high': g['price'].max(), 'low': g['price'].min(),
+            'close': g['price'].last(), 'volume': g['volume'].sum(),
+            'openinterest': g['openinterest'].last(),
+        }).dropna()
+        bars[period] = len(df)
+    return time.perf_counter() - t0, _peak_mb(), bars
+
+
+def _measure(func, *args):
+    # 每次测量使用新进程，峰值内存互不影响
+    with mp.get_context('spawn').Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def run(n_ticks=2_000_000, chunksizes=(100_000, 500_000)):
+    from benchmark.synthetic import write_ticks_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ticks.csv')
+        t0 = time.perf_counter()
+        write_ticks_csv(path, n_ticks)
+        size = os.path.getsize(path) / 2**20
+        print(f"\n{'='*20} tick重采样（{n_ticks:,} 笔，{size:.0f} MB，生成 {time.perf_counter() - t0:.1f}s）{'='*20}")
+        print(f"{'方式':<20}{'耗时':>10}{'tick/秒':>14}{'峰值内存':>12}")
+
+        rows = []
+        cases = [(f"流式 chunksize={c:,}", _streaming, (path, os.path.join(tmp, f'store{c}'), c))
+                 for c in chunksizes]
+        cases.append(("一次性 pandas", _full_load, (path,)))
+        reference = None
+        for name, func, args in cases:
+            seconds, peak, bars = _measure(func, *args)
+            reference = reference or bars
+            assert bars == reference, (name, bars, reference)
+            rows.append((name, seconds, n_ticks / seconds, peak))
+            print(f"{name:<20}{seconds:>9.2f}s{n_ticks / seconds:>14,.0f}{peak:>12.0f}MB")
+        print("输出K线数: " + ", ".join(f"{p}={n}" for p, n in reference.items()))
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+进程池调度器 vs cerebro.run(maxcpus=n) 的扩展性对比
+
+分别用 1/2/4/8 个进程跑同一参数网格，输出耗时、每秒组合数，
+以及回传给主进程的结果体积（pickle字节数）。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_scheduler [进程数...]
+"""
+import contextlib
+import io
+import os
+import pickle
+import sys
+import time
+
+from engine.scheduler import OptimizationScheduler
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.sample import sample_tester
+
+PARAM_GRID = {
+    'fast_period': range(5, 10),
+    'slow_period': range(15, 20),
+    'rsi_upper': [70, 75, 80],
+}
+
+
+def _make_tester():
+    tester = sample_tester(headless=False)
+    tester.add_optimization_strategy(DualMovingAverageStrategy, PARAM_GRID)
+    return tester
+
+
+def _run_cerebro(workers):
+    tester = _make_tester()
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        results = tester.cerebro.run(maxcpus=workers)
+        elapsed = time.perf_counter() - t0
+    return elapsed, len(pickle.dumps(results))
+
+
+def _run_scheduler(workers):
+    tester = _make_tester()
+    scheduler = OptimizationScheduler(tester, workers=workers)
+    t0 = time.perf_counter()
+    records = [r for batch in scheduler.run(tester.opt_strategy, PARAM_GRID) for r in batch]
+    elapsed = time.perf_counter() - t0
+    return elapsed, len(pickle.dumps(records))
+
+
+def run(workers_list=(1, 2, 4, 8)):
+    combos = len(PARAM_GRID['fast_period']) * len(PARAM_GRID['slow_period']) * len(PARAM_GRID['rsi_upper'])
+    print(f"\n{'='*20} 并行优化扩展性（{combos} 个参数组合，本机 {os.cpu_count()} 核）{'='*20}")
+    print(f"{'进程数':<6}{'方式':<16}{'耗时':>9}{'组合/秒':>10}{'回传字节/组合':>14}")
+    rows = []
+    for workers in workers_list:
+        for name, func in (('cerebro maxcpus', _run_cerebro), ('进程池调度器', _run_scheduler)):
+            elapsed, nbytes = func(workers)
+            rows.append((workers, name, elapsed, nbytes))
+            print(f"{workers:<6}{name:<16}{elapsed:>8.2f}s{combos / elapsed:>10.1f}{nbytes / combos:>14,.0f}")
+    return rows
+
+
+if __name__ == "__main__":
+    run([int(w) for w in sys.argv[1:]] or (1, 2, 4, 8))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+横截面信号吞吐量：engine.signals 矩阵运算 vs 逐K线逐品种的纯Python循环
+
+每个品种一条合成日线（随机剔除约2%的K线以检验对齐）。信号为 20日动量（跳过最近1根）与 carry 的
+横截面 z-score 之和，每 5 根K线调仓一次，做多最高、做空最低的各 10% 品种。
+两种实现的目标权重必须完全一致；最后把前若干个品种的权重交给 PortfolioTester 回测，测交接耗时。
+
+用法（在 trading-test-system 目录下）: python -m benchmark.bench_signals [品种数，默认500] [每个品种的K线数，默认2520]
+"""
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark.synthetic import generate_bars
+from engine.portfolio import PortfolioTester
+from engine.signals import CrossSection, carry, cs_zscore, long_short, momentum, rebalance
+from strategy.target_position import TargetPositionStrategy
+from utils.store import BarStore
+
+LOOKBACK, SKIP, EVERY = 20, 1, 5
+
+
+def _pipeline(cs, n_side):
+    # 时间序列指标整列计算，横截面运算只在调仓的K线上做
+    close, settle = cs['close'], cs['settle']
+    mom = momentum(close, LOOKBACK, SKIP)[::EVERY]
+    score = cs_zscore(mom) + cs_zscore(carry(settle[::EVERY], close[::EVERY]))
+    weights = np.zeros(close.shape)
+    weights[::EVERY] = long_short(score, n_side)
+    return rebalance(weights, EVERY)
+
+
+def _zscore_row(values):
+    valid = [v for v in values if not math.isnan(v)]
+    if len(valid) < 2:
+        return [math.nan] * len(values)
+    mean = sum(valid) / len(valid)
+    std = math.sqrt(sum((v - mean) ** 2 for v in valid) / len(valid))
+    return [(v - mean) / std if std > 0 and not math.isnan(v) else math.nan for v in values]
+
+
+def _loop(close, settle, n_side):
+    """逐K线逐品种计算，作为对照"""
+    n, m = close.shape
+    weights = np.zeros((n, m))
+    for t in range(0, n, EVERY):
+        mom = [close[t - SKIP, j] / close[t - SKIP - LOOKBACK, j] - 1 if t >= SKIP + LOOKBACK else math.nan
+               for j in range(m)]
+        car = [(settle[t, j] - close[t, j]) / close[t, j] for j in range(m)]
+        score = [a + b for a, b in zip(_zscore_row(mom), _zscore_row(car))]
+        ranked = sorted((s, j) for j, s in enumerate(score) if not math.isnan(s))
+        if len(ranked) >= 2 * n_side:
+            for _, j in ranked[-n_side:]:
+                weights[t, j] = 0.5 / n_side
+            for _, j in ranked[:n_side]:
+                weights[t, j] = -0.5 / n_side
+        weights[t:t + EVERY] = weights[t]
+    return weights
+
+
+def run(n_symbols=500, n_bars=2520, handoff=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, 'store'))
+        symbols = [f"SYN{i:03d}" for i in range(n_symbols)]
+        for i, symbol in enumerate(symbols):
+            df = generate_bars(n_bars, freq='D', seed=i)
+            keep = np.random.default_rng(1000 + i).random(n_bars) > 0.02
+            keep[0] = True
+            store.write(symbol, 'daily', df[keep])
+        beginning = df['datetime'].iloc[0].to_pydatetime()
+        end = df['datetime'].iloc[-1].to_pydatetime()
+
+        t0 = time.perf_counter()
+        cs = CrossSection.from_store(symbols, 'daily', beginning, end, store=store)
+        load_time = time.perf_counter() - t0
+
+        n_side = max(n_symbols // 10, 1)
+        t0 = time.perf_counter()
+        weights = _pipeline(cs, n_side)
+        signal_time = time.perf_counter() - t0
+
+        # 对照实现使用与 CrossSection 相同的对齐结果，只比较信号计算
+        t0 = time.perf_counter()
+        expected = _loop(cs['close'], cs['settle'], n_side)
+        loop_time = time.perf_counter() - t0
+        assert np.array_equal(weights != 0, expected != 0) and np.allclose(weights, expected)
+
+        chosen = symbols[:handoff]
+        tester = PortfolioTester(chosen, 'daily', beginning, end, cash=1_000_000,
+                                 names={s: 'RB' for s in chosen}, store=store)
+        sub = CrossSection.from_tester(tester)
+        tester.add_strategy(TargetPositionStrategy, targets=_pipeline(sub, max(handoff // 10, 1)))
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = tester.cerebro.run()[0]
+        run_time = time.perf_counter() - t0
+
+    cells = cs.shape[0] * cs.shape[1]
+    print(f"\n{'='*20} 横截面信号（{cs.shape[1]} 个品种 × {cs.shape[0]} 根日线）{'='*20}")
+    print(f"加载对齐: {load_time:.2f}s")
+    print(f"矩阵信号: {signal_time * 1e3:.1f}ms（{cells / signal_time:,.0f} 格/秒）")
+    print(f"逐K线循环: {loop_time:.2f}s（{cells / loop_time:,.0f} 格/秒），加速 {loop_time / signal_time:.0f}x")
+    print(f"交接 PortfolioTester（{handoff} 个品种）: 回测 {run_time:.2f}s，调仓 {result.rebalances} 次，"
+          f"期末资金 {tester.cerebro.broker.getvalue():,.2f}")
+    return {'load_s': load_time, 'signal_s': signal_time, 'loop_s': loop_time, 'backtest_s': run_time}
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500, int(sys.argv[2]) if len(sys.argv) > 2 else 2520)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+列式存储 vs CSV 数据源的加载耗时对比
+
+用法: python -m benchmark.bench_store [K线数量，默认1000000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import backtrader as bt
+from backtrader import TimeFrame
+from backtrader.feeds import GenericCSVData
+
+from benchmark.synthetic import generate_bars, write_csv
+from utils.store import BarStore, BarStoreData, convert_csv
+
+
+def _preload(feed):
+    """与cerebro预加载数据时相同的调用，返回耗时"""
+    bt.Cerebro().adddata(feed)  # 数据源需要挂在cerebro上才能启动
+    t0 = time.perf_counter()
+    feed._start()
+    feed.preload()
+    elapsed = time.perf_counter() - t0
+    return elapsed, feed.buflen()
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "SYN_1m.csv")
+        df = generate_bars(n, freq='min')
+        write_csv(df, csv_path)
+        window = (df['datetime'].iloc[n * 9 // 10].to_pydatetime(), df['datetime'].iloc[-1].to_pydatetime())
+
+        store = BarStore(os.path.join(tmp, 'store'))
+        t0 = time.perf_counter()
+        convert_csv(csv_path, store)
+        convert_time = time.perf_counter() - t0
+
+        def csv_feed(**kw):
+            return GenericCSVData(dataname=csv_path, nullvalue=0, dtformat="%Y-%m-%d %H:%M:%S",
+                                  timeframe=TimeFrame.Minutes, compression=1,
+                                  datetime=0, open=1, high=2, low=3, close=4, volume=5,
+                                  openinterest=6, **kw)
+
+        def store_feed(**kw):
+            return BarStoreData(symbol='SYN', period='1m', store=store,
+                                timeframe=TimeFrame.Minutes, compression=1, **kw)
+
+        rows = [
+            ('CSV 全量', *_preload(csv_feed())),
+            ('列式存储 全量', *_preload(store_feed())),
+            ('CSV 最后10%', *_preload(csv_feed(fromdate=window[0], todate=window[1]))),
+            ('列式存储 最后10%', *_preload(store_feed(fromdate=window[0], todate=window[1]))),
+        ]
+
+    print(f"\n{'='*20} 数据加载基准（{n} 根分钟线）{'='*20}")
+    print(f"CSV -> 列式存储 一次性转换: {convert_time:.2f}s")
+    for name, elapsed, bars in rows:
+        print(f"{name:<14} {elapsed:>8.3f}s  {bars:>9} 根  {bars / elapsed:>12,.0f} 根/秒")
+    print(f"全量加载加速比: {rows[0][1] / rows[1][1]:.1f}x  区间加载加速比: {rows[2][1] / rows[3][1]:.1f}x")
+    return rows
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+回测热点路径基准套件
+
+在合成分钟线（默认 1k / 100k / 1M 根）上测量：
+    load_s / load_bars_per_s   列式存储数据源预加载耗时与速度
+    run_s / bars_per_s         BackTester + DualMovingAverageStrategy 单次回测耗时与速度
+    combos_per_s               run_optimization(maxcpus=1) 每秒完成的参数组合数
+    peak_mb                    该规模子进程的峰值内存（ru_maxrss）
+    final_value                单次回测期末资金，用于确认优化没有改变结果
+另有与规模无关的微基准 commission_calls_per_s（GenericCommInfo._getcommission），
+以及启动开销（python -X importtime 统计的模块累计导入耗时、`cli.py --help` 的进程总耗时）：
+    import_cli_ms / import_backtest_runner_ms / cli_help_s
+
+每个规模在独立的 spawn 子进程和临时目录中运行，不访问网络、不绘图。
+结果写成JSON；指定基线时逐项比较，任何指标变差超过阈值即返回非0退出码。
+
+用法（在 trading-test-system 目录下）:
+    python -m benchmark.suite --save-baseline              # 生成基线 benchmark/baseline.json
+    python -m benchmark.suite --sizes 1k 100k              # 与基线比较，默认阈值 10%
+    python -m benchmark.suite --threshold 0.2 --output out.json
+    python -m benchmark.suite --sizes                      # 只测微基准与启动开销
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+# 规模越大网格越小，控制总耗时
+OPT_GRIDS = {
+    '1k': {'fast_period': [5, 6, 7, 8, 9, 10], 'slow_period': [20, 30], 'rsi_upper': [70, 80]},
+    '100k': {'fast_period': [5, 7], 'slow_period': [20, 30]},
+    '1m': {'fast_period': [5, 7]},
+}
+HIGHER_IS_BETTER = ('load_bars_per_s', 'bars_per_s', 'combos_per_s', 'commission_calls_per_s')
+LOWER_IS_BETTER = ('peak_mb', 'import_cli_ms', 'import_backtest_runner_ms', 'cli_help_s')
+STARTUP_MODULES = ('cli', 'backtest_runner')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmark', 'results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmark', 'baseline.json')
+
+
+def _prepare_workdir(tmp):
+    """临时工作目录：只带佣金配置，行情与结果库都写在这里"""
+    os.makedirs(os.path.join(tmp, 'data', 'commission'))
+    shutil.copy(os.path.join(ROOT, 'data', 'commission', 'commission.json'),
+                os.path.join(tmp, 'data', 'commission', 'commission.json'))
+    return tmp
+
+
+def _enter(workdir):
+    # spawn 子进程：回到仓库根目录的导入路径，在临时目录中以相对路径读写 data/
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    os.chdir(workdir)
+
+
+def _bench_size(label, n, workdir):
+    """在子进程中测量一个规模，返回指标字典"""
+    _enter(workdir)
+    import backtrader as bt
+
+    from backtest_runner import BackTester
+    from benchmark.synthetic import generate_bars
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.store import BarStore, BarStoreData, period_timeframe
+
+    symbol, period = f"SYN{label}", '1m'
+    df = generate_bars(n, freq='min', seed=7)
+    BarStore().write(symbol, period, df)
+    beginning = df['datetime'].iloc[0].to_pydatetime()
+    end = df['datetime'].iloc[-1].to_pydatetime()
+    del df
+    metrics = {'bars': n}
+
+    timeframe, compression = period_timeframe(period)
+    feed = BarStoreData(symbol=symbol, period=period, timeframe=timeframe, compression=compression)
+    bt.Cerebro().adddata(feed)
+    t0 = time.perf_counter()
+    feed._start()
+    feed.preload()
+    metrics['load_s'] = time.perf_counter() - t0
+    metrics['load_bars_per_s'] = n / metrics['load_s']
+    del feed
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tester = BackTester("RB", symbol, period, beginning, end)
+        tester.add_strategy(DualMovingAverageStrategy)
+        t0 = time.perf_counter()
+        tester.cerebro.run()
+        metrics['run_s'] = time.perf_counter() - t0
+    metrics['bars_per_s'] = n / metrics['run_s']
+    metrics['final_value'] = round(tester.cerebro.broker.getvalue(), 4)
+    del tester
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tester = BackTester("RB", symbol, period, beginning, end)
+        tester.add_optimization_strategy(DualMovingAverageStrategy, OPT_GRIDS[label])
+        t0 = time.perf_counter()
+        tester.run_optimization(maxcpus=1)
+        elapsed = time.perf_counter() - t0
+    combos = len(tester._grid_keys())
+    metrics['opt_combos'] = combos
+    metrics['combos_per_s'] = combos / elapsed
+
+    metrics['peak_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return metrics
+
+
+def _bench_commission(workdir, calls=200_000):
+    _enter(workdir)
+    from utils.commission import GenericCommInfo, load_commission
+
+    comm = GenericCommInfo(**load_commission('RB')[0])
+    t0 = time.perf_counter()
+    for i in range(calls):
+        comm._getcommission(1 + i % 5, 3500.0 + i % 50, False)
+    return calls / (time.perf_counter() - t0)
+
+
+def _import_ms(module):
+    """python -X importtime 中该模块的累计导入耗时（毫秒），在全新解释器中测量"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=ROOT,
+                          capture_output=True, text=True, env={**os.environ, 'MPLBACKEND': 'Agg'}, check=True)
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"importtime 输出中没有 {module}")
+
+
+def _bench_startup(repeat=5):
+    """启动开销取多次测量的最小值，减少系统抖动的影响"""
+    startup = {f"import_{m}_ms": min(_import_ms(m) for _ in range(repeat)) for m in STARTUP_MODULES}
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, 'cli.py', '--help'], cwd=ROOT, capture_output=True, check=True)
+        times.append(time.perf_counter() - t0)
+    startup['cli_help_s'] = min(times)
+    return startup
+
+
+def _in_subprocess(func, *args):
+    # 每个测量独占一个新进程：峰值内存互不影响，也不共享指标缓存
+    with mp.get_context('spawn').Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def run(sizes=tuple(SIZES)):
+    """运行基准套件，返回可写成JSON的结果"""
+    import backtrader as bt
+    import numpy as np
+    import pandas as pd
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = _prepare_workdir(tmp)
+        for label in sizes:
+            t0 = time.perf_counter()
+            results[label] = _in_subprocess(_bench_size, label, SIZES[label], workdir)
+            m = results[label]
+            print(f"{label:>5}: 加载 {m['load_bars_per_s']:>12,.0f} 根/秒  回测 {m['bars_per_s']:>9,.0f} 根/秒  "
+                  f"优化 {m['combos_per_s']:>7.2f} 组合/秒  峰值内存 {m['peak_mb']:>6.0f}MB  "
+                  f"期末资金 {m['final_value']:.2f}  （{time.perf_counter() - t0:.1f}s）")
+        micro = {'commission_calls_per_s': _in_subprocess(_bench_commission, workdir)}
+        print(f"micro: GenericCommInfo._getcommission {micro['commission_calls_per_s']:,.0f} 次/秒")
+    startup = _bench_startup()
+    print("startup: " + "  ".join(f"import {m} {startup[f'import_{m}_ms']:.1f}ms" for m in STARTUP_MODULES)
+          + f"  cli.py --help {startup['cli_help_s']:.3f}s")
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'backtrader': bt.__version__,
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'results': results,
+        'micro': micro,
+        'startup': startup,
+    }
+
+
+def _flatten(report):
+    flat = {f"{label}.{k}": v for label, m in report.get('results', {}).items() for k, v in m.items()}
+    for section in ('micro', 'startup'):
+        flat.update({f"{section}.{k}": v for k, v in report.get(section, {}).items()})
+    return flat
+
+
+def compare(current, baseline, threshold=0.10):
+    """逐项对比当前结果与基线
+
+    Returns:
+        list[dict]: 每项指标的基线值、当前值、变化比例与是否回退
+    """
+    rows = []
+    cur, base = _flatten(current), _flatten(baseline)
+    for key, value in cur.items():
+        metric = key.split('.', 1)[1]
+        if key not in base:
+            continue
+        old = base[key]
+        if metric == 'final_value':
+            rows.append({'metric': key, 'baseline': old, 'current': value, 'change': 0.0,
+                         'regression': value != old})
+            continue
+        change = value / old - 1
+        if metric in HIGHER_IS_BETTER:
+            regression = change < -threshold
+        elif metric in LOWER_IS_BETTER:
+            regression = change > threshold
+        else:
+            continue
+        rows.append({'metric': key, 'baseline': old, 'current': value, 'change': change,
+                     'regression': regression})
+    return rows
+
+
+def _print_comparison(rows, threshold):
+    print(f"\n{'='*20} 与基线对比（阈值 {threshold:.0%}）{'='*20}")
+    print(f"{'指标':<32}{'基线':>14}{'当前':>14}{'变化':>9}")
+    for r in rows:
+        flag = '  <-- 回退' if r['regression'] else ''
+        note = '结果不一致' if r['metric'].endswith('final_value') and r['regression'] else f"{r['change']:+.1%}"
+        print(f"{r['metric']:<32}{r['baseline']:>14,.2f}{r['current']:>14,.2f}{note:>9}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回测热点路径基准套件")
+    parser.add_argument('--sizes', nargs='*', default=list(SIZES), choices=list(SIZES))
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="结果JSON路径")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线JSON路径")
+    parser.add_argument('--threshold', type=float, default=0.10, help="允许的变差比例")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至 {args.output}")
+
+    if args.save_baseline:
+        shutil.copy(args.output, args.baseline)
+        print(f"基线已保存至 {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"未找到基线 {args.baseline}，使用 --save-baseline 生成")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.threshold)
+    _print_comparison(rows, args.threshold)
+    regressions = [r['metric'] for r in rows if r['regression']]
+    if regressions:
+        print(f"\n性能回退: {', '.join(regressions)}")
+        return 1
+    print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
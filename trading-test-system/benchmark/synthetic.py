@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+离线基准测试用的合成行情（几何布朗运动 + 随机K线振幅）
+"""
+import numpy as np
+import pandas as pd
+
+
+def generate_bars(n, freq='min', start='2020-01-01', price=3500.0, seed=0):
+    """生成n根OHLCV K线，列格式与 data/ 下的CSV一致
+
+    Args:
+        n (int): K线数量
+        freq (str, optional): pandas频率字符串，'min' 为分钟线，'D' 为日线
+        start (str, optional): 起始时间
+        price (float, optional): 初始价格
+        seed (int, optional): 随机种子
+
+    Returns:
+        pd.DataFrame: datetime/open/high/low/close/volume/openinterest/settle
+    """
+    rng = np.random.default_rng(seed)
+    vol = 0.0005 if freq == 'min' else 0.015
+    close = price * np.exp(np.cumsum(rng.normal(0.0, vol, n)))
+    close = np.round(close)
+    open_ = np.concatenate(([price], close[:-1]))
+    spread = np.abs(rng.normal(0.0, vol, n)) * close
+    high = np.round(np.maximum(open_, close) + spread)
+    low = np.round(np.minimum(open_, close) - spread)
+
+    return pd.DataFrame({
+        'datetime': pd.date_range(start, periods=n, freq=freq),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.integers(100, 5000, n),
+        'openinterest': rng.integers(1000, 100000, n),
+        'settle': np.round((high + low + close) / 3),
+    })
+
+
+def write_csv(df, path):
+    """写成与 AkshareCollector.save_to_csv 相同的时间格式"""
+    out = df.copy()
+    out['datetime'] = out['datetime'].dt.strftime("%Y-%m-%d %H:%M:%S")
+    out.to_csv(path, index=False)
+    return path
+
+
+def generate_ticks(n, start='2020-01-01 09:00:00', price=3500.0, interval=2.0, seed=0):
+    """生成n笔tick成交，间隔服从均值为 interval 秒的指数分布
+
+    Returns:
+        pd.DataFrame: datetime/price/volume/openinterest
+    """
+    rng = np.random.default_rng(seed)
+    gaps = np.maximum(rng.exponential(interval * 1e3, n), 1).astype(np.int64)
+    ts = pd.Timestamp(start).value + np.cumsum(gaps) * 10**6  # 毫秒精度
+    prices = np.round(price * np.exp(np.cumsum(rng.normal(0.0, 0.0002, n))))
+    return pd.DataFrame({
+        'datetime': pd.to_datetime(ts),
+        'price': prices,
+        'volume': rng.integers(1, 50, n),
+        'openinterest': 100000 + np.cumsum(rng.integers(-5, 6, n)),
+    })
+
+
+def write_ticks_csv(path, n, chunksize=1_000_000, seed=0):
+    """分块生成并写出n笔tick，内存占用与 chunksize 相关而与n无关"""
+    start, price, oi = pd.Timestamp('2020-01-01 09:00:00'), 3500.0, 0
+    for i in range(0, n, chunksize):
+        df = generate_ticks(min(chunksize, n - i), start=start, price=price, seed=seed + i)
+        df['openinterest'] += oi
+        start, price, oi = df['datetime'].iloc[-1], df['price'].iloc[-1], df['openinterest'].iloc[-1] - 100000
+        df['datetime'] = df['datetime'].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        df.to_csv(path, index=False, header=i == 0, mode='w' if i == 0 else 'a')
+    return path
+
+
+class StubDailySource:
+    """离线替代 akshare.futures_zh_daily_sina 的日线数据源
+
+    每个合约由代码决定随机种子，历史固定；end 之后的K线视为"尚未发生"，
+    调大 end 即可模拟新交易日。支持 start_date 参数，只返回该日期之后的K线。
+
+    Args:
+        end (str): 数据截止日期（含）
+        latency (float, optional): 每次调用的模拟网络延迟（秒）
+        fail_rate (float, optional): 每次调用抛出 ConnectionError 的概率
+        seed (int, optional): 失败模拟的随机种子
+    """
+
+    def __init__(self, end='2025-06-01', latency=0.0, fail_rate=0.0, seed=0):
+        import random
+        import threading
+
+        self.end = pd.Timestamp(end)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self.rows = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._history = {}
+
+    def _full(self, symbol):
+        if symbol not in self._history:
+            import zlib
+            df = generate_bars(2000, freq='B', start='2020-01-01', seed=zlib.crc32(symbol.encode()))
+            self._history[symbol] = df.rename(columns={'datetime': 'date', 'openinterest': 'hold'})
+        return self._history[symbol]
+
+    def warmup(self, symbols):
+        """预先生成各合约历史，基准测试中不计入合成数据的耗时"""
+        for symbol in symbols:
+            self._full(symbol)
+        return self
+
+    def __call__(self, symbol, start_date=None):
+        import time
+
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.fail_rate
+            df = self._full(symbol)
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError(f"模拟请求失败: {symbol}")
+        mask = df['date'] <= self.end
+        if start_date is not None:
+            mask &= df['date'] > pd.Timestamp(start_date)
+        out = df[mask].copy()
+        out['date'] = out['date'].dt.strftime("%Y-%m-%d")
+        with self._lock:
+            self.rows += len(out)
+        return out
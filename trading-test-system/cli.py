@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+回测命令行入口
+
+模块顶层只导入标准库，参数解析（含 --help 和参数错误）不加载 backtrader/numpy/pandas；
+策略按名称在运行时导入，优化方式对应的引擎也只在选中时导入。
+
+用法（在 trading-test-system 目录下）:
+    python cli.py RB2505 --start 2024-05-01 --end 2025-06-01
+    python cli.py RB2505 --param fast_period=5 --param rsi_upper=75 --plot
+    python cli.py RB2505 --slippage pct --slip 0.0005 --participation 0.01
+    python cli.py RB2505 --profile profile.json --cprofile
+    python cli.py RB2505 --param fast_period=5 --cache
+    python cli.py RB2505 --optimize grid --grid fast_period=5:10 --grid slow_period=15:20 \\
+        --grid rsi_upper=70,75,80 --workers 4
+    python cli.py RB2505 --optimize tpe --budget 25 --grid fast_period=5:10 --grid slow_period=15:20
+    python cli.py RB2505 --optimize vectorized --grid fast_period=5:10 --grid slow_period=15:20 \\
+        --monte-carlo 10000 --mc-method trades
+"""
+import argparse
+import ast
+import importlib
+from datetime import datetime, timedelta
+
+STRATEGIES = {
+    'dual_ma': 'strategy.dual_ma:DualMovingAverageStrategy',
+}
+OPTIMIZERS = ('grid', 'parallel', 'vectorized', 'tpe', 'halving')
+
+
+def load_strategy(spec):
+    """策略名（见 STRATEGIES）或 module:Class"""
+    module, _, name = STRATEGIES.get(spec, spec).partition(':')
+    if not name:
+        raise argparse.ArgumentTypeError(f"未知策略: {spec}（可选 {', '.join(STRATEGIES)} 或 module:Class）")
+    return getattr(importlib.import_module(module), name)
+
+
+def _literal(text):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_param(text):
+    """key=value -> (key, value)，value 按Python字面量解析"""
+    key, sep, value = text.partition('=')
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"参数格式应为 key=value: {text}")
+    return key, _literal(value)
+
+
+def parse_grid(text):
+    """key=start:stop[:step]（同 range）或 key=v1,v2,... -> (key, list)"""
+    key, sep, value = text.partition('=')
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"网格格式应为 key=start:stop[:step] 或 key=v1,v2: {text}")
+    if ':' in value:
+        try:
+            return key, list(range(*(int(v) for v in value.split(':'))))
+        except (TypeError, ValueError):
+            raise argparse.ArgumentTypeError(f"区间必须为整数 start:stop[:step]: {text}")
+    return key, [_literal(v) for v in value.split(',') if v]
+
+
+def parse_date(text):
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {text}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="期货策略回测与参数优化")
+    parser.add_argument('symbol', nargs='?', default='RB2505', help="合约代码，对应 data/{symbol}_{period}.csv 或列式存储")
+    parser.add_argument('--name', help="commission.json 中的品种名，缺省由合约代码推断（RB2505 -> RB）")
+    parser.add_argument('--period', default='daily', help="周期：daily/weekly/monthly 或 1m/5m/60m 等")
+    parser.add_argument('--start', type=parse_date, help="开始日期，缺省为结束日期前200天")
+    parser.add_argument('--end', type=parse_date, help="结束日期，缺省为今天")
+    parser.add_argument('--cash', type=float, default=10000, help="初始资金")
+    parser.add_argument('--strategy', default='dual_ma', help=f"策略：{', '.join(STRATEGIES)} 或 module:Class")
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='KEY=VALUE',
+                        help="固定策略参数，可重复")
+
+    fill = parser.add_argument_group('成交模型')
+    fill.add_argument('--slippage', choices=('fixed', 'pct', 'volume'),
+                      help="fixed: 固定价格单位; pct: 成交价比例; volume: 按成交手数/K线成交量的冲击成本")
+    fill.add_argument('--slip', type=float, default=0.0, help="滑点参数：价格单位 / 比例 / 冲击系数")
+    fill.add_argument('--participation', type=float, help="单根K线最多成交该K线成交量的比例，超出部分顺延")
+
+    opt = parser.add_argument_group('参数优化')
+    opt.add_argument('--optimize', choices=OPTIMIZERS,
+                     help="grid: cerebro 网格; parallel: 共享内存进程池; vectorized: 向量化（仅双均线）; "
+                          "tpe/halving: 按预算自适应搜索")
+    opt.add_argument('--grid', type=parse_grid, action='append', default=[], metavar='KEY=RANGE',
+                     help="参数网格，如 fast_period=5:10 或 rsi_upper=70,75,80，可重复")
+    opt.add_argument('--workers', type=int, default=1, help="进程数（grid/parallel）")
+    opt.add_argument('--budget', type=int, help="tpe/halving 的评估预算")
+    opt.add_argument('--monte-carlo', type=int, metavar='N', help="优化后对最优参数做 N 次蒙特卡洛模拟")
+    opt.add_argument('--mc-method', default='blocks', choices=('trades', 'blocks'),
+                     help="trades: 交易自助法; blocks: 收益率块自助法")
+
+    cache = parser.add_argument_group('结果缓存')
+    cache.add_argument('--cache', action='store_true',
+                       help="单次回测使用结果缓存：数据、佣金、策略源码与参数都相同时直接返回保存的结果")
+    cache.add_argument('--cache-max-mb', type=float, default=256, help="结果缓存大小上限（MB），超出按最近使用淘汰")
+    cache.add_argument('--clear-cache', action='store_true', help="运行前清空当前策略的缓存结果")
+
+    out = parser.add_argument_group('输出')
+    out.add_argument('--plot', action='store_true', help="回测后绘制K线图 / 优化后生成参数优化报告")
+    out.add_argument('--report', action='store_true', help="优化后生成静态 HTML/PNG 报告（无界面模式也可用）")
+    out.add_argument('--headless', action='store_true', help="无界面批量模式：不绘图，日志只保留 WARNING 及以上")
+    out.add_argument('--log-level', default=None, choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    out.add_argument('--log-format', default='console', choices=('console', 'json'))
+    out.add_argument('--profile', metavar='PATH', help="性能剖析：阶段与回调耗时，汇总各工作进程后导出为JSON")
+    out.add_argument('--cprofile', action='store_true', help="性能剖析时用 cProfile 记录主循环的函数耗时")
+    out.add_argument('--tracemalloc', action='store_true', help="性能剖析时用 tracemalloc 记录主循环的内存分配")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.optimize and not args.grid:
+        parser.error("--optimize 需要至少一个 --grid")
+    if args.slippage and not args.slip:
+        parser.error("--slippage 需要 --slip")
+    if args.monte_carlo and not args.optimize:
+        parser.error("--monte-carlo 需要与 --optimize 一起使用")
+    if (args.cprofile or args.tracemalloc) and not args.profile:
+        parser.error("--cprofile/--tracemalloc 需要 --profile")
+    try:
+        strategy = load_strategy(args.strategy)
+    except (ImportError, AttributeError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    # 以下才导入回测相关模块
+    from utils.logger import configure
+    configure(level=args.log_level or ('WARNING' if args.headless else 'INFO'), fmt=args.log_format)
+
+    from backtest_runner import BackTester
+    from utils.commission import product_name
+
+    fill_model = None
+    if args.slippage or args.participation:
+        from utils.fills import FillModel
+        try:
+            fill_model = FillModel(args.slippage, args.slip, args.participation)
+        except ValueError as e:
+            parser.error(str(e))
+
+    profiler = None
+    if args.profile:
+        from utils.profiling import Profiler
+        profiler = Profiler(cprofile=args.cprofile, tracemalloc=args.tracemalloc)
+
+    run_cache = None
+    if args.cache or args.clear_cache:
+        from utils.results import RunCache
+        run_cache = RunCache(max_bytes=int(args.cache_max_mb * 1024 * 1024))
+        if args.clear_cache:
+            print(f"已清除 {run_cache.invalidate(strategy)} 条缓存结果")
+
+    end = args.end or datetime.today()
+    start = args.start or end - timedelta(days=200)
+    tester = BackTester(args.name or product_name(args.symbol), args.symbol, args.period, start, end,
+                        cash=args.cash, headless=args.headless, fill_model=fill_model, profile=profiler,
+                        cache=run_cache if args.cache else None)
+    fixed = dict(args.param)
+
+    if not args.optimize:
+        tester.add_strategy(strategy, **fixed)
+        result = tester.run(plot=args.plot)
+        _export_profile(profiler, args.profile)
+        return result
+
+    # 固定参数作为单值维度并入网格
+    grid = {**{k: [v] for k, v in fixed.items()}, **dict(args.grid)}
+    if args.optimize == 'vectorized':
+        from strategy.dual_ma import DualMovingAverageStrategy
+        if strategy is not DualMovingAverageStrategy:
+            parser.error(f"vectorized 只支持 dual_ma，{strategy.__name__} 请使用 grid/parallel/tpe/halving")
+        if fill_model is not None:
+            parser.error("vectorized 不支持成交模型，请使用 grid/parallel")
+        if profiler is not None:
+            parser.error("vectorized 不经过 backtrader，无法性能剖析，请使用 grid/parallel/tpe/halving")
+        result = tester.run_vectorized_optimization(grid)
+    else:
+        tester.add_optimization_strategy(strategy, grid)
+        if args.optimize == 'grid':
+            result = tester.run_optimization(maxcpus=args.workers)
+        elif args.optimize == 'parallel':
+            result = tester.run_parallel_optimization(workers=args.workers)
+        else:
+            result = tester.run_adaptive_optimization(budget=args.budget, method=args.optimize)
+    if args.monte_carlo:
+        tester.run_monte_carlo(args.monte_carlo, method=args.mc_method, workers=args.workers)
+    if args.report or args.plot and not args.headless:
+        tester.plot_optimization_results()
+    _export_profile(profiler, args.profile)
+    return result
+
+
+def _export_profile(profiler, path):
+    if profiler is not None:
+        print(profiler.summary())
+        print(f"\n性能剖析已保存至 {profiler.to_json(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+实时/模拟盘运行时：DualMovingAverageStrategy 的逐K线增量执行
+
+回测每次都用 backtrader 跑完整段历史；这里每到一根新K线只做 O(1) 的增量计算：
+1. 指标：IncrementalSMA / IncrementalRSI / IncrementalCrossOver，与回测指标同口径
+2. 交易规则：直接调用 DualMovingAverageStrategy 的 exit_signal / entry_signal /
+   position_size / stop_price
+3. 撮合：PaperBroker 按 BackBroker 对期货（stocklike=False）的处理模拟成交——
+   提交时保证金检查、市价单以次根开盘价成交、止损单跳空按开盘价成交、逐日盯市，
+   同一段行情上的成交与期末资金与回测一致
+4. 状态（资金、持仓、entry_price、止损单、挂单、指标窗口）每根K线后原子写入JSON，
+   重启时从状态文件恢复，并跳过已处理过的K线
+
+K线来源可替换：任何产出 Bar 的可迭代对象都可以传给 run()。FileReplaySource
+用本地数据回放代替实时行情，QueueSource 接收其他线程推送的K线。
+
+运行 `python -m engine.live` 会回放 RB2505 日线，与 BackTester 对比成交和期末资金，
+验证中途重启后结果不变，并输出每根K线的决策延迟。
+"""
+import json
+import logging
+import math
+import os
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+from backtrader import date2num
+
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.commission import GenericCommInfo
+from utils.indicators import IncrementalCrossOver, IncrementalRSI, IncrementalSMA
+from utils.logger import get_logger
+from utils.store import BarStore, ensure_store
+
+LOG = get_logger('live')
+
+Bar = namedtuple('Bar', ['datetime', 'open', 'high', 'low', 'close', 'volume'])
+
+STATE_VERSION = 1
+
+
+class FileReplaySource:
+    """从本地数据回放K线，代替实时行情
+
+    Args:
+        symbol (str): 合约代码，对应 data/{symbol}_{period}.csv 或列式存储
+        period (str): 周期
+        beginning, end (datetime, optional): 回放区间
+        interval (float, optional): 相邻两根K线之间等待的秒数，0 为尽快回放. Defaults to 0.
+        store (BarStore, optional): 列式存储，默认 data/store
+    """
+
+    def __init__(self, symbol, period, beginning=None, end=None, interval=0.0, store=None):
+        self.symbol = symbol
+        self.period = period
+        self.beginning = beginning
+        self.end = end
+        self.interval = interval
+        fp = os.path.join("data", f"{symbol}_{period}.csv")
+        self.store = ensure_store(fp, symbol, period, store) if os.path.exists(fp) else store or BarStore()
+
+    def __iter__(self):
+        bars = self.store.load(self.symbol, self.period, self.beginning, self.end)
+        dts = np.asarray(bars['datetime']).astype('datetime64[ns]').astype('datetime64[us]').astype(object)
+        cols = [np.asarray(bars[c], dtype=np.float64).tolist() for c in Bar._fields[1:]]
+        for i, dt in enumerate(dts):
+            if self.interval and i:
+                time.sleep(self.interval)
+            yield Bar(dt, *(c[i] for c in cols))
+
+
+class QueueSource:
+    """从 queue.Queue 读取其他线程推送的K线，收到 None 时结束"""
+
+    def __init__(self, queue, timeout=None):
+        self.queue = queue
+        self.timeout = timeout
+
+    def __iter__(self):
+        while True:
+            bar = self.queue.get(timeout=self.timeout)
+            if bar is None:
+                return
+            yield bar
+
+
+def _position_update(size, price, dsize, dprice):
+    """bt.Position.update 的标量版本，返回 (新持仓, 新均价, opened, closed)"""
+    new = size + dsize
+    if new == 0:
+        return 0.0, 0.0, 0.0, dsize
+    if size == 0:
+        return new, dprice, dsize, 0.0
+    if size * dsize > 0:
+        return new, (price * size + dsize * dprice) / new, dsize, 0.0
+    if size * new > 0:
+        return new, price, 0.0, dsize
+    return new, dprice, new, -size
+
+
+class PaperBroker:
+    """单品种期货模拟撮合，复刻 BackBroker 对市价单和止损卖单的处理
+
+    挂单按提交顺序保存在 orders 中（dict，可直接写入JSON）：
+        ref, kind ('market' / 'stop'), size, price（市价单为提交时的收盘价）, status
+    """
+
+    def __init__(self, comminfo, cash):
+        self.comminfo = comminfo
+        self.mult = comminfo.p.mult
+        self.margin = comminfo.p.margin
+        self.cash = float(cash)
+        self.size = 0.0
+        self.price = 0.0
+        self.adjbase = 0.0
+        self.orders = []
+        self.next_ref = 1
+
+    def value(self, close):
+        return self.cash + abs(self.size) * close * self.mult * self.margin
+
+    def submit(self, kind, size, price):
+        order = {'ref': self.next_ref, 'kind': kind, 'size': float(size), 'price': float(price),
+                 'status': 'submitted'}
+        self.next_ref += 1
+        self.orders.append(order)
+        return order
+
+    def cancel(self, ref):
+        for order in self.orders:
+            if order['ref'] == ref and order['status'] in ('submitted', 'accepted'):
+                order['status'] = 'canceled'
+        self.orders = [o for o in self.orders if o['status'] in ('submitted', 'accepted')]
+
+    def _comm(self, size, price):
+        return self.comminfo.getcommission(size, price) if size else 0.0
+
+    def _check_submitted(self):
+        """提交时的保证金检查：按顺序伪成交，被拒的订单也计入后续订单的可用资金"""
+        cash, size, price = self.cash, self.size, self.price
+        for order in self.orders:
+            if order['status'] != 'submitted':
+                continue
+            dsize, oprice = order['size'], order['price']
+            size, price, opened, closed = _position_update(size, price, dsize, oprice)
+            cash += (abs(closed) * oprice * self.mult * self.margin - self._comm(closed, oprice)
+                     - abs(opened) * oprice * self.mult * self.margin - self._comm(opened, oprice))
+            order['status'] = 'accepted' if cash >= 0 else 'margin'
+
+    def _execute(self, dsize, price):
+        """真实成交（BackBroker._execute），返回 (成交数量, 佣金)"""
+        size, pprice, adjbase = self.size, self.price, self.adjbase
+        _, _, opened, closed = _position_update(size, pprice, dsize, price)
+        cash = self.cash
+        comm = 0.0
+        if closed:
+            closedcomm = self._comm(closed, price)
+            cash += abs(closed) * pprice * self.mult * self.margin - closedcomm - closed * (price - adjbase) * self.mult
+            comm += closedcomm
+        if opened:
+            openedcomm = self._comm(opened, price)
+            open_cash = cash - abs(opened) * price * self.mult * self.margin - openedcomm
+            if open_cash >= 0:
+                psize = size + dsize
+                if abs(psize) > abs(opened):
+                    open_cash += (psize - opened) * (price - adjbase) * self.mult
+                cash, adjbase = open_cash, price
+                comm += openedcomm
+            else:
+                opened = 0.0
+        execsize = closed + opened
+        self.size, self.price, _, _ = _position_update(size, pprice, execsize, price)
+        self.cash, self.adjbase = cash, adjbase
+        return execsize, comm
+
+    def process(self, bar):
+        """处理一根K线：保证金检查 -> 按队列顺序撮合 -> 收盘盯市
+
+        Returns:
+            list[dict]: 本根K线上状态发生变化的订单（completed / margin），附成交价与佣金
+        """
+        if not self.comminfo.spec.static:
+            # 分时段费率：手续费与保证金取当前K线所在时段
+            self.comminfo.dt = date2num(bar.datetime)
+            self.margin = self.comminfo.spec.rate_at(self.comminfo.dt)[2]
+        self._check_submitted()
+        events = [o for o in self.orders if o['status'] == 'margin']
+        for order in self.orders:
+            if order['status'] != 'accepted':
+                continue
+            if order['kind'] == 'stop':
+                stop = order['price']
+                if bar.open > stop and bar.low > stop:
+                    continue
+                fill = bar.open if bar.open <= stop else stop
+            else:
+                fill = bar.open
+            execsize, comm = self._execute(order['size'], fill)
+            order.update(status='completed' if execsize == order['size'] else 'margin',
+                         executed_size=execsize, executed_price=fill, comm=comm)
+            events.append(order)
+        self.orders = [o for o in self.orders if o['status'] in ('submitted', 'accepted')]
+
+        if self.size:
+            self.cash += self.size * (bar.close - self.adjbase) * self.mult
+            self.adjbase = bar.close
+        return events
+
+    def state(self):
+        state = {k: getattr(self, k) for k in ('cash', 'size', 'price', 'adjbase', 'orders', 'next_ref')}
+        if self.comminfo.spec.tier_volume:
+            state['tier_volume'] = [self.comminfo._month, self.comminfo._volume]  # 当月累计成交手数
+        return state
+
+    def restore(self, state):
+        state = dict(state)
+        self.comminfo._month, self.comminfo._volume = state.pop('tier_volume', (None, 0.0))
+        for k, v in state.items():
+            setattr(self, k, v)
+
+
+class LiveDualMA:
+    """DualMovingAverageStrategy 的增量运行时
+
+    Args:
+        comminfo (GenericCommInfo): 与 BackTester 相同的佣金对象
+        contract_specs (dict): mult/margin/unit
+        cash (float, optional): 初始资金（从状态文件恢复时忽略）. Defaults to 10000.
+        params (dict, optional): 覆盖策略默认参数
+        state_path (str, optional): 状态文件路径，存在时从中恢复
+        persist_every (int, optional): 每处理多少根K线写一次状态文件. Defaults to 1.
+    """
+
+    def __init__(self, comminfo, contract_specs, cash=10000, params=None, state_path=None, persist_every=1):
+        strategy = DualMovingAverageStrategy
+        self.params = {**dict(strategy.params._getitems()), **contract_specs, **(params or {})}
+        self.p = p = SimpleNamespace(**self.params)
+        self.rules = strategy
+        self.broker = PaperBroker(comminfo, cash)
+        self.fast = IncrementalSMA(p.fast_period)
+        self.slow = IncrementalSMA(p.slow_period)
+        self.cross = IncrementalCrossOver()
+        self.rsi = IncrementalRSI(p.rsi_period)
+        # 与 backtrader 策略的最小周期一致：CrossOver 比均线多一根，RSI 比周期多一根
+        self.minperiod = max(max(p.fast_period, p.slow_period) + 1, p.rsi_period + 1)
+
+        self.bars = 0
+        self.last_dt = None
+        self.entry_price = 0
+        self.stop_order = None     # 止损单 ref
+        self.pending_order = None  # 挂起的开仓单 ref
+        self.fills = []            # (datetime, 手数, 成交价, 佣金)
+        self.latency = array('d')  # 每根K线从收到到做出决策的耗时（秒）
+        self.persist_time = array('d')
+
+        self.state_path = state_path
+        self.persist_every = persist_every
+        self._verbose = LOG.isEnabledFor(logging.INFO)
+        if state_path and os.path.exists(state_path):
+            self.load_state()
+
+    @classmethod
+    def from_tester(cls, tester, **kwargs):
+        """使用 BackTester 的佣金、合约参数和初始资金（佣金对象单独创建，不绑定回测数据源）"""
+        return cls(GenericCommInfo(**tester.comm_kwargs), tester.contract_specs, cash=tester.cash, **kwargs)
+
+    def _log(self, level, msg, bar, **fields):
+        LOG.log(level, msg, extra={'bar': bar.datetime.strftime('%Y-%m-%d %H:%M:%S'), 'fields': fields})
+
+    def _notify(self, bar, order):
+        broker = self.broker
+        if order['status'] == 'margin':
+            self._log(logging.WARNING, "订单异常", bar, 状态='Margin')
+            if order['ref'] == self.pending_order:
+                self.pending_order = None
+            return
+        size = order['executed_size']
+        self.fills.append((bar.datetime, size, order['executed_price'], order['comm']))
+        if self._verbose:
+            self._log(logging.INFO, '买入' if size > 0 else '卖出', bar,
+                      价格=round(order['executed_price'], 2), 手数=size, 佣金=round(order['comm'], 2),
+                      当前持仓量=broker.size, 当前可用资金=round(broker.cash, 2),
+                      当前总资产=round(broker.value(bar.close), 2))
+        if size < 0 and broker.size == 0 and self.stop_order is not None:
+            # 平仓后取消未触发的止损单
+            broker.cancel(self.stop_order)
+        if size > 0:
+            self.entry_price = order['executed_price']
+            stop = broker.submit('stop', -size, self.rules.stop_price(self.p, self.entry_price))
+            self.stop_order = stop['ref']
+            self.pending_order = None
+        elif order['ref'] == self.stop_order and self._verbose:
+            self._log(logging.INFO, "止损触发", bar, 成交价=order['executed_price'])
+
+    def on_bar(self, bar):
+        """处理一根新K线，返回本根K线提交的订单（没有时为None）"""
+        t0 = time.perf_counter()
+        broker = self.broker
+        for order in broker.process(bar):
+            self._notify(bar, order)
+
+        crossover = self.cross.update(self.fast.update(bar.close), self.slow.update(bar.close))
+        rsi = self.rsi.update(bar.close)
+        self.bars += 1
+        self.last_dt = bar.datetime
+
+        order = None
+        if self.bars >= self.minperiod:
+            p = self.p
+            if broker.size:
+                if self.rules.exit_signal(p, crossover, rsi):
+                    order = broker.submit('market', -broker.size, bar.close)
+            elif self.rules.entry_signal(p, crossover, rsi):
+                size = self.rules.position_size(p, bar.close, broker.cash, broker.value(bar.close))
+                if size:
+                    order = broker.submit('market', size, bar.close)
+                    self.pending_order = order['ref']
+        t1 = time.perf_counter()
+        self.latency.append(t1 - t0)
+
+        if self.state_path and self.bars % self.persist_every == 0:
+            self.save_state()
+            self.persist_time.append(time.perf_counter() - t1)
+        return order
+
+    def run(self, source):
+        """消费K线来源直到结束；重启后已处理过的K线（时间不晚于 last_dt）直接跳过"""
+        for bar in source:
+            if self.last_dt is not None and bar.datetime <= self.last_dt:
+                continue
+            self.on_bar(bar)
+        if self.state_path:
+            self.save_state()
+        return self.report()
+
+    def value(self, close):
+        return self.broker.value(close)
+
+    def state(self):
+        return {
+            'version': STATE_VERSION,
+            'params': self.params,
+            'bars': self.bars,
+            'last_dt': self.last_dt.isoformat() if self.last_dt else None,
+            'entry_price': self.entry_price,
+            'stop_order': self.stop_order,
+            'pending_order': self.pending_order,
+            'broker': self.broker.state(),
+            'indicators': {name: getattr(self, name).state() for name in ('fast', 'slow', 'cross', 'rsi')},
+        }
+
+    def save_state(self):
+        """原子写入：先写临时文件再替换，进程中断时不会留下半个状态文件"""
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def load_state(self):
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"状态文件版本不匹配: {state.get('version')}")
+        if state['params'] != self.params:
+            raise ValueError(f"状态文件 {self.state_path} 的策略参数与当前参数不一致")
+        self.bars = state['bars']
+        self.last_dt = datetime.fromisoformat(state['last_dt']) if state['last_dt'] else None
+        self.entry_price = state['entry_price']
+        self.stop_order = state['stop_order']
+        self.pending_order = state['pending_order']
+        self.broker.restore(state['broker'])
+        ind = state['indicators']
+        self.fast = IncrementalSMA.from_state(ind['fast'])
+        self.slow = IncrementalSMA.from_state(ind['slow'])
+        self.cross = IncrementalCrossOver.from_state(ind['cross'])
+        self.rsi = IncrementalRSI.from_state(ind['rsi'])
+
+    def report(self):
+        """逐K线决策延迟统计（微秒）"""
+        lat = np.frombuffer(self.latency, dtype=np.float64) * 1e6
+        stats = {'K线数': len(lat)}
+        if len(lat):
+            stats.update({'平均': lat.mean(), 'p50': np.percentile(lat, 50), 'p95': np.percentile(lat, 95),
+                          'p99': np.percentile(lat, 99), '最大': lat.max()})
+        if len(self.persist_time):
+            stats['状态写入平均'] = np.frombuffer(self.persist_time, dtype=np.float64).mean() * 1e6
+        return stats
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from utils.logger import set_quiet
+    from utils.sample import SAMPLE, run_sample
+
+    print("***增量运行时与回测一致性test***")
+    set_quiet()
+    _, symbol, period, beginning, end = SAMPLE
+    tester = run_sample()
+    expected_value = tester.cerebro.broker.getvalue()
+    expected_fills = [(f['size'], f['price'], round(f['comm'], 8)) for f in tester.record.fills]
+
+    source = FileReplaySource(symbol, period, beginning, end)
+    bars = list(source)
+    live = LiveDualMA.from_tester(tester)
+    report = live.run(bars)
+    value = live.value(bars[-1].close)
+    fills = [(size, price, round(comm, 8)) for _, size, price, comm in live.fills]
+    print(f"回测 期末资金: {expected_value:.4f}  增量运行时 期末资金: {value:.4f}  成交 {len(fills)} 笔")
+    assert math.isclose(value, expected_value, rel_tol=1e-12) and fills == expected_fills
+
+    # 中途重启：前半段处理完退出，新进程从状态文件恢复后继续
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'live_state.json')
+        half = len(bars) // 2
+        LiveDualMA.from_tester(tester, state_path=path).run(bars[:half])
+        resumed = LiveDualMA.from_tester(tester, state_path=path)
+        resumed_report = resumed.run(bars)  # 已处理的前半段会被跳过
+        resumed_value = resumed.value(bars[-1].close)
+    print(f"第 {half} 根K线后重启，期末资金: {resumed_value:.4f}")
+    assert resumed_value == value and resumed.bars == len(bars)
+
+    print("决策延迟（微秒）: " + "  ".join(f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}"
+                                     for k, v in report.items()))
+    print(f"含状态写入时每根K线平均 {resumed_report['状态写入平均']:.1f} 微秒")
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+多品种组合回测
+
+一次性从列式存储读取 N 个品种，按时间戳对齐到同一时间轴后挂到同一个cerebro上，
+每个品种使用 commission.json 中自己的 GenericCommInfo，资金与保证金共享。
+
+对齐方式：
+1. 时间轴为各品种时间戳的并集，从最晚开始的品种的第一根K线起
+2. 某品种缺失的K线用上一根收盘价补一根平盘K线（成交量为0）
+对齐后所有数据源长度相同、时间戳一致，datetime 数值只需计算一次；
+各数据源按列整段预加载（见 ColumnarData），策略中每根K线不再需要判断哪些品种有新数据。
+"""
+import os
+
+import backtrader as bt
+import numpy as np
+
+from utils.analytics import add_analyzers, analyzer_metrics
+from utils.commission import GenericCommInfo, load_commission, product_name
+from utils.store import BarStore, ArrayData, ensure_store, feed_datetimes, period_timeframe
+
+
+def align_bars(frames):
+    """把多个品种的K线对齐到同一时间轴
+
+    Args:
+        frames (dict): 品种 -> BarStore.load 返回的列
+
+    Returns:
+        (np.ndarray, dict): 纳秒时间戳并集；品种 -> 对齐后的列（不含datetime）
+    """
+    start = max(int(bars['datetime'][0]) for bars in frames.values())
+    ts = np.unique(np.concatenate([np.asarray(bars['datetime']) for bars in frames.values()]))
+    ts = ts[ts >= start]
+
+    aligned = {}
+    for symbol, bars in frames.items():
+        own = np.asarray(bars['datetime'])
+        idx = np.searchsorted(own, ts, side='right') - 1
+        exact = own[idx] == ts
+        close = np.asarray(bars['close'])[idx]
+        cols = {'close': close}
+        for col in ('open', 'high', 'low'):
+            cols[col] = np.where(exact, np.asarray(bars[col])[idx], close)
+        cols['volume'] = np.where(exact, np.asarray(bars['volume'])[idx], 0.0)
+        for col in ('openinterest', 'settle'):
+            cols[col] = np.asarray(bars[col])[idx]
+        aligned[symbol] = cols
+    return ts, aligned
+
+
+class PortfolioTester:
+    """多品种组合回测
+
+    Args:
+        symbols (list[str]): 合约代码，如 ['RB2505', 'HC2505']
+        period (str): 周期，与 BackTester 相同
+        beginning (datetime): 回测开始时间
+        end (datetime): 回测结束时间
+        cash (float, optional): 初始资金. Defaults to 10000.
+        names (dict, optional): 合约代码 -> commission.json 中的品种名，缺省按 product_name 推断
+        store (BarStore, optional): 列式存储，缺省为 data/store
+    """
+
+    def __init__(self, symbols, period, beginning, end, cash=10000, names=None, store=None):
+        self.symbols = list(symbols)
+        self.period = period
+        self.beginning = beginning
+        self.end = end
+        self.cash = cash
+        self.names = {s: (names or {}).get(s) or product_name(s) for s in self.symbols}
+        self.store = store or BarStore()
+
+        # 组合回测不需要逐数据源的买卖点观察器
+        self.cerebro = bt.Cerebro(stdstats=False)
+        self.comm_kwargs = {}
+        self.contract_specs = {}
+        self._setup()
+
+    def _setup(self):
+        self._load()
+        self.cerebro.broker.setcash(self.cash)
+        add_analyzers(self.cerebro)
+
+    def _load(self):
+        self.timeframe, self.compression = period_timeframe(self.period)
+        frames = {}
+        for symbol in self.symbols:
+            fp = os.path.join("data", f"{symbol}_{self.period}.csv")
+            if os.path.exists(fp):
+                ensure_store(fp, symbol, self.period, self.store)
+            frames[symbol] = self.store.load(symbol, self.period, self.beginning, self.end)
+
+        self.datetimes, aligned = align_bars(frames)
+        self.columns = aligned  # 对齐后的行情列，横截面信号引擎（engine.signals）直接复用
+        dtnum = feed_datetimes(self.datetimes, self.timeframe)
+        for symbol in self.symbols:
+            data = ArrayData(dtnum=dtnum, columns=aligned[symbol],
+                             timeframe=self.timeframe, compression=self.compression)
+            self.cerebro.adddata(data, name=symbol)
+
+            comm, specs = load_commission(self.names[symbol])
+            self.comm_kwargs[symbol] = comm
+            self.contract_specs[symbol] = specs
+            self.cerebro.broker.addcommissioninfo(GenericCommInfo(**comm).bind(data), name=symbol)
+
+    def add_strategy(self, strategy=None, **kwargs):
+        """添加组合策略，默认 PortfolioDualMA；各品种合约参数通过 specs 传入"""
+        if strategy is None:
+            from strategy.portfolio_dual_ma import PortfolioDualMA
+            strategy = PortfolioDualMA
+        self.cerebro.addstrategy(strategy, specs=self.contract_specs, **kwargs)
+
+    def run(self):
+        results = self.cerebro.run()
+        self._print_analysis(results[0])
+        return results
+
+    def _print_analysis(self, result):
+        """打印组合回测报告"""
+        print("\n========== 组合回测分析报告 ==========")
+        print(f"品种: {', '.join(self.symbols)}  K线数: {len(self.datetimes)}")
+        print(f"初始资金: {self.cash:.2f}")
+        print(f"期末资金: {self.cerebro.broker.getvalue():.2f}")
+        for k, v in analyzer_metrics(result).items():
+            print(f"{k}: {v}")
+        print("\n====== 期末持仓 ======")
+        for data in result.datas:
+            size = result.getposition(data).size
+            if size:
+                print(f"{data._name}: {size} 手")
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.sample import SAMPLE, sample_tester
+
+    print("***单品种组合回测与BackTester一致性test***")
+    _, symbol, period, beginning, end = SAMPLE
+
+    tester = sample_tester()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tester.add_strategy(DualMovingAverageStrategy)
+        expected = tester.cerebro.run()[0]
+        portfolio = PortfolioTester([symbol], period, beginning, end)
+        portfolio.add_strategy()
+        actual = portfolio.cerebro.run()[0]
+
+    a, b = analyzer_metrics(expected), analyzer_metrics(actual)
+    va, vb = tester.cerebro.broker.getvalue(), portfolio.cerebro.broker.getvalue()
+    print(f"BackTester 期末资金: {va:.4f}  组合回测 期末资金: {vb:.4f}")
+    for k in a:
+        print(f"{k:>12}: {a[k]}  {b[k]}")
+    assert va == vb and all(a[k] == b[k] or a[k] != a[k] and b[k] != b[k] for k in a)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+进程池参数优化调度器
+
+与 cerebro.run(maxcpus=n) 的区别：
+1. K线数组只在共享内存中放一份，工作进程直接映射，不再pickle数据源
+2. 参数组合按块分发给 ProcessPoolExecutor
+3. 工作进程只返回精简的指标记录（参数 + 收益率/夏普/回撤/交易次数），
+   不回传策略对象、portfolio_value 列表和分析器
+4. 结果按完成顺序以生成器形式流式返回，调用方可以边收边汇总
+5. tester 启用性能剖析时，工作进程按块汇总 ProfileAnalyzer 结果随指标一起回传，并入 tester.profiler
+"""
+import contextlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import backtrader as bt
+import numpy as np
+
+from engine.vectorized import expand_grid
+from utils.analytics import add_analyzers, analyzer_metrics
+from utils.commission import GenericCommInfo
+from utils.fills import FillBroker
+from utils.logger import set_quiet
+from utils.store import COLUMNS, ArrayData, feed_datetimes
+
+
+class SharedBars:
+    """放在共享内存中的K线矩阵：第0行为datetime数值，其余行依次为 COLUMNS"""
+
+    def __init__(self, bars, timeframe):
+        n = len(bars['close'])
+        self.shape = (len(COLUMNS) + 1, n)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(8 * self.shape[0] * n, 1))
+        matrix = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        matrix[0] = feed_datetimes(bars['datetime'], timeframe)
+        for i, col in enumerate(COLUMNS, 1):
+            matrix[i] = bars[col]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_single(matrix, timeframe, compression, comm_kwargs, strategy, kwargs, cash, analyzers=(),
+               fill_model=None):
+    """在给定K线矩阵上跑一次回测，返回策略实例
+
+    analyzers 为额外添加的 (分析器类, 名称[, 参数dict]) 列表；fill_model 为 FillModel 时使用 FillBroker
+    """
+    cerebro = bt.Cerebro(stdstats=False)
+    if fill_model is not None:
+        cerebro.broker = FillBroker(fillmodel=fill_model)
+    data = ArrayData(
+        dtnum=matrix[0],
+        columns={col: matrix[i] for i, col in enumerate(COLUMNS, 1)},
+        timeframe=timeframe,
+        compression=compression
+    )
+    cerebro.adddata(data)
+    cerebro.broker.setcash(cash)
+    cerebro.broker.addcommissioninfo(GenericCommInfo(**comm_kwargs).bind(data))
+    add_analyzers(cerebro)
+    for analyzer, name, *kw in analyzers:
+        cerebro.addanalyzer(analyzer, _name=name, **(kw[0] if kw else {}))
+    cerebro.addstrategy(strategy, **kwargs)
+    return cerebro.run()[0]
+
+
+# 工作进程内的状态，由 _init_worker 设置
+_WORKER = {}
+
+
+def _init_worker(shm_name, shape, timeframe, compression, comm_kwargs, strategy, fixed_kwargs, cash,
+                 fill_model=None, profile=None):
+    # 工作进程与父进程共用同一个resource_tracker，释放统一由父进程unlink完成
+    set_quiet()  # 工作进程的输出被丢弃，成交日志直接跳过格式化
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _WORKER.update(
+        shm=shm,
+        matrix=np.ndarray(shape, dtype=np.float64, buffer=shm.buf),
+        timeframe=timeframe,
+        compression=compression,
+        comm_kwargs=comm_kwargs,
+        strategy=strategy,
+        fixed_kwargs=fixed_kwargs,
+        cash=cash,
+        fill_model=fill_model,
+        profile=profile,
+    )
+
+
+def _run_chunk(combos):
+    """工作进程执行一块参数组合，返回指标记录和本块的性能剖析汇总（未启用时为 None）"""
+    w = _WORKER
+    records = []
+    profiler = analyzers = None
+    if w['profile'] is not None:
+        from utils.profiling import Profiler
+        profiler = Profiler(**w['profile'])
+        analyzers = [profiler.analyzer()]
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for params in combos:
+            with profiler.phase('回测') if profiler else contextlib.nullcontext():
+                strategy = run_single(
+                    w['matrix'], w['timeframe'], w['compression'], w['comm_kwargs'],
+                    w['strategy'], {**w['fixed_kwargs'], **params}, w['cash'], analyzers=analyzers or (),
+                    fill_model=w['fill_model'])
+            if profiler:
+                profiler.merge(strategy.analyzers.profiler.get_analysis())
+            records.append({**params, **analyzer_metrics(strategy)})
+    return records, profiler and profiler.to_dict()
+
+
+class OptimizationScheduler:
+    """参数优化进程池调度器
+
+    Args:
+        tester (BackTester): 提供数据区间、佣金、合约参数和初始资金
+        workers (int, optional): 工作进程数，默认CPU核数
+        chunksize (int, optional): 每个任务包含的参数组合数，默认约为 组合数/(workers*4)
+    """
+
+    def __init__(self, tester, workers=None, chunksize=None):
+        self.tester = tester
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.total = 0
+        self.completed = 0
+
+    def _chunks(self, combos):
+        size = self.chunksize or max(1, math.ceil(len(combos) / (self.workers * 4)))
+        return [combos[i:i + size] for i in range(0, len(combos), size)]
+
+    def run(self, strategy, param_ranges=None, combos=None):
+        """执行优化，按完成顺序逐块产出指标记录列表
+
+        Args:
+            param_ranges (dict, optional): 参数网格，展开方式与 optstrategy 相同
+            combos (list[dict], optional): 直接给定待回测的参数组合（如跳过已完成组合后的剩余部分）
+        """
+        t = self.tester
+        if combos is None:
+            combos = expand_grid(param_ranges)
+        self.total = len(combos)
+        self.completed = 0
+        bars = t.store.load(t.symbol, t.period, t.beginning, t.end)
+        timeframe, compression = t.timeframe, t.compression
+
+        if not combos:
+            return
+
+        with SharedBars(bars, timeframe) as shared:
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(shared.name, shared.shape, timeframe, compression,
+                          t.comm_kwargs, strategy, t.contract_specs, t.cash, t.fill_model,
+                          t.profiler.options() if t.profiler else None)
+            )
+            try:
+                futures = [pool.submit(_run_chunk, chunk) for chunk in self._chunks(combos)]
+                for future in as_completed(futures):
+                    records, profile = future.result()
+                    if profile:
+                        t.profiler.merge(profile)
+                    self.completed += len(records)
+                    yield records
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
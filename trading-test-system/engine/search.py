@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+自适应参数搜索
+
+网格穷举的耗时随参数个数相乘增长，这里提供两种按预算评估部分组合的搜索：
+
+TPESearch
+    在完整区间上评估。先随机评估一批组合，之后按已评估结果把组合分成"好/差"两组，
+    逐个参数统计取值在两组中的频率比，优先评估比值最高的未评估组合
+    （离散网格上的 Tree-structured Parzen Estimator）。
+SuccessiveHalving
+    先在较短的数据窗口（从区间起点开始）上评估较多组合，按夏普比率保留前 1/eta，
+    窗口扩大 eta 倍后继续淘汰，最后一级在完整区间上评估。
+    适合K线很多、短窗口排名已较稳定的场景；单品种一年日线这类短样本上
+    前缀窗口的排名与完整区间相关性较弱，应使用 TPESearch。
+"""
+import contextlib
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from engine.vectorized import expand_grid
+
+RANK_METRIC = '夏普比率'
+
+
+def _score(value):
+    return -np.inf if value is None or value != value else value
+
+
+def rank_records(records, metric=RANK_METRIC):
+    """按指标降序排序，NaN/None 排在最后，同值时按总收益率"""
+    return sorted(records, key=lambda r: (_score(r.get(metric)), _score(r.get('总收益率 (%)'))),
+                  reverse=True)
+
+
+class _Search:
+    """搜索器公共部分：评估计数与汇总"""
+
+    def __init__(self, evaluate, n_bars, seed=0):
+        self.evaluate = evaluate
+        self.n_bars = n_bars
+        self.seed = seed
+        self.evaluations = 0
+        self.cost = 0.0
+        self.grid_size = 0
+
+    def _evaluate(self, combos, nbars=None):
+        nbars = nbars or self.n_bars
+        self.evaluations += len(combos)
+        self.cost += len(combos) * nbars / self.n_bars
+        return self.evaluate(combos, nbars)
+
+    def summary(self):
+        """评估次数与网格规模的对比"""
+        return {
+            '网格组合数': self.grid_size,
+            '评估次数': self.evaluations,
+            '折算完整回测次数': round(self.cost, 2),
+            '节省比例': 1 - self.cost / self.grid_size if self.grid_size else 0.0,
+        }
+
+
+class TPESearch(_Search):
+    """离散网格上的TPE搜索
+
+    Args:
+        evaluate (callable): evaluate(combos, nbars) -> list[dict]，
+            在区间前 nbars 根K线上回测给定组合，返回 参数 + METRICS 记录
+        n_bars (int): 完整区间的K线数
+        gamma (float, optional): "好"组占已评估组合的比例. Defaults to 0.25.
+        batch (int, optional): 每轮评估的组合数. Defaults to 4.
+        n_startup (int, optional): 随机评估的组合数，缺省为预算的1/4
+        seed (int, optional): 随机种子. Defaults to 0.
+    """
+
+    def __init__(self, evaluate, n_bars, gamma=0.25, batch=4, n_startup=None, seed=0):
+        super(TPESearch, self).__init__(evaluate, n_bars, seed)
+        self.gamma = gamma
+        self.batch = batch
+        self.n_startup = n_startup
+
+    def run(self, param_ranges, budget=None):
+        """执行搜索
+
+        Args:
+            param_ranges (dict): 与 add_optimization_strategy 相同格式的参数范围
+            budget (int, optional): 最多评估的组合数，缺省为网格的1/3
+
+        Returns:
+            list[dict]: 全部已评估组合的记录，按夏普比率降序
+        """
+        combos = expand_grid(param_ranges)
+        names = list(param_ranges)
+        self.grid_size = len(combos)
+        self.evaluations, self.cost = 0, 0.0
+        budget = min(len(combos), budget or int(math.ceil(len(combos) / 3)))
+        rng = np.random.default_rng(self.seed)
+
+        # 每个组合在各参数上的取值下标
+        codes = np.empty((len(combos), len(names)), dtype=np.int64)
+        levels = []
+        for j, name in enumerate(names):
+            values = list(dict.fromkeys(c[name] for c in combos))
+            levels.append(len(values))
+            codes[:, j] = [values.index(c[name]) for c in combos]
+
+        n_startup = min(budget, self.n_startup or max(2 * len(names), budget // 4))
+        seen = list(rng.choice(len(combos), size=n_startup, replace=False))
+        records = self._evaluate([combos[i] for i in seen])
+        scores = [_score(r.get(RANK_METRIC)) for r in records]
+
+        while len(seen) < budget:
+            order = np.argsort(-np.asarray(scores), kind='stable')
+            n_good = max(1, int(math.ceil(self.gamma * len(seen))))
+            good = np.asarray(seen)[order[:n_good]]
+            bad = np.asarray(seen)[order[n_good:]]
+
+            # 各参数取值在"好/差"两组中的平滑频率之比（对数相加即独立假设下的乘积）
+            log_ratio = np.zeros(len(combos))
+            for j, k in enumerate(levels):
+                l = (np.bincount(codes[good, j], minlength=k) + 1) / (len(good) + k)
+                g = (np.bincount(codes[bad, j], minlength=k) + 1) / (len(bad) + k)
+                log_ratio += np.log(l / g)[codes[:, j]]
+            log_ratio[seen] = -np.inf
+            log_ratio += rng.random(len(combos)) * 1e-9  # 同分时随机打破
+
+            picked = list(np.argsort(-log_ratio)[:min(self.batch, budget - len(seen))])
+            batch = self._evaluate([combos[i] for i in picked])
+            seen.extend(picked)
+            records.extend(batch)
+            scores.extend(_score(r.get(RANK_METRIC)) for r in batch)
+
+        return rank_records(records)
+
+
+class SuccessiveHalving(_Search):
+    """在逐级扩大的数据窗口上淘汰参数组合
+
+    Args:
+        evaluate (callable): 同 TPESearch
+        n_bars (int): 完整区间的K线数
+        eta (int, optional): 每级保留 1/eta 的组合，窗口扩大 eta 倍. Defaults to 3.
+        min_bars (int, optional): 第一级窗口的最少K线数. Defaults to 60.
+        seed (int, optional): 候选组合抽样的随机种子. Defaults to 0.
+    """
+
+    def __init__(self, evaluate, n_bars, eta=3, min_bars=60, seed=0):
+        super(SuccessiveHalving, self).__init__(evaluate, n_bars, seed)
+        self.eta = eta
+        self.min_bars = min_bars
+        self.rungs = []
+
+    def levels(self):
+        """窗口级数：第一级窗口不少于 min_bars"""
+        if self.n_bars <= self.min_bars:
+            return 0
+        return int(math.floor(math.log(self.n_bars / self.min_bars, self.eta)))
+
+    def run(self, param_ranges, budget=None):
+        """执行搜索
+
+        Args:
+            param_ranges (dict): 与 add_optimization_strategy 相同格式的参数范围
+            budget (float, optional): 预算，按"完整区间回测次数"折算；
+                决定第一级抽样的组合数，缺省时第一级评估全部组合
+
+        Returns:
+            list[dict]: 最后一级（完整区间）的记录，按夏普比率降序
+        """
+        combos = expand_grid(param_ranges)
+        names = list(param_ranges)
+        self.grid_size = len(combos)
+        self.evaluations, self.cost = 0, 0.0
+        self.rungs = []
+
+        levels = self.levels()
+        eta = self.eta
+        # 每级组合数依次除以eta、窗口依次乘以eta，每级成本约为 n0 / eta**levels
+        n0 = len(combos)
+        if budget is not None:
+            n0 = min(n0, max(1, int(budget * eta ** levels / (levels + 1))))
+        if n0 < len(combos):
+            rng = np.random.default_rng(self.seed)
+            candidates = [combos[i] for i in np.sort(rng.choice(len(combos), size=n0, replace=False))]
+        else:
+            candidates = combos
+
+        records = []
+        for level in range(levels + 1):
+            nbars = self.n_bars if level == levels else \
+                int(math.ceil(self.n_bars / eta ** (levels - level)))
+            records = rank_records(self._evaluate(candidates, nbars))
+            self.rungs.append({'级别': level, 'K线数': nbars, '组合数': len(candidates),
+                               f'最优{RANK_METRIC}': records[0].get(RANK_METRIC) if records else None})
+            if level < levels:
+                keep = max(1, int(math.ceil(len(candidates) / eta)))
+                candidates = [{k: r[k] for k in names} for r in records[:keep]]
+        return records
+
+
+def vectorized_evaluator(tester):
+    """基于向量化引擎的评估函数（仅适用于DualMovingAverageStrategy）"""
+    from engine.vectorized import VectorizedDualMA
+
+    bars = tester.store.load(tester.symbol, tester.period, tester.beginning, tester.end)
+
+    def evaluate(combos, nbars):
+        window = {k: v[:nbars] for k, v in bars.items()}
+        engine = VectorizedDualMA(window, tester.comm, tester.contract_specs, cash=tester.cash,
+                                  timeframe=tester.timeframe, compression=tester.compression)
+        return engine.run(combos=combos).to_dict('records')
+
+    return evaluate, len(bars['close'])
+
+
+def backtrader_evaluator(tester, strategy):
+    """基于backtrader的通用评估函数，K线只加载一次，各窗口取前缀切片
+
+    tester 启用性能剖析时每次回测挂 ProfileAnalyzer，结果并入 tester.profiler
+    """
+    from engine.scheduler import run_single
+    from utils.analytics import analyzer_metrics
+    from utils.store import COLUMNS, feed_datetimes
+
+    bars = tester.store.load(tester.symbol, tester.period, tester.beginning, tester.end)
+    matrix = np.vstack([feed_datetimes(bars['datetime'], tester.timeframe)] +
+                       [np.asarray(bars[col], dtype=np.float64) for col in COLUMNS])
+    profiler = tester.profiler
+    analyzers = [profiler.analyzer()] if profiler else []
+
+    def evaluate(combos, nbars):
+        records = []
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for params in combos:
+                result = run_single(matrix[:, :nbars], tester.timeframe, tester.compression,
+                                    tester.comm_kwargs, strategy,
+                                    {**tester.contract_specs, **params}, tester.cash,
+                                    analyzers=analyzers, fill_model=tester.fill_model)
+                if profiler:
+                    profiler.merge(result.analyzers.profiler.get_analysis())
+                records.append({**params, **analyzer_metrics(result)})
+        return records
+
+    return evaluate, matrix.shape[1]
+
+
+if __name__ == "__main__":
+    import time
+
+    from utils.sample import sample_tester
+
+    print("***自适应搜索 vs 网格穷举***")
+
+    grid = {
+        'fast_period': range(5, 10),
+        'slow_period': range(15, 20),
+        'rsi_upper': [70, 75, 80],
+        'stop_loss_pct': [0.01, 0.02, 0.03, 0.04],
+    }
+    tester = sample_tester()
+    evaluate, n_bars = vectorized_evaluator(tester)
+
+    t0 = time.perf_counter()
+    exhaustive = rank_records(evaluate(expand_grid(grid), n_bars))
+    grid_time = time.perf_counter() - t0
+
+    names = list(grid)
+    best_grid = {k: exhaustive[0][k] for k in names}
+    print(f"穷举最优: {best_grid}  夏普 {exhaustive[0][RANK_METRIC]:.4f}  ({grid_time:.3f}s)")
+
+    for search in (TPESearch(evaluate, n_bars), SuccessiveHalving(evaluate, n_bars)):
+        t0 = time.perf_counter()
+        found = search.run(grid)
+        elapsed = time.perf_counter() - t0
+        best_found = {k: found[0][k] for k in names}
+        print(f"\n--- {type(search).__name__} ---")
+        if isinstance(search, SuccessiveHalving):
+            print(pd.DataFrame(search.rungs).to_string(index=False))
+        for k, v in search.summary().items():
+            print(f"{k:>10}: {v:.2%}" if k == '节省比例' else f"{k:>10}: {v}")
+        print(f"搜索最优: {best_found}  夏普 {found[0][RANK_METRIC]:.4f}  ({elapsed:.3f}s)  "
+              f"{'与穷举一致' if best_found == best_grid else '与穷举不一致'}")
+        if isinstance(search, TPESearch):
+            assert best_found == best_grid, "TPE搜索未找到穷举最优参数"
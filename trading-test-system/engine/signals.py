@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+横截面信号引擎
+
+DualMovingAverageStrategy 逐个数据源通过 backtrader lines 计算信号，品种一多（每根K线要对几百个合约排序）
+就无法承受。这里把全部品种对齐后的行情放进 (时间 × 品种) 矩阵：
+
+1. 时间序列指标按列整体计算（momentum、carry、rolling_mean 等）
+2. 横截面运算按行整体计算（cs_rank、cs_zscore、long_short），缺失值（NaN）不参与
+3. 得到的目标权重/手数矩阵交给 strategy.target_position.TargetPositionStrategy，
+   由 PortfolioTester（多品种）或 BackTester（单品种）按 backtrader 撮合回测
+
+第 t 行的信号只用到第 t 根K线及之前的数据，策略在第 t 根K线收盘下单、下一根开盘成交。
+
+运行 `python -m engine.signals` 在 RB2505 上检验单品种动量信号的目标仓位与回测持仓一致。
+"""
+import numpy as np
+
+from engine.portfolio import align_bars
+from utils.store import BarStore
+
+
+def shift(x, k=1):
+    """按时间下移 k 行（前 k 行为 NaN）"""
+    out = np.full(x.shape, np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+    return out
+
+
+def momentum(close, lookback, skip=0):
+    """动量：close[t-skip] / close[t-skip-lookback] - 1"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return shift(close, skip) / shift(close, skip + lookback) - 1
+
+
+def carry(settle, close):
+    """展期/基差收益的近似：(结算价 - 收盘价) / 收盘价"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (settle - close) / close
+
+
+def rolling_mean(x, n):
+    """按列的 n 期简单平均（前 n-1 行为 NaN，窗口内有 NaN 时为 NaN）"""
+    out = np.full(x.shape, np.nan)
+    if n <= len(x):
+        # NaN 按0累加并另计窗口内的 NaN 个数，避免一个 NaN 污染之后所有行
+        nan = np.isnan(x)
+        zero = np.zeros((1,) + x.shape[1:])
+        csum = np.concatenate([zero, np.cumsum(np.where(nan, 0.0, x), axis=0)])
+        cnan = np.concatenate([zero, np.cumsum(nan, axis=0)])
+        out[n - 1:] = np.where(cnan[n:] - cnan[:-n] > 0, np.nan, (csum[n:] - csum[:-n]) / n)
+    return out
+
+
+def rolling_std(x, n):
+    """按列的 n 期总体标准差"""
+    mean = rolling_mean(x, n)
+    return np.sqrt(np.maximum(rolling_mean(x * x, n) - mean * mean, 0.0))
+
+
+def cs_rank(x):
+    """每行的百分位排名：最小为0，最大为1，并列按品种顺序；NaN 保持 NaN"""
+    valid = ~np.isnan(x)
+    order = np.argsort(np.where(valid, x, np.inf), axis=1, kind='stable')
+    ranks = np.empty(x.shape)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(x.shape[1], dtype=np.float64), x.shape), axis=1)
+    count = valid.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(count > 1, ranks / (count - 1), 0.5)
+    return np.where(valid, out, np.nan)
+
+
+def cs_zscore(x):
+    """每行去均值并除以总体标准差；有效值少于2个或标准差为0的行为 NaN"""
+    valid = ~np.isnan(x)
+    count = valid.sum(axis=1, keepdims=True)
+    filled = np.where(valid, x, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = filled.sum(axis=1, keepdims=True) / count
+        dev = np.where(valid, x - mean, 0.0)
+        std = np.sqrt((dev * dev).sum(axis=1, keepdims=True) / count)
+        out = dev / np.where(std > 0, std, np.nan)
+    return np.where(valid & (count > 1), out, np.nan)
+
+
+def long_short(score, n_long, n_short=None, gross=1.0):
+    """每行做多得分最高的 n_long 个、做空最低的 n_short 个品种，多空各占 gross/2 的等权名义敞口
+
+    有效品种不足 n_long + n_short 的行不持仓；n_short=0 时为纯多头（gross 全部分给多头）
+    """
+    n_short = n_long if n_short is None else n_short
+    valid = ~np.isnan(score)
+    count = valid.sum(axis=1, keepdims=True)
+    order = np.argsort(np.where(valid, score, np.inf), axis=1, kind='stable')
+    ranks = np.empty(score.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(score.shape[1]), score.shape), axis=1)
+    enough = count >= n_long + n_short
+    longs = valid & enough & (ranks >= count - n_long)
+    shorts = valid & enough & (ranks < n_short)
+    side = gross / 2 if n_short else gross
+    weights = np.zeros(score.shape)
+    if n_long:
+        weights += longs * (side / n_long)
+    if n_short:
+        weights -= shorts * (side / n_short)
+    return weights
+
+
+def rebalance(weights, every):
+    """每 every 根K线调仓一次，其间沿用上次的目标"""
+    idx = (np.arange(len(weights)) // every) * every
+    return weights[idx]
+
+
+class CrossSection:
+    """N 个品种对齐后的 (时间 × 品种) 行情矩阵
+
+    Args:
+        frames (dict): 品种 -> BarStore.load 返回的列（对齐方式见 engine.portfolio.align_bars）
+    """
+
+    def __init__(self, frames):
+        self.symbols = list(frames)
+        self.datetimes, aligned = align_bars(frames)
+        self._build(aligned)
+
+    def _build(self, aligned):
+        fields = aligned[self.symbols[0]].keys()
+        self.fields = {f: np.column_stack([aligned[s][f] for s in self.symbols]).astype(np.float64)
+                       for f in fields}
+
+    @classmethod
+    def from_store(cls, symbols, period, beginning=None, end=None, store=None):
+        store = store or BarStore()
+        return cls({s: store.load(s, period, beginning, end) for s in symbols})
+
+    @classmethod
+    def from_tester(cls, tester):
+        """使用 PortfolioTester 已对齐的行情，时间轴与其数据源一致"""
+        self = cls.__new__(cls)
+        self.symbols = list(tester.symbols)
+        self.datetimes = tester.datetimes
+        self._build(tester.columns)
+        return self
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    @property
+    def shape(self):
+        return self.fields['close'].shape
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    from engine.portfolio import PortfolioTester
+    from strategy.target_position import TargetPositionStrategy
+    from utils.logger import set_quiet
+    from utils.sample import SAMPLE, run_sample
+
+    print("***横截面信号引擎***")
+    # 横截面运算与逐行计算一致
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(200, 30))
+    x[rng.random(x.shape) < 0.1] = np.nan
+    for row, r, z in zip(x, cs_rank(x), cs_zscore(x)):
+        v = ~np.isnan(row)
+        order = np.argsort(row[v], kind='stable')
+        expected = np.empty(v.sum())
+        expected[order] = np.arange(v.sum()) / (v.sum() - 1)
+        assert np.allclose(r[v], expected) and np.isnan(r[~v]).all()
+        assert np.allclose(z[v], (row[v] - row[v].mean()) / row[v].std())
+    # 滚动统计与逐窗口计算一致，NaN 只影响包含它的窗口
+    for n in (1, 5, 20):
+        mean, std = rolling_mean(x, n), rolling_std(x, n)
+        assert np.isnan(mean[:n - 1]).all()
+        for t in range(n - 1, len(x)):
+            window = x[t - n + 1:t + 1]
+            assert np.allclose(mean[t], window.mean(axis=0), equal_nan=True)
+            assert np.allclose(std[t], window.std(axis=0), equal_nan=True)
+    assert not np.isnan(rolling_mean(momentum(np.arange(1.0, 61.0)[:, None], 20), 5)[24:]).any()
+    w = long_short(x, 5, 5)
+    assert np.allclose(w.sum(axis=1), 0) and np.allclose(np.abs(w).sum(axis=1), 1)
+
+    # 单品种：20日动量为正时持有 8 倍名义敞口（期货保证金交易），两种回测入口结果一致
+    _, symbol, period, beginning, end = SAMPLE
+    with contextlib.redirect_stdout(io.StringIO()):
+        portfolio = PortfolioTester([symbol], period, beginning, end)
+    cs = CrossSection.from_tester(portfolio)
+    weights = np.where(momentum(cs["close"], 20) > 0, 8.0, 0.0)
+    portfolio.add_strategy(TargetPositionStrategy, targets=weights)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = portfolio.run()[0]
+    tester = run_sample(TargetPositionStrategy, {'targets': weights})
+    assert portfolio.cerebro.broker.getvalue() == tester.cerebro.broker.getvalue()
+    print(f"RB2505 {cs.shape[0]} 根K线，调仓 {result.rebalances} 次，"
+          f"PortfolioTester 与 BackTester 期末资金 {tester.cerebro.broker.getvalue():.2f} 一致")
+
+    # 保证金不足被拒的目标单在之后的K线上重试：资金在第10根K线到账后建仓
+    class _LateFunding(TargetPositionStrategy):
+        def next(self):
+            if len(self) == 10:
+                self.broker.add_cash(100_000)
+            super().next()
+
+    set_quiet()
+    tester = run_sample(_LateFunding, {'targets': np.full(cs.shape[0], 5.0), 'mode': 'lots'}, cash=1000)
+    position = tester.record.position
+    assert position[:10].max() == 0 and position[-1] == 5, position
+    print(f"保证金不足被拒后第 {int(np.argmax(position > 0))} 根K线建仓 5 手")
@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+双均线策略的向量化参数扫描引擎
+
+思路：
+1. 对整个参数网格一次性计算指标矩阵：每个不同的均线周期只算一次SMA，
+   每组(fast, slow)只算一次CrossOver，每个RSI周期只算一次RSI
+2. 按K线逐根推进，但每一步都在"参数组合"维度上用NumPy数组批量撮合，
+   复刻backtrader BackBroker 对期货（stocklike=False）的处理：
+   提交时保证金检查、市价单以次日开盘价成交、止损单跳空按开盘价成交、
+   逐日盯市调整现金、GenericCommInfo 的固定+比例佣金（含分时段费率与按月成交量分档）
+3. 结果与 BackTester.run_optimization 输出的指标一一对应
+
+运行 `python -m engine.vectorized` 会与backtrader路径做一致性对比。
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+from backtrader import TimeFrame
+
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.analytics import METRICS, equity_metrics, period_keys
+from utils.indicators import sma, rsi, crossover
+
+# 止损单槽位状态
+_EMPTY, _SUBMITTED, _ACCEPTED = 0, 1, 2
+
+
+def expand_grid(param_ranges):
+    """与 cerebro.optstrategy 相同的笛卡尔积展开，单值/字符串视为单元素列表"""
+    keys = list(param_ranges)
+    values = []
+    for k in keys:
+        v = param_ranges[k]
+        if isinstance(v, str) or not hasattr(v, '__iter__'):
+            v = [v]
+        values.append(list(v))
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def _position_update(size, price, dsize, dprice):
+    """向量化的 bt.Position.update，返回 (新持仓, 新均价, opened, closed)"""
+    new = size + dsize
+    opened = np.zeros_like(size)
+    closed = np.zeros_like(size)
+    newprice = price.copy()
+
+    flat = new == 0
+    fresh = ~flat & (size == 0)
+    grow = ~flat & ~fresh & (size * dsize > 0)
+    reduce = ~flat & ~fresh & (size * dsize < 0) & (size * new > 0)
+    reverse = ~flat & ~fresh & (size * new < 0)
+
+    closed = np.where(flat, dsize, closed)
+    newprice = np.where(flat, 0.0, newprice)
+
+    opened = np.where(fresh, dsize, opened)
+    newprice = np.where(fresh, dprice, newprice)
+
+    opened = np.where(grow, dsize, opened)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = (price * size + dsize * dprice) / new
+    newprice = np.where(grow, avg, newprice)
+
+    closed = np.where(reduce, dsize, closed)
+
+    opened = np.where(reverse, new, opened)
+    closed = np.where(reverse, -size, closed)
+    newprice = np.where(reverse, dprice, newprice)
+    return new, newprice, opened, closed
+
+
+class VectorizedDualMA:
+    """DualMovingAverageStrategy 的批量回测引擎
+
+    Args:
+        bars (dict): BarStore.load 返回的行情列（至少包含open/high/low/close）
+        comminfo (GenericCommInfo): 与BackTester相同的佣金对象
+        contract_specs (dict): mult/margin/unit，传给策略的合约参数
+        cash (float): 初始资金
+        riskfreerate (float): 夏普比率使用的年化无风险利率
+        timeframe, compression: 数据周期，决定年化收益率的计数周期（默认日线）
+    """
+
+    def __init__(self, bars, comminfo, contract_specs, cash=10000,
+                 riskfreerate=0.02, timeframe=TimeFrame.Days, compression=1):
+        self.bars = bars
+        self.cash = cash
+        self.riskfreerate = riskfreerate
+        self.timeframe = timeframe
+        self.compression = compression
+
+        self.spec = comminfo.spec
+        self.comm_mult = comminfo.p.mult
+        self.contract_specs = contract_specs
+        self.defaults = dict(DualMovingAverageStrategy.params._getitems())
+
+        self.equity = None
+        self.final_value = None
+        self.closed_trades = None
+        self.won_trades = None
+
+    @classmethod
+    def from_tester(cls, tester):
+        """使用BackTester的列式存储、回测区间、佣金与合约参数构造引擎"""
+        if tester.fill_model is not None:
+            raise ValueError("向量化引擎按 BackBroker 默认方式撮合，不支持 fill_model")
+        bars = tester.store.load(tester.symbol, tester.period, tester.beginning, tester.end)
+        return cls(bars, tester.comm, tester.contract_specs, cash=tester.cash,
+                   timeframe=tester.timeframe, compression=tester.compression)
+
+    @staticmethod
+    def _comm(size, price, commission, fixed_tax, tier=None):
+        """GenericCommInfo._getcommission 的向量化版本（tier 为各组合的分档系数）"""
+        comm = np.abs(size) * fixed_tax + np.abs(size) * price * commission
+        return comm if tier is None else comm * tier
+
+    def _param_arrays(self, combos):
+        params = {}
+        for name, default in self.defaults.items():
+            if name in self.contract_specs:
+                default = self.contract_specs[name]
+            params[name] = [c.get(name, default) for c in combos]
+        arrays = {}
+        for name in ['fast_period', 'slow_period', 'rsi_period']:
+            arrays[name] = np.asarray(params[name], dtype=np.int64)
+        for name in ['rsi_upper', 'stop_loss_pct', 'risk_per_trade', 'fixed_size',
+                     'mult', 'margin', 'unit']:
+            arrays[name] = np.asarray(params[name], dtype=np.float64)
+        arrays['fixed'] = np.asarray([p == 'fixed' for p in params['position_type']])
+        return arrays
+
+    def signals(self, p):
+        """计算整个网格的 crossover / rsi 矩阵（T × N）以及每个组合的最小周期"""
+        close = self.bars['close']
+        ma = {n: sma(close, n) for n in np.unique(np.concatenate([p['fast_period'], p['slow_period']]))}
+
+        pairs, pair_idx = np.unique(
+            np.stack([p['fast_period'], p['slow_period']], axis=1), axis=0, return_inverse=True)
+        cross = np.empty((len(close), len(pairs)))
+        for j, (f, s) in enumerate(pairs):
+            cross[:, j] = crossover(ma[f], ma[s], max(f, s) - 1)
+
+        periods, rsi_idx = np.unique(p['rsi_period'], return_inverse=True)
+        rsis = np.stack([rsi(close, n) for n in periods], axis=1)
+
+        minperiod = np.maximum(np.maximum(p['fast_period'], p['slow_period']) + 1,
+                               p['rsi_period'] + 1)
+        return cross[:, pair_idx.ravel()], rsis[:, rsi_idx.ravel()], minperiod
+
+    def run(self, param_ranges=None, combos=None):
+        """对参数网格执行批量回测
+
+        Args:
+            param_ranges (dict): 与 add_optimization_strategy 相同格式的参数范围
+            combos (list[dict], optional): 直接给定参数组合，此时忽略 param_ranges
+
+        Returns:
+            pd.DataFrame: 参数列 + 与 _analyze_optimization_results 相同的指标列
+        """
+        if combos is None:
+            combos = expand_grid(param_ranges)
+        p = self._param_arrays(combos)
+        self._simulate(p)
+        metrics = self.metrics()
+
+        df = pd.DataFrame(combos)
+        for k in METRICS:
+            df[k] = metrics[k]
+        return df
+
+    def _simulate(self, p):
+        bars = self.bars
+        opens, lows, closes = bars['open'], bars['low'], bars['close']
+        T = len(closes)
+        N = len(p['fast_period'])
+        cross, rsis, minperiod = self.signals(p)
+
+        # 每根K线的费率；分档时按组合累计当月成交手数
+        mult, spec = self.comm_mult, self.spec
+        commissions, fixed_taxes, margins = spec.rates(bars['datetime'])
+        tiered = bool(spec.tier_volume)
+        volume = np.zeros(N)
+        if tiered:
+            # datetime 可能是纳秒时间戳或 date2num 数值（walk-forward 的共享矩阵），统一换算后按月分组
+            months = period_keys(bars['datetime'], TimeFrame.Months)
+
+        def comm(size, price):
+            return self._comm(size, price, commission, fixed_tax, spec.tier_rates(volume) if tiered else None)
+
+        cash = np.full(N, float(self.cash))
+        size = np.zeros(N)
+        pprice = np.zeros(N)
+        adjbase = np.zeros(N)
+
+        # 挂起的市价单（在上一根K线的next中创建）
+        mkt_size = np.zeros(N)
+        mkt_price = np.zeros(N)
+
+        # 止损单槽位，按创建顺序排列（即backtrader pending队列中的顺序）
+        K = 2
+        st_state = np.zeros((K, N), dtype=np.int8)
+        st_size = np.zeros((K, N))
+        st_price = np.zeros((K, N))
+        st_id = np.full((K, N), -1, dtype=np.int64)
+        stop_id = np.full(N, -1, dtype=np.int64)  # 策略中 self.stop_order 指向的止损单
+
+        # 交易统计（对应 TradeAnalyzer）
+        tr_size = np.zeros(N)
+        tr_price = np.zeros(N)
+        tr_pnl = np.zeros(N)
+        tr_comm = np.zeros(N)
+        closed_trades = np.zeros(N, dtype=np.int64)
+        won_trades = np.zeros(N, dtype=np.int64)
+
+        equity = np.empty((T, N))
+
+        def execute(mask, dsize, price):
+            """真实撮合（BackBroker._execute），返回 (是否完全成交, 成交数量)"""
+            nonlocal cash, size, pprice, adjbase, volume
+            nonlocal tr_size, tr_price, tr_pnl, tr_comm, closed_trades, won_trades
+            dsize = np.where(mask, dsize, 0.0)
+            price = np.where(mask, price, 0.0)
+            _, _, opened, closed = _position_update(size, pprice, dsize, price)
+
+            closedcomm = comm(closed, price)
+            new_cash = cash + np.where(
+                closed != 0,
+                np.abs(closed) * pprice * mult * margin - closedcomm
+                + -closed * (price - adjbase) * mult,
+                0.0)
+
+            openedcomm = comm(opened, price)
+            open_cash = new_cash - np.abs(opened) * price * mult * margin - openedcomm
+            ok_open = (opened != 0) & (open_cash >= 0)
+            psize = size + dsize
+            adding = ok_open & (np.abs(psize) > np.abs(opened))
+            open_cash = open_cash + np.where(adding, (psize - opened) * (price - adjbase) * mult, 0.0)
+            cash = np.where(ok_open, open_cash, new_cash)
+            adjbase = np.where(ok_open, price, adjbase)
+            opened = np.where(ok_open, opened, 0.0)
+
+            execsize = closed + opened
+            size, pprice, _, _ = _position_update(size, pprice, execsize, price)
+            if tiered:
+                volume = volume + np.abs(execsize)
+
+            # 交易记录：先处理平仓部分，再处理开仓部分
+            has_closed = closed != 0
+            tr_pnl = tr_pnl + np.where(has_closed, -closed * (price - tr_price) * mult, 0.0)
+            tr_comm = tr_comm + np.where(has_closed, closedcomm, 0.0)
+            tr_size = tr_size + closed
+            done = has_closed & (tr_size == 0)
+            closed_trades = closed_trades + done
+            won_trades = won_trades + (done & (tr_pnl - tr_comm >= 0))
+            tr_pnl = np.where(done, 0.0, tr_pnl)
+            tr_comm = np.where(done, 0.0, tr_comm)
+
+            has_opened = opened != 0
+            fresh = has_opened & (tr_size == 0)
+            grow = has_opened & ~fresh
+            new_tr_size = tr_size + opened
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg = (tr_size * tr_price + opened * price) / new_tr_size
+            tr_price = np.where(fresh, price, np.where(grow, avg, tr_price))
+            tr_comm = tr_comm + np.where(has_opened, openedcomm, 0.0)
+            tr_size = new_tr_size
+
+            completed = mask & (execsize == dsize) & (dsize != 0)
+            return completed, execsize
+
+        def pseudo(pcash, csize, cprice, mask, dsize, price):
+            """提交时的保证金检查（BackBroker.check_submitted 中的伪成交）"""
+            dsize = np.where(mask, dsize, 0.0)
+            nsize, nprice, opened, closed = _position_update(csize, cprice, dsize, price)
+            pcash = pcash + np.where(
+                mask,
+                np.abs(closed) * price * mult * margin - comm(closed, price)
+                - np.abs(opened) * price * mult * margin - comm(opened, price),
+                0.0)
+            return pcash, np.where(mask, nsize, csize), np.where(mask, nprice, cprice)
+
+        for t in range(T):
+            o, l, c = opens[t], lows[t], closes[t]
+            commission, fixed_tax, margin = commissions[t], fixed_taxes[t], margins[t]
+            if tiered and t and months[t] != months[t - 1]:
+                volume = np.zeros(N)
+
+            # 1. 检查上一根K线提交的订单：先止损单，再市价单
+            pcash, csize, cprice = cash.copy(), size.copy(), pprice.copy()
+            for k in range(K):
+                m = st_state[k] == _SUBMITTED
+                if not m.any():
+                    continue
+                pcash, csize, cprice = pseudo(pcash, csize, cprice, m, st_size[k], st_price[k])
+                st_state[k] = np.where(m, np.where(pcash >= 0, _ACCEPTED, _EMPTY), st_state[k])
+            m = mkt_size != 0
+            if m.any():
+                pcash, csize, cprice = pseudo(pcash, csize, cprice, m, mkt_size, mkt_price)
+                mkt_size = np.where(m & (pcash < 0), 0.0, mkt_size)
+
+            # 2. 按pending队列顺序撮合：止损单（按创建顺序）在前，市价单在后
+            sell_done = np.zeros(N, dtype=bool)
+            for k in range(K):
+                m = st_state[k] == _ACCEPTED
+                if not m.any():
+                    continue
+                sp = st_price[k]
+                fill = np.where(o <= sp, o, sp)
+                trig = m & ((o <= sp) | (l <= sp))
+                if not trig.any():
+                    continue
+                completed, _ = execute(trig, st_size[k], fill)
+                sell_done |= completed
+                st_state[k] = np.where(trig, _EMPTY, st_state[k])
+
+            buy_done = np.zeros(N, dtype=bool)
+            buy_size = np.zeros(N)
+            m = mkt_size != 0
+            if m.any():
+                completed, execsize = execute(m, mkt_size, o)
+                sell_done |= completed & (mkt_size < 0)
+                buy_done = completed & (mkt_size > 0)
+                buy_size = execsize
+                mkt_size = np.zeros(N)
+
+            # 3. 收盘逐日盯市
+            held = size != 0
+            cash = cash + np.where(held, size * (c - adjbase) * mult, 0.0)
+            adjbase = np.where(held, c, adjbase)
+            value = cash + np.abs(size) * c * mult * margin
+            equity[t] = value
+
+            # 4. notify_order：平仓后取消仍在队列中的当前止损单
+            cancel = sell_done & (size == 0)
+            if cancel.any():
+                hit = cancel & (st_id == stop_id) & (st_state == _ACCEPTED)
+                st_state = np.where(hit, _EMPTY, st_state)
+
+            # 买单成交后提交新的止损单
+            if buy_done.any():
+                order = np.argsort(st_state == _EMPTY, axis=0, kind='stable')
+                st_state = np.take_along_axis(st_state, order, axis=0)
+                st_size = np.take_along_axis(st_size, order, axis=0)
+                st_price = np.take_along_axis(st_price, order, axis=0)
+                st_id = np.take_along_axis(st_id, order, axis=0)
+                slot = (st_state != _EMPTY).sum(axis=0)
+                if slot.max() >= K:
+                    grow = slot.max() - K + 1
+                    st_state = np.vstack([st_state, np.zeros((grow, N), dtype=np.int8)])
+                    st_size = np.vstack([st_size, np.zeros((grow, N))])
+                    st_price = np.vstack([st_price, np.zeros((grow, N))])
+                    st_id = np.vstack([st_id, np.full((grow, N), -1, dtype=np.int64)])
+                    K += grow
+                cols = np.nonzero(buy_done)[0]
+                rows = slot[cols]
+                st_state[rows, cols] = _SUBMITTED
+                st_size[rows, cols] = -buy_size[cols]
+                st_price[rows, cols] = (o - p['mult'] * p['unit'] * p['stop_loss_pct'])[cols]
+                st_id[rows, cols] = t
+                stop_id[cols] = t
+
+            # 5. next()：最小周期之后才开始交易
+            active = t >= minperiod - 1
+            if not active.any():
+                continue
+            cr, rs = cross[t], rsis[t]
+            exit_ = active & (size != 0) & ((cr < 0) | (rs > p['rsi_upper']))
+            entry = active & (size == 0) & (cr > 0) & (rs < p['rsi_upper'])
+
+            risk_amount = value * p['risk_per_trade']
+            price_range = p['unit'] * p['stop_loss_pct'] * p['mult']
+            max_by_margin = cash * 0.9 / (c * p['mult'] * p['margin'])
+            pct_size = np.minimum(np.trunc(risk_amount / price_range), np.trunc(max_by_margin))
+            fixed_size = np.trunc(p['fixed_size'] / c)
+            entry_size = np.where(p['fixed'], fixed_size, pct_size)
+            entry &= entry_size != 0
+
+            mkt_size = np.where(exit_, -size, np.where(entry, entry_size, 0.0))
+            mkt_price = np.full(N, c)
+
+        self.equity = equity
+        self.final_value = equity[-1] if T else np.full(N, float(self.cash))
+        self.closed_trades = closed_trades
+        self.won_trades = won_trades
+
+    def metrics(self):
+        """由权益矩阵一次计算全部组合的指标，口径同 Performance 分析器"""
+        m = equity_metrics(self.equity, self.cash, self.bars['datetime'], self.timeframe,
+                           self.compression, self.riskfreerate)
+        closed = self.closed_trades
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m['胜率 (%)'] = np.where(closed > 0, self.won_trades / closed * 100, 0.0)
+        m['交易次数'] = closed
+        return {k: m[k] for k in METRICS}
+
+
+def check_parity(param_ranges, beginning, end, name="RB", symbol="RB2505", period="daily"):
+    """与backtrader优化路径逐组合对比指标，返回合并后的DataFrame和最大偏差"""
+    import contextlib
+    import io
+    import time
+    from backtest_runner import BackTester
+
+    tester = BackTester(name, symbol, period, beginning, end)
+    tester.add_optimization_strategy(DualMovingAverageStrategy, param_ranges)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = tester.cerebro.run(maxcpus=1)
+        expected = pd.DataFrame(tester._collect_performance(results))
+    bt_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    actual = VectorizedDualMA.from_tester(tester).run(param_ranges)
+    vec_time = time.perf_counter() - t0
+
+    keys = list(param_ranges)
+    merged = expected.merge(actual, on=keys, suffixes=('_bt', '_vec'))
+    diffs = {}
+    for k in METRICS:
+        a = merged[f'{k}_bt'].astype(float).to_numpy()
+        b = merged[f'{k}_vec'].astype(float).to_numpy()
+        same = (a == b) | (np.isnan(a) & np.isnan(b))
+        with np.errstate(invalid='ignore'):
+            diffs[k] = np.where(same, 0.0, np.abs(a - b)).max(initial=0.0)
+    return merged, diffs, bt_time, vec_time
+
+
+if __name__ == "__main__":
+    from utils.sample import SAMPLE
+
+    print("***向量化引擎一致性test***")
+
+    grid = {
+        'fast_period': range(5, 10),
+        'slow_period': range(15, 20),
+        'rsi_upper': [70, 75, 80],
+    }
+    merged, diffs, bt_time, vec_time = check_parity(grid, *SAMPLE[3:])
+
+    print(f"组合数: {len(merged)}")
+    for k, v in diffs.items():
+        print(f"{k:>12}: 最大偏差 {v:.3e}")
+    print(f"backtrader耗时: {bt_time:.2f}s  向量化耗时: {vec_time:.3f}s  "
+          f"加速比: {bt_time / vec_time:.1f}x")
+    assert all(v < 1e-6 for v in diffs.values()), "向量化结果与backtrader不一致"
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+滚动（walk-forward）样本外检验
+
+把回测区间按K线数切成若干 样本内/样本外 窗口：
+    rolling   样本内窗口长度固定，随样本外窗口一起向后滚动
+    anchored  样本内窗口起点固定在区间开头，终点逐步后移
+
+每个窗口在样本内做全网格优化，取夏普比率最高的参数在紧随其后的样本外区间回测。
+样本外回测会向前多取若干根K线给指标预热（见 warmup_bars），保证第一根样本外K线
+即可交易，预热阶段不产生交易。
+
+各窗口在进程池中并行执行，K线只在共享内存中放一份。
+tester 启用性能剖析时各窗口的回测都挂 ProfileAnalyzer，汇总结果随窗口结果回传并入 tester.profiler。
+"""
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from engine.scheduler import SharedBars, run_single
+from engine.search import RANK_METRIC, rank_records
+from engine.vectorized import expand_grid
+from utils.analytics import analyzer_metrics
+from utils.logger import set_quiet
+from utils.recorder import Recorder, RunRecord
+from utils.store import COLUMNS
+
+
+def split_windows(n, in_sample, out_sample, anchored=False):
+    """按K线数切分窗口
+
+    Returns:
+        list[tuple]: (样本内起, 样本内止, 样本外起, 样本外止)，下标左闭右开；
+            最后一个样本外窗口可能不足 out_sample 根
+    """
+    windows = []
+    is_hi = in_sample
+    while is_hi < n:
+        is_lo = 0 if anchored else is_hi - in_sample
+        windows.append((is_lo, is_hi, is_hi, min(is_hi + out_sample, n)))
+        is_hi += out_sample
+    return windows
+
+
+def warmup_bars(strategy, params):
+    """样本外回测需要向前多取的K线数：策略各 *_period 参数的最大值
+
+    对 DualMovingAverageStrategy 恰为 最小周期-1，第一次 next() 落在样本外第一根K线上
+    """
+    values = {**dict(strategy.params._getitems()), **params}
+    periods = [v for k, v in values.items() if k.endswith('period') and isinstance(v, int)]
+    return max(periods, default=0)
+
+
+# 工作进程内的状态，由 _init_worker 设置
+_WORKER = {}
+
+
+def _init_worker(shm_name, shape, settings):
+    set_quiet()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _WORKER.update(settings, shm=shm, matrix=np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+
+
+def _optimize(matrix, combos, profiler=None):
+    """样本内全网格回测，返回 参数 + METRICS 记录"""
+    w = _WORKER
+    if w['vectorized']:
+        from engine.vectorized import VectorizedDualMA
+        from utils.commission import GenericCommInfo
+
+        bars = {'datetime': matrix[0], **{col: matrix[i] for i, col in enumerate(COLUMNS, 1)}}
+        engine = VectorizedDualMA(bars, GenericCommInfo(**w['comm_kwargs']), w['contract_specs'],
+                                  cash=w['cash'], timeframe=w['timeframe'], compression=w['compression'])
+        return engine.run(combos=combos).to_dict('records')
+
+    records = []
+    analyzers = [profiler.analyzer()] if profiler else []
+    for params in combos:
+        result = run_single(matrix, w['timeframe'], w['compression'], w['comm_kwargs'],
+                            w['strategy'], {**w['contract_specs'], **params}, w['cash'],
+                            analyzers=analyzers, fill_model=w['fill_model'])
+        if profiler:
+            profiler.merge(result.analyzers.profiler.get_analysis())
+        records.append({**params, **analyzer_metrics(result)})
+    return records
+
+
+def _run_window(index, window):
+    """单个窗口：样本内优化 + 样本外回测，返回窗口汇总和样本外权益"""
+    w = _WORKER
+    is_lo, is_hi, oos_lo, oos_hi = window
+    matrix = w['matrix']
+    names = list(w['param_ranges'])
+    profiler = None
+    if w['profile'] is not None:
+        from utils.profiling import Profiler
+        profiler = Profiler(**w['profile'])
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        best = rank_records(_optimize(matrix[:, is_lo:is_hi], w['combos'], profiler))[0]
+        params = {k: best[k] for k in names}
+
+        lo = max(0, oos_lo - warmup_bars(w['strategy'], params))
+        analyzers = [(Recorder, 'recorder', {'fields': ('value',)})]
+        result = run_single(matrix[:, lo:oos_hi], w['timeframe'], w['compression'], w['comm_kwargs'],
+                            w['strategy'], {**w['contract_specs'], **params}, w['cash'],
+                            analyzers=analyzers + ([profiler.analyzer()] if profiler else []),
+                            fill_model=w['fill_model'])
+        if profiler:
+            profiler.merge(result.analyzers.profiler.get_analysis())
+    # 只回传样本外部分的紧凑序列化结果
+    record = result.analyzers.recorder.result()
+    oos = RunRecord(record.datetime[oos_lo - lo:], equity=record.equity[oos_lo - lo:])
+    return index, params, best[RANK_METRIC], oos.dumps(), profiler and profiler.to_dict()
+
+
+class WalkForward:
+    """滚动样本外检验
+
+    Args:
+        tester (BackTester): 提供K线、佣金、合约参数和初始资金
+        strategy: 策略类
+        param_ranges (dict): 样本内优化的参数网格
+        in_sample (int): 样本内K线数
+        out_sample (int): 样本外K线数
+        anchored (bool, optional): True 为锚定式，False 为滚动式. Defaults to False.
+        workers (int, optional): 工作进程数，默认CPU核数
+    """
+
+    def __init__(self, tester, strategy, param_ranges, in_sample, out_sample,
+                 anchored=False, workers=None):
+        self.tester = tester
+        self.strategy = strategy
+        self.param_ranges = param_ranges
+        self.in_sample = in_sample
+        self.out_sample = out_sample
+        self.anchored = anchored
+        self.workers = workers or os.cpu_count() or 1
+        self.windows = []
+        self.equity = None
+
+    def run(self):
+        """执行全部窗口
+
+        Returns:
+            (pd.DataFrame, pd.Series): 每个窗口的最优参数与样本内外指标；
+                拼接后的样本外权益曲线（以初始资金为起点逐窗口复利连接）
+        """
+        from strategy.dual_ma import DualMovingAverageStrategy
+
+        t = self.tester
+        bars = t.store.load(t.symbol, t.period, t.beginning, t.end)
+        n = len(bars['close'])
+        self.windows = split_windows(n, self.in_sample, self.out_sample, self.anchored)
+        if not self.windows:
+            raise ValueError(f"K线数 {n} 不足以切分样本内 {self.in_sample} 根的窗口")
+
+        settings = {
+            'timeframe': t.timeframe,
+            'compression': t.compression,
+            'comm_kwargs': t.comm_kwargs,
+            'contract_specs': t.contract_specs,
+            'cash': t.cash,
+            'strategy': self.strategy,
+            'param_ranges': self.param_ranges,
+            'combos': expand_grid(self.param_ranges),
+            'fill_model': t.fill_model,
+            'profile': t.profiler.options() if t.profiler else None,
+            # 向量化引擎按 BackBroker 撮合、没有回调可剖析，设置了成交模型或启用性能剖析时用 backtrader 回测
+            'vectorized': (self.strategy is DualMovingAverageStrategy and t.fill_model is None
+                           and t.profiler is None),
+        }
+        outcomes = [None] * len(self.windows)
+        with SharedBars(bars, t.timeframe) as shared, ProcessPoolExecutor(
+                max_workers=min(self.workers, len(self.windows)),
+                initializer=_init_worker,
+                initargs=(shared.name, shared.shape, settings)) as pool:
+            futures = [pool.submit(_run_window, i, window) for i, window in enumerate(self.windows)]
+            for future in as_completed(futures):
+                index, params, is_sharpe, payload, profile = future.result()
+                outcomes[index] = (params, is_sharpe, RunRecord.loads(payload).equity)
+                if profile:
+                    t.profiler.merge(profile)
+
+        return self._combine(bars, outcomes)
+
+    def _combine(self, bars, outcomes):
+        ts = pd.to_datetime(np.asarray(bars['datetime']))
+        cash = float(self.tester.cash)
+        rows, curves = [], []
+        level = cash
+        for (is_lo, is_hi, oos_lo, oos_hi), (params, is_sharpe, equity) in zip(self.windows, outcomes):
+            growth = equity / cash
+            peak = np.maximum.accumulate(np.concatenate([[cash], equity]))
+            drawdown = (100.0 * (peak[1:] - equity) / peak[1:]).max()
+            curves.append(pd.Series(level * growth, index=ts[oos_lo:oos_hi]))
+            level *= growth[-1]
+            rows.append({
+                '样本内开始': ts[is_lo].date(), '样本内结束': ts[is_hi - 1].date(),
+                '样本外开始': ts[oos_lo].date(), '样本外结束': ts[oos_hi - 1].date(),
+                **params,
+                f'样本内{RANK_METRIC}': is_sharpe,
+                '样本外收益率 (%)': (growth[-1] - 1) * 100,
+                '样本外最大回撤 (%)': drawdown,
+            })
+        self.equity = pd.concat(curves).rename('样本外权益').rename_axis('datetime')
+        return pd.DataFrame(rows), self.equity
+
+
+if __name__ == "__main__":
+    import time
+
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.sample import sample_tester
+
+    print("***滚动样本外检验***")
+
+    grid = {
+        'fast_period': range(5, 10),
+        'slow_period': range(15, 20),
+        'rsi_upper': [70, 75, 80],
+    }
+    tester = sample_tester()
+    for anchored in (False, True):
+        wf = WalkForward(tester, DualMovingAverageStrategy, grid, in_sample=120, out_sample=25,
+                         anchored=anchored)
+        t0 = time.perf_counter()
+        table, equity = wf.run()
+        elapsed = time.perf_counter() - t0
+        print(f"\n--- {'锚定式' if anchored else '滚动式'}：{len(table)} 个窗口，{elapsed:.2f}s ---")
+        print(table.to_string(index=False))
+        print(f"样本外 {len(equity)} 根K线，期末权益 {equity.iloc[-1]:.2f}")
+        expected = sum(oos_hi - oos_lo for _, _, oos_lo, oos_hi in wf.windows)
+        assert len(equity) == expected and equity.index.is_monotonic_increasing
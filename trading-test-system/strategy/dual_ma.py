@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import logging
+
 import backtrader as bt
-from backtrader.indicators import SMA, RSI
+import numpy as np
+from utils.indicator_cache import cached_sma, cached_rsi
+from utils.logger import get_logger
+
+LOG = get_logger('strategy')
 
 class DualMovingAverageStrategy(bt.Strategy):
     """
@@ -33,12 +39,12 @@ class DualMovingAverageStrategy(bt.Strategy):
     )
 
     def __init__(self):
-        # 初始化技术指标
-        self.fast_ma = SMA(
-            period=self.p.fast_period
+        # 初始化技术指标（数据预加载时从进程级指标缓存中取值）
+        self.fast_ma = cached_sma(
+            self.data, self.p.fast_period
         )
-        self.slow_ma = SMA( 
-            period=self.p.slow_period
+        self.slow_ma = cached_sma(
+            self.data, self.p.slow_period
         )
         
         # 交叉信号指标
@@ -47,122 +53,165 @@ class DualMovingAverageStrategy(bt.Strategy):
             self.slow_ma
         )
         
-        self.rsi = bt.indicators.RelativeStrengthIndex(
-            period=self.p.rsi_period)
-        self.portfolio_value = []
+        self.rsi = cached_rsi(
+            self.data, self.p.rsi_period)
         self.stop_order = None  # 止损订单引用
         self.entry_price = 0    # 入场价格
         self.exit_reason = None # 平仓原因跟踪
         self.pending_order = None  # 跟踪挂起的主订单
+        # broker 设置了 filler（成交量限制）时订单可能分多根K线成交
+        self._partial_fills = getattr(self.broker.p, 'filler', None) is not None
+        self._exit_requested = False  # 等待止损单撤销后再平仓
+        # 日志级别在创建时确定，关闭时热点路径只做一次布尔判断
+        self._verbose = LOG.isEnabledFor(logging.INFO)
+        self._debug = LOG.isEnabledFor(logging.DEBUG)
 
     def next(self):
         """策略逻辑执行"""
-        self.portfolio_value.append(self.broker.getvalue())
-        #print(self.position.size)
+        # 开平仓单或止损单尚未全部成交（成交量限制下的部分成交）时不再下新单，避免重复平仓反手
+        if self.pending_order is not None or (self.stop_order is not None
+                                              and self.stop_order.status == bt.Order.Partial):
+            return
         if self.position:
             # 死叉或RSI超卖时平仓
             prev_size = self.position.size
-            if self.crossover < 0 or self.rsi > self.p.rsi_upper:
-                self.close(tag="manual_close")   
+            if self._exit_requested or self.exit_signal(self.p, self.crossover[0], self.rsi[0]):
+                # 可能部分成交时先撤销止损单、撤单生效后再平仓，
+                # 否则平仓单与止损单在同一根K线上各成交一部分会反手做空
+                if self._partial_fills and self.stop_order is not None and self.stop_order.alive():
+                    self._exit_requested = True
+                    self.cancel(self.stop_order)
+                    return
+                self._exit_requested = False
+                self.pending_order = self.close(tag="manual_close")
             if prev_size != 0 and self.position.size == 0:
-                print(f"平仓原因: {self.exit_reason or '未知'}")
+                if self._debug:
+                    self.log('debug', "平仓", 原因=self.exit_reason or '未知')
                 self.exit_reason = None
         
         # 无持仓时的处理        
         else:
+            self._exit_requested = False
             # 金叉时买入
-            if self.crossover > 0 and self.rsi < self.p.rsi_upper:
+            if self.entry_signal(self.p, self.crossover[0], self.rsi[0]):
                 size = self._calculate_position_size()
                 self.pending_order = self.buy(size=size)
 
     def notify_order(self, order):
-        if order == self.stop_order:
-            print("当前止损单")
         """订单状态处理"""
-        if order.status in [order.Submitted, order.Accepted]:
+        if self._debug and order == self.stop_order:
+            self.log('debug', "当前止损单")
+        if order.status in [order.Submitted, order.Accepted, order.Partial]:
             return
+        if order == self.pending_order:
+            self.pending_order = None
             
         if order.status == order.Completed:
             if order.issell():
                 if hasattr(order, 'tag'):
                     self.exit_reason = order.tag
             
-            direction = '买入' if order.isbuy() else '卖出'
-            pos = self.broker.getposition(self.data).size
-            cash = self.broker.getcash()
-            value = self.broker.getvalue()
-            log_msg = (
-                f"{direction} "
-                f"价格={order.executed.price:.2f} "
-                f"手数={order.executed.size} "
-                f"佣金={order.executed.comm:.2f} "
-                f"当前持仓量={pos} "
-                f"当前可用资金={cash:.2f} "
-                f"当前总资产={value:.2f}"
-            )
-            self.log('info', log_msg)
+            if self._verbose:
+                self.log(
+                    'info', '买入' if order.isbuy() else '卖出',
+                    价格=round(order.executed.price, 2),
+                    手数=order.executed.size,
+                    佣金=round(order.executed.comm, 2),
+                    当前持仓量=self.broker.getposition(self.data).size,
+                    当前可用资金=round(self.broker.getcash(), 2),
+                    当前总资产=round(self.broker.getvalue(), 2),
+                )
             
             # 平仓后取消未触发的止损单
             if order.issell() and self.position.size == 0:
                 if self.stop_order and self.stop_order.status in [order.Submitted, order.Accepted]:
                     self.cancel(self.stop_order)
-                    print("已取消未触发止损单")
+                    if self._debug:
+                        self.log('debug', "已取消未触发止损单")
                     
             if order.isbuy():
                 # 记录实际成交价格
                 self.entry_price = order.executed.price
-                print(f"实际成交价：{self.entry_price}")
                 
                 # 计算基于实际成交价的止损
-                stop_price = self.entry_price - self.p.mult*self.p.unit*self.p.stop_loss_pct
-                print(f"计算止损价：{stop_price}（基于成交价{self.entry_price}）")
+                stop_price = self.stop_price(self.p, self.entry_price)
+                if self._debug:
+                    self.log('debug', "计算止损价", 成交价=self.entry_price, 止损价=stop_price)
                 
-                # 提交止损单
-                self.stop_order = self.sell(
-                    exectype=bt.Order.Stop,
-                    price=stop_price,
-                    size=order.executed.size,
-                    tag='stop_loss'
-                )
-                self.pending_order = None
+                # 多头时按实际持仓；平空单（无多头持仓）沿用成交手数，与向量化引擎的撮合口径一致
+                self._submit_stop(stop_price, self.position.size if self.position.size > 0 else order.executed.size)
                 
             elif order.issell():
                 # 处理平仓后的状态重置
-                if order == self.stop_order:
-                    print(f"止损触发，成交价：{order.executed.price}")
+                if order == self.stop_order and self._verbose:
+                    self.log('info', "止损触发", 成交价=order.executed.price)
             
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-            status_name = order.getstatusname()
-            self.log('warning', f"订单异常: {status_name}")
+        elif order.status == order.Canceled:
+            # 平仓后主动撤销止损单属于正常流程
+            if self._verbose:
+                self.log('info', "订单撤销", 状态=order.getstatusname())
+            # 部分成交后被撤销的开仓单，已成交部分同样需要止损
+            if order.isbuy() and order.executed.size and self.position.size > 0:
+                self.entry_price = order.executed.price
+                self._submit_stop(self.stop_price(self.p, self.entry_price), self.position.size)
+        elif order.status in [order.Margin, order.Rejected]:
+            self.log('warning', "订单异常", 状态=order.getstatusname())
+
+    def _submit_stop(self, stop_price, size):
+        """提交止损单"""
+        self.stop_order = self.sell(
+            exectype=bt.Order.Stop,
+            price=stop_price,
+            size=size,
+            tag='stop_loss'
+        )
             
+    @property
+    def portfolio_value(self):
+        """自第一次 next 起每根K线的账户价值（由 Recorder 分析器记录，未挂载时为空）"""
+        try:
+            record = self.analyzers.getbyname('recorder').result()
+        except ValueError:
+            return np.empty(0)
+        return record.equity[record.first_next:]
+
     def _calculate_position_size(self):
         """动态仓位计算"""
-        if self.p.position_type == 'fixed':
-            return int(self.p.fixed_size / self.data.close[0])
+        return self.position_size(self.p, self.data.close[0], self.broker.get_cash(), self.broker.get_value())
+
+    # 以下为与撮合无关的交易规则，实时/模拟盘运行时（engine.live）直接复用
+    @staticmethod
+    def exit_signal(p, crossover, rsi):
+        """死叉或RSI超买时平仓"""
+        return crossover < 0 or rsi > p.rsi_upper
+
+    @staticmethod
+    def entry_signal(p, crossover, rsi):
+        """金叉且RSI未超买时开仓"""
+        return crossover > 0 and rsi < p.rsi_upper
+
+    @staticmethod
+    def stop_price(p, entry_price):
+        """基于实际成交价的止损价"""
+        return entry_price - p.mult*p.unit*p.stop_loss_pct
+
+    @staticmethod
+    def position_size(p, close, cash, value):
+        """开仓手数：固定金额，或按单笔风险与可用保证金取较小值"""
+        if p.position_type == 'fixed':
+            return int(p.fixed_size / close)
         else:
-            cash = self.broker.get_cash()
-            value = self.broker.get_value()
-            risk_amount = value * self.p.risk_per_trade
-            price_range = self.p.unit * self.p.stop_loss_pct *self.p.mult
+            risk_amount = value * p.risk_per_trade
+            price_range = p.unit * p.stop_loss_pct *p.mult
             theoretical_size = risk_amount / (price_range)
-            margin_per_lot = self.data.close[0] * self.p.mult * self.p.margin
+            margin_per_lot = close * p.mult * p.margin
             max_by_margin = cash * 0.9 / margin_per_lot  # 保留10%缓冲
             return min(int(theoretical_size), int(max_by_margin))
             
-    def log(self, level, msg):
+    def log(self, level, msg, **fields):
+        """结构化日志：K线时间 + 消息 + 字段，级别未开启时直接返回"""
+        level = logging.getLevelName(level.upper())
+        if not LOG.isEnabledFor(level):
+            return
         dt = self.data.datetime.datetime().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 颜色代码（可选，增强可读性）
-        colors = {
-            'info': '\033[94m',    # 蓝色
-            'warning': '\033[91m', # 红色
-            'reset': '\033[0m'     # 重置颜色
-        }
-        
-        # 组装带颜色的日志格式（如果不需要颜色可移除）
-        log_msg = (
-            f"{colors.get(level, '')}"
-            f"[{dt}] [{level.upper()}] {msg}"
-            f"{colors['reset']}"
-        )
-        print(log_msg)
\ No newline at end of file
+        LOG.log(level, msg, extra={'bar': dt, 'fields': fields})
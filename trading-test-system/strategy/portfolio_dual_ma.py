@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import backtrader as bt
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.indicator_cache import cached_sma, cached_rsi
+
+# 开平仓、止损价与仓位规则与单品种策略共用
+RULES = DualMovingAverageStrategy
+
+
+class _SymbolState:
+    """单个品种的指标与订单状态；p 为策略参数并入该品种合约参数，供 RULES 的静态规则使用"""
+    __slots__ = ('data', 'position', 'crossover', 'rsi', 'p', 'stop_order')
+
+    def __init__(self, strategy, data, spec):
+        p = strategy.p
+        fast_ma = cached_sma(data, p.fast_period)
+        slow_ma = cached_sma(data, p.slow_period)
+        self.data = data
+        self.position = None
+        self.crossover = bt.ind.CrossOver(fast_ma, slow_ma)
+        self.rsi = cached_rsi(data, p.rsi_period)
+        self.p = SimpleNamespace(**{**dict(p._getitems()), **spec})
+        self.stop_order = None
+
+
+class PortfolioDualMA(bt.Strategy):
+    """
+    多品种双均线交叉策略
+    每个数据源独立执行 DualMovingAverageStrategy 的开平仓与止损逻辑，
+    资金和保证金由同一个broker共享。单品种时与 DualMovingAverageStrategy 结果一致。
+
+    参数说明：
+    与 DualMovingAverageStrategy 相同；合约参数改为 specs:
+    specs: 数据源名称 -> {'mult', 'margin', 'unit'}
+    """
+    params = (
+        ('fast_period', 7),
+        ('slow_period', 16),
+        ('rsi_period', 7),
+        ('rsi_upper', 80),
+        ('order_pct', 0.9),
+        ('stop_loss_pct', 5),    # 止损比例
+        ('risk_per_trade', 0.02),   # 单笔交易风险比例
+        ('position_type', 'percentage'), # 仓位类型 fixed/percentage
+        ('fixed_size', 100000),
+        ('specs', None),
+    )
+
+    def __init__(self):
+        self.states = [_SymbolState(self, d, self.p.specs[d._name]) for d in self.datas]
+        self._by_data = {id(s.data): s for s in self.states}
+
+    def start(self):
+        for s in self.states:
+            s.position = self.broker.getposition(s.data)
+
+    def next(self):
+        """逐品种执行策略逻辑"""
+        for s in self.states:
+            if s.position.size:
+                if RULES.exit_signal(s.p, s.crossover[0], s.rsi[0]):
+                    self.close(data=s.data)
+            elif RULES.entry_signal(s.p, s.crossover[0], s.rsi[0]):
+                self.buy(data=s.data, size=self._calculate_position_size(s))
+
+    def notify_order(self, order):
+        """订单状态处理"""
+        if order.status in [order.Submitted, order.Accepted]:
+            return
+        if order.status != order.Completed:
+            return
+
+        s = self._by_data[id(order.data)]
+        # 平仓后取消未触发的止损单
+        if order.issell() and s.position.size == 0:
+            if s.stop_order and s.stop_order.status in [order.Submitted, order.Accepted]:
+                self.cancel(s.stop_order)
+
+        if order.isbuy():
+            # 基于实际成交价提交止损单
+            s.stop_order = self.sell(
+                data=s.data,
+                exectype=bt.Order.Stop,
+                price=RULES.stop_price(s.p, order.executed.price),
+                size=order.executed.size,
+            )
+
+    def _calculate_position_size(self, s):
+        """动态仓位计算（资金与总资产为全组合口径）"""
+        return RULES.position_size(s.p, s.data.close[0], self.broker.get_cash(), self.broker.get_value())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import backtrader as bt
+import numpy as np
+
+from utils.logger import get_logger
+
+LOG = get_logger('strategy')
+
+
+class TargetPositionStrategy(bt.Strategy):
+    """
+    目标仓位策略
+    执行 engine.signals 预先算好的 (K线 × 品种) 目标矩阵：第 t 根K线收盘时按第 t 行调仓，
+    下一根开盘成交。只有目标与上一行不同的K线才会检查持仓并下单，
+    先下减仓单、再下加仓单，减仓释放的保证金可用于加仓；
+    反手（如 +3 → -5）按一张 order_target_size 单处理，归入加仓单。
+    订单因保证金不足或被拒绝未成交时，之后每根K线都重新检查该品种的持仓，直到达到目标。
+
+    参数说明：
+    targets: (K线数 × 数据源数) 矩阵，列顺序与 cerebro 中数据源的添加顺序一致
+    mode: 'weights' 为名义敞口/账户权益（按调仓时的总资产与收盘价折算为整数手），'lots' 为手数
+    specs: 数据源名称 -> {'mult', 'margin', 'unit'}（PortfolioTester 传入）；
+        单品种（BackTester）时使用 mult 参数
+    """
+    params = (
+        ('targets', None),
+        ('mode', 'weights'),
+        ('specs', None),
+        ('mult', None),
+        ('margin', None),
+        ('unit', None),
+    )
+
+    def __init__(self):
+        targets = np.asarray(self.p.targets, dtype=np.float64)
+        if targets.ndim == 1:
+            targets = targets[:, None]
+        if targets.shape[1] != len(self.datas):
+            raise ValueError(f"targets 有 {targets.shape[1]} 列，数据源有 {len(self.datas)} 个")
+        if self.p.mode not in ('weights', 'lots'):
+            raise ValueError(f"未知的 mode: {self.p.mode}（可选 weights / lots）")
+        self.targets = np.nan_to_num(targets)
+        # 目标发生变化的行（第一行总是检查）
+        changed = np.ones(len(targets), dtype=bool)
+        changed[1:] = (self.targets[1:] != self.targets[:-1]).any(axis=1)
+        self.changed = changed
+        specs = self.p.specs or {}
+        self.mults = np.array([specs[d._name]['mult'] if d._name in specs else self.p.mult for d in self.datas],
+                              dtype=np.float64)
+        self.rebalances = 0
+        self._index = {id(d): j for j, d in enumerate(self.datas)}
+        self._retry = set()  # 订单未能成交的数据源下标，下一根K线即使目标未变也要重新检查
+
+    def next(self):
+        row = len(self) - 1
+        if row >= len(self.targets) or not (self.changed[row] or self._retry):
+            return
+        retry, self._retry = self._retry, set()
+        target = self.targets[row]
+        current = np.array([self.getposition(d).size for d in self.datas], dtype=np.float64)
+        if self.p.mode == 'weights':
+            close = np.array([d.close[0] for d in self.datas])
+            lots = np.trunc(target * self.broker.get_value() / (close * self.mults))
+        else:
+            lots = np.trunc(target)
+
+        cols = np.flatnonzero(lots != current)
+        if not self.changed[row]:
+            # 目标未变时只重试未成交的品种，其余品种不随总资产变化重新调整
+            cols = cols[np.isin(cols, list(retry))]
+        if not len(cols):
+            return
+        self.rebalances += 1
+        # 减仓单在前；反手（|目标| >= |持仓|）归入加仓单，按一张 order_target_size 下单
+        reducing = np.abs(lots[cols]) < np.abs(current[cols])
+        for j in np.concatenate([cols[reducing], cols[~reducing]]):
+            self.order_target_size(data=self.datas[j], target=int(lots[j]))
+
+    def notify_order(self, order):
+        if order.status in [order.Margin, order.Rejected]:
+            self._retry.add(self._index[id(order.data)])
+            LOG.warning("订单异常", extra={'bar': self.data.datetime.datetime().strftime('%Y-%m-%d %H:%M:%S'),
+                                         'fields': {'品种': order.data._name, '状态': order.getstatusname()}})
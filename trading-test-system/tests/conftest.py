@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+
+数据（data/）与 commission.json 按相对路径读取，测试会话在 trading-test-system 目录下运行。
+样例回测（RB2505 日线，见 utils.sample）整个会话只跑一次。
+
+用法（在 trading-test-system 目录下）: python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def repo_root():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def rb2505():
+    """样例区间上 DualMovingAverageStrategy 默认参数回测后的 BackTester"""
+    from utils.sample import run_sample
+
+    return run_sample()
+
+
+@pytest.fixture(scope='session')
+def rb2505_matrix(rb2505):
+    """样例区间的K线 dict 与 run_single 使用的K线矩阵"""
+    import numpy as np
+
+    from utils.store import COLUMNS, feed_datetimes
+
+    t = rb2505
+    bars = t.store.load(t.symbol, t.period, t.beginning, t.end)
+    matrix = np.vstack([feed_datetimes(bars['datetime'], t.timeframe)] +
+                       [np.asarray(bars[col], dtype=np.float64) for col in COLUMNS])
+    return bars, matrix
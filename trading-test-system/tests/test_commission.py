@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""佣金与保证金：RB 配置、批量计算与逐笔一致、回测成交佣金与向量化引擎一致"""
+import contextlib
+import io
+
+import backtrader as bt
+import numpy as np
+import pytest
+
+from engine.scheduler import run_single
+from engine.vectorized import VectorizedDualMA
+from strategy.dual_ma import DualMovingAverageStrategy
+from utils.commission import GenericCommInfo, load_commission, registry
+from utils.recorder import Recorder
+from utils.sample import SAMPLE_FILLS, SAMPLE_VALUE
+
+RB_COMM = {'commission': 0.0001, 'fixed_tax': 1.5, 'mult': 10, 'stocklike': False, 'margin': 0.07,
+           'commtype': bt.CommInfoBase.COMM_FIXED}
+# 分时段费率 + 成交量分档
+DYNAMIC_COMM = {**RB_COMM,
+                'schedule': [{'start': '2024-10-01', 'commission': 0.00015, 'margin': 0.09},
+                             {'start': '2025-02-01', 'fixed_tax': 3.0}],
+                'tiers': [{'volume': 2, 'rate': 0.5}]}
+
+
+def test_rb_registry():
+    comm, specs = load_commission('RB')
+    assert comm == RB_COMM
+    assert specs == {'mult': 10, 'margin': 0.07, 'unit': 1}
+    assert registry() is registry()
+
+
+def test_batch_matches_scalar():
+    ci = GenericCommInfo(**RB_COMM)
+    rng = np.random.default_rng(0)
+    n = 20_000
+    size = rng.integers(-5, 6, n).astype(np.float64)
+    price = np.round(rng.uniform(3000, 4000, n), 1)
+    scalar = np.array([ci.getcommission(s, p) for s, p in zip(size, price)])
+    margin = np.array([ci.getoperationcost(s, p) for s, p in zip(size, price)])
+    assert np.array_equal(scalar, ci.spec.commission_costs(size, price))
+    assert np.array_equal(margin, ci.spec.margin_costs(size, price))
+
+
+def test_sample_backtest(rb2505):
+    assert round(rb2505.cerebro.broker.getvalue(), 4) == SAMPLE_VALUE
+    assert len(rb2505.record.fills) == SAMPLE_FILLS
+    fills = rb2505.record.fills
+    assert np.allclose(rb2505.comm.spec.fill_costs(fills)['comm'], fills['comm'], rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('kwargs', [RB_COMM, DYNAMIC_COMM], ids=['RB', '分时段+分档'])
+def test_fill_costs_match_backtest(rb2505_matrix, kwargs):
+    bars, matrix = rb2505_matrix
+    _, specs = load_commission('RB')
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run_single(matrix, bt.TimeFrame.Days, 1, kwargs, DualMovingAverageStrategy, specs, 10000,
+                            analyzers=[(Recorder, 'recorder', {'fields': ('value',)})])
+    fills = result.analyzers.recorder.result().fills
+    ci = GenericCommInfo(**kwargs)
+    assert np.allclose(ci.spec.fill_costs(fills)['comm'], fills['comm'], rtol=1e-12, atol=0)
+
+    engine = VectorizedDualMA(bars, ci, specs)
+    engine.run(combos=[{}])
+    assert engine.final_value[0] == pytest.approx(result.broker.getvalue(), abs=1e-8)
+
+
+def test_vectorized_tiers_with_float_datetimes(rb2505_matrix):
+    """walk-forward 传入 date2num 数值时，分档成交量仍按自然月清零"""
+    bars, matrix = rb2505_matrix
+    _, specs = load_commission('RB')
+    ci = GenericCommInfo(**DYNAMIC_COMM)
+    values = []
+    for dt in (bars['datetime'], matrix[0]):
+        engine = VectorizedDualMA({**bars, 'datetime': dt}, ci, specs)
+        engine.run(combos=[{}])
+        values.append(engine.final_value[0])
+    assert values[0] == values[1]
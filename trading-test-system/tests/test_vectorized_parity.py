@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""向量化引擎与 backtrader 优化路径逐组合一致"""
+from engine.vectorized import VectorizedDualMA, check_parity
+from utils.sample import SAMPLE, SAMPLE_VALUE
+
+GRID = {
+    'fast_period': range(5, 10),
+    'slow_period': range(15, 20),
+    'rsi_upper': [70, 75, 80],
+}
+
+
+def test_default_params_match_sample(rb2505):
+    engine = VectorizedDualMA.from_tester(rb2505)
+    engine.run(combos=[{}])
+    assert round(engine.final_value[0], 4) == SAMPLE_VALUE
+
+
+def test_grid_parity():
+    merged, diffs, _, _ = check_parity(GRID, *SAMPLE[3:])
+    assert len(merged) == len(GRID['fast_period']) * len(GRID['slow_period']) * len(GRID['rsi_upper'])
+    assert all(v < 1e-6 for v in diffs.values()), diffs
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+回测绩效指标
+
+BackTester 与优化进程池共用同一套分析器配置和指标提取逻辑，
+保证单次回测、backtrader优化和并行优化输出的指标口径一致。
+
+指标不再由 Returns / DrawDown / SharpeRatio / TradeAnalyzer 四个分析器逐K线在Python中累计，
+而是由 Performance 分析器记录权益曲线和已平仓交易，回测结束时一次向量化计算；
+performance() 同样接受 (K线数 × 回测数) 的权益矩阵，一次算出多次回测的指标。
+口径与原分析器逐项一致：
+    总收益率      Returns.rtot，对数收益 ln(期末/期初)
+    年化收益率    Returns.rnorm100，按数据周期计数后年化（日252/周52/月12/年1，日内周期不年化）
+    夏普比率      SharpeRatio(timeframe=Days)：日收益减去折算到日的无风险利率，均值/总体标准差，不年化
+    最大回撤      DrawDown.max.drawdown / max.len，以权益曲线自身的历史高点为基准
+    胜率          TradeAnalyzer，净盈亏 >= 0 记为盈利
+另给出同口径的索提诺比率（下行标准差）和盈利因子（盈利总额/亏损总额）。
+"""
+import numpy as np
+from backtrader import TimeFrame
+
+from utils.recorder import Recorder
+from utils.store import NS_PER_DAY, _EPOCH_ORDINAL
+
+# 优化结果中的指标列（其余列均视为参数列）
+METRICS = ['总收益率 (%)', '年化收益率 (%)', '夏普比率', '最大回撤 (%)', '交易次数', '胜率 (%)']
+# 单次回测报告中的全部指标
+REPORT_METRICS = METRICS + ['索提诺比率', '最大回撤金额', '最长回撤周期', '盈利因子']
+
+# Returns 分析器的年化因子
+_TANN = {TimeFrame.Days: 252.0, TimeFrame.Weeks: 52.0, TimeFrame.Months: 12.0, TimeFrame.Years: 1.0}
+_US_PER_DAY = NS_PER_DAY // 1000
+
+
+def _to_us(dt):
+    """datetime64 / 纳秒时间戳 / backtrader datetime 数值 -> 微秒时间戳"""
+    dt = np.asarray(dt)
+    if dt.dtype.kind == 'M':
+        return dt.astype('datetime64[us]').astype(np.int64)
+    if dt.dtype.kind == 'f':
+        # 同 backtrader num2date：距整秒不足10微秒的视为浮点误差，对齐到整秒
+        days = np.floor(dt)
+        tod = np.round((dt - days) * _US_PER_DAY).astype(np.int64)
+        frac = tod % 10**6
+        tod = np.where(frac < 10, tod - frac, np.where(frac > 999990, tod - frac + 10**6, tod))
+        return (days.astype(np.int64) - _EPOCH_ORDINAL) * _US_PER_DAY + tod
+    return dt.astype(np.int64) // 1000
+
+
+def period_keys(dt, timeframe, compression=1):
+    """每根K线所属统计周期的编号（单调不减），与 TimeFrameAnalyzerBase 的周期切换一致"""
+    us = _to_us(dt)
+    if timeframe == TimeFrame.NoTimeFrame:
+        return np.zeros(len(us), dtype=np.int64)
+    days = us // _US_PER_DAY
+    if timeframe == TimeFrame.Days:
+        return days
+    if timeframe == TimeFrame.Weeks:
+        return (days + 3) // 7  # 1970-01-01 为周四，按周一开始的ISO周分组
+    if timeframe >= TimeFrame.Months:
+        months = us.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+        return months if timeframe == TimeFrame.Months else months // 12
+    # 日内：当日的分钟/秒/微秒数按 compression 分组
+    unit = {TimeFrame.Minutes: 60 * 10**6, TimeFrame.Seconds: 10**6}.get(timeframe, 1)
+    point = (us - days * _US_PER_DAY) // unit // compression
+    return days * (_US_PER_DAY // unit + 1) + point
+
+
+def _longest_run(mask):
+    """沿第0轴连续为 True 的最长长度"""
+    idx = np.arange(len(mask)).reshape((-1,) + (1,) * (mask.ndim - 1))
+    last_false = np.maximum.accumulate(np.where(mask, -1, idx), axis=0)
+    return (idx - last_false).max(axis=0, initial=0)
+
+
+def equity_metrics(equity, cash, dt, timeframe=TimeFrame.Days, compression=1, riskfreerate=0.02):
+    """由逐K线权益计算收益、夏普/索提诺和回撤指标
+
+    Args:
+        equity (np.ndarray): 每根K线（含指标预热阶段）的账户价值，一维或 (K线数 × 回测数)
+        cash (float | np.ndarray): 期初资金，二维时可逐列给定
+        dt (np.ndarray): 每根K线的时间（datetime64、纳秒时间戳或 backtrader datetime 数值）
+        timeframe, compression: 数据周期，决定年化收益率的计数周期
+        riskfreerate (float): 年化无风险利率
+
+    Returns:
+        dict: 指标名 -> 标量（一维）或按列的数组（二维）；无法计算的夏普/索提诺比率为 nan
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if not len(equity):
+        raise ValueError("权益曲线为空")
+    start = np.broadcast_to(np.asarray(cash, dtype=np.float64), equity.shape[1:])
+
+    # Returns：对数总收益，按数据周期个数求均值后年化
+    ratio = equity[-1] / start
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rtot = np.where(ratio < 0, -np.inf, np.log(np.where(ratio < 0, 1.0, ratio)))
+    nperiods = np.count_nonzero(np.diff(period_keys(dt, timeframe, compression))) + 1
+    ravg = rtot / nperiods
+    rnorm = np.where(ravg > -np.inf, np.expm1(ravg * _TANN.get(timeframe, 1.0)), ravg)
+
+    # SharpeRatio(Days)：每日最后一根K线的权益相对前一日的收益，首日相对期初资金
+    day = period_keys(dt, TimeFrame.Days)
+    last = np.append(np.flatnonzero(np.diff(day)), len(day) - 1)
+    daily = equity[last]
+    prev = np.concatenate([start[None], daily[:-1]])
+    excess = daily / prev - 1.0 - (pow(1.0 + riskfreerate, 1.0 / 252) - 1.0)
+    avg = excess.mean(axis=0)
+    dev = np.sqrt(((excess - avg) ** 2).mean(axis=0))
+    downside = np.sqrt((np.minimum(excess, 0.0) ** 2).mean(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(dev > 0, avg / dev, np.nan)
+        sortino = np.where(downside > 0, avg / downside, np.nan)
+
+    # DrawDown：以已出现的最高权益为基准，回撤周期为连续处于回撤中的K线数
+    peak = np.maximum.accumulate(equity, axis=0)
+    moneydown = peak - equity
+    drawdown = 100.0 * moneydown / peak
+
+    return {
+        '总收益率 (%)': rtot,
+        '年化收益率 (%)': rnorm * 100.0,
+        '夏普比率': sharpe,
+        '索提诺比率': sortino,
+        '最大回撤 (%)': drawdown.max(axis=0),
+        '最大回撤金额': moneydown.max(axis=0),
+        '最长回撤周期': _longest_run(drawdown != 0),
+    }
+
+
+def trade_metrics(pnlcomm):
+    """由已平仓交易的净盈亏计算交易次数、胜率和盈利因子"""
+    pnl = np.asarray(pnlcomm, dtype=np.float64)
+    closed = len(pnl)
+    won = int(np.count_nonzero(pnl >= 0))
+    gross_win, gross_loss = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    if gross_loss > 0:
+        profit_factor = gross_win / gross_loss
+    else:
+        profit_factor = np.inf if gross_win > 0 else np.nan
+    return {
+        '交易次数': closed,
+        '胜率 (%)': won / closed * 100 if closed > 0 else 0,
+        '盈利因子': float(profit_factor),
+    }
+
+
+def _pnlcomm(trades):
+    trades = np.asarray(trades)
+    return trades['pnlcomm'] if trades.dtype.names else trades
+
+
+def performance(equity, cash, dt, trades=(), timeframe=TimeFrame.Days, compression=1, riskfreerate=0.02):
+    """权益曲线 + 已平仓交易的全部指标（REPORT_METRICS）
+
+    Args:
+        equity, cash, dt, timeframe, compression, riskfreerate: 同 equity_metrics
+        trades: 一维时为已平仓交易（TRADE_DTYPE 结构化数组或净盈亏数组）；
+            二维时为与各列对应的列表
+
+    Returns:
+        dict: 一维时为Python标量，无法计算的比率为 None（与backtrader分析器一致）；
+            二维时为按列的数组
+    """
+    metrics = equity_metrics(equity, cash, dt, timeframe, compression, riskfreerate)
+    if np.ndim(equity) == 2:
+        columns = [trade_metrics(_pnlcomm(t)) for t in trades] if len(trades) else \
+            [trade_metrics(())] * np.shape(equity)[1]
+        for k in columns[0]:
+            metrics[k] = np.array([c[k] for c in columns])
+        return {k: metrics[k] for k in REPORT_METRICS}
+
+    metrics.update(trade_metrics(_pnlcomm(trades)))
+    result = {}
+    for k in REPORT_METRICS:
+        v = metrics[k]
+        if isinstance(v, np.ndarray) or isinstance(v, np.generic):
+            v = v.item()
+        result[k] = None if k in ('夏普比率', '索提诺比率') and v != v else v
+    return result
+
+
+class Performance(Recorder):
+    """记录权益曲线与已平仓交易，回测结束时一次性计算 REPORT_METRICS
+
+    计算完成后丢弃记录数组，优化结果跨进程回传时只携带指标；
+    需要逐K线数据时另挂 Recorder。
+
+    参数:
+    riskfreerate: 夏普/索提诺比率使用的年化无风险利率
+    """
+    params = (
+        ('fields', ('value',)),
+        ('riskfreerate', 0.02),
+    )
+
+    def start(self):
+        super().start()
+        self.start_value = self.strategy.broker.getvalue()
+        self.rets = {}
+
+    def stop(self):
+        record = self.result()
+        self.rets = performance(record.equity, self.start_value, record.datetime, record.trades,
+                                self.data._timeframe, self.data._compression, self.p.riskfreerate)
+        self.i = 0
+        self.dt = np.empty(0)
+        self.buffers = {f: np.empty(0, dtype=b.dtype) for f, b in self.buffers.items()}
+        self.trades = []
+
+    def get_analysis(self):
+        return self.rets
+
+
+def add_analyzers(cerebro, riskfreerate=0.02):
+    """添加绩效分析器（收益率、夏普比率、回撤和交易统计）"""
+    cerebro.addanalyzer(Performance, riskfreerate=riskfreerate, _name='performance')
+
+
+def analyzer_metrics(strategy):
+    """从策略实例的分析器中提取优化报告所需的指标"""
+    perf = strategy.analyzers.performance.get_analysis()
+    return {k: perf[k] for k in METRICS}
+
+
+if __name__ == "__main__":
+    import backtrader as bt
+
+    from benchmark.synthetic import generate_bars
+    from engine.scheduler import run_single
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.commission import load_commission
+    from utils.logger import set_quiet
+    from utils.store import COLUMNS, BarStore, feed_datetimes, period_timeframe
+
+    print("***向量化绩效指标与backtrader分析器一致性test***")
+    set_quiet()
+    reference = [
+        (bt.analyzers.Returns, 'returns'),
+        (bt.analyzers.DrawDown, 'drawdown'),
+        (bt.analyzers.SharpeRatio, 'sharpe', {'riskfreerate': 0.02, 'timeframe': TimeFrame.Days,
+                                              'compression': 1}),
+        (bt.analyzers.TradeAnalyzer, 'trades'),
+        (Recorder, 'recorder'),
+    ]
+
+    def expected(strategy):
+        ret, dd = strategy.analyzers.returns.get_analysis(), strategy.analyzers.drawdown.get_analysis()
+        trades = strategy.analyzers.trades.get_analysis()
+        closed = trades.total.closed if trades.total.total != 0 else 0
+        return {
+            '总收益率 (%)': ret['rtot'],
+            '年化收益率 (%)': ret['rnorm100'],
+            '夏普比率': strategy.analyzers.sharpe.get_analysis()['sharperatio'],
+            '最大回撤 (%)': dd.max.drawdown,
+            '最大回撤金额': dd.max.moneydown,
+            '最长回撤周期': dd.max.len,
+            '交易次数': closed,
+            '胜率 (%)': trades.won.total / closed * 100 if closed > 0 else 0,
+        }
+
+    def matrix_of(bars, timeframe):
+        return np.vstack([feed_datetimes(bars['datetime'], timeframe)] +
+                         [np.asarray(bars[col], dtype=np.float64) for col in COLUMNS])
+
+    comm, specs = load_commission('RB')
+    cases = [('RB2505 日线', matrix_of(BarStore().load('RB2505', 'daily'), TimeFrame.Days), 'daily')]
+    minute = generate_bars(20000, freq='5min', seed=3)
+    minute['datetime'] = minute['datetime'].astype('datetime64[ns]').astype(np.int64)
+    cases.append(('合成5分钟线', matrix_of({c: minute[c].to_numpy() for c in minute}, TimeFrame.Minutes), '5m'))
+
+    grid = [{'fast_period': f, 'slow_period': s} for f in (5, 8) for s in (15, 30)]
+    for label, matrix, period in cases:
+        timeframe, compression = period_timeframe(period)
+        worst = 0.0
+        curves, trade_lists, actual = [], [], []
+        for params in grid:
+            s = run_single(matrix, timeframe, compression, comm, DualMovingAverageStrategy,
+                           {**specs, **params}, 10000, analyzers=reference)
+            exp, got = expected(s), s.analyzers.performance.get_analysis()
+            for k, v in exp.items():
+                if v is None or got[k] is None:
+                    assert v is got[k], (label, k, v, got[k])
+                else:
+                    worst = max(worst, abs(v - got[k]) / max(1.0, abs(v)))
+            record = s.analyzers.recorder.result()
+            curves.append(record.equity)
+            trade_lists.append(record.trades)
+            actual.append(got)
+        # 矩阵模式：多次回测的权益曲线一次计算
+        batch = performance(np.column_stack(curves), 10000, record.datetime, trade_lists,
+                            timeframe, compression)
+        for j, got in enumerate(actual):
+            for k in REPORT_METRICS:
+                a, b = got[k], batch[k][j]
+                assert (a is None and b != b) or a == b or abs(a - b) <= 1e-12 * max(1.0, abs(a)), (k, a, b)
+        print(f"{label}: {len(grid)} 组参数, {matrix.shape[1]} 根K线, 与分析器最大相对偏差 {worst:.1e}")
+        print("  " + ", ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in actual[0].items()))
+        assert worst < 1e-9
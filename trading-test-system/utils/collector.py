@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+多合约并发行情采集
+
+AkshareCollector 一次同步取一个合约并整文件重写；刷新一批合约时改用 CollectorManager：
+1. asyncio 调度 + 线程池执行阻塞的接口调用，并发数由 workers 控制
+2. 令牌桶限速（rate 次/秒），失败按指数退避重试
+3. 本地CSV即缓存：只保留/追加最后时间戳之后的新K线，max_age 内取过的合约直接跳过
+   数据源支持 start_date 参数时只请求新K线；akshare 新浪日线接口不支持，取回后在本地过滤
+
+    manager = CollectorManager(['RB2505', 'HC2505'], workers=8, rate=5)
+    report = manager.collect()
+
+数据源为 callable(symbol[, start_date]) -> futures_zh_daily_sina 格式的DataFrame，
+离线测试可用 benchmark.synthetic.StubDailySource 替换。
+"""
+import asyncio
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.data import DT_FORMAT, akshare_daily, normalize_daily
+from utils.logger import get_logger
+
+LOG = get_logger('collector')
+
+
+def last_timestamp(path):
+    """读取CSV最后一行的时间戳（只读文件末尾），文件不存在或无数据时返回None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        lines = f.read().splitlines()
+    lines = [line for line in lines if line.strip()]
+    if not lines or lines[-1].startswith(b'datetime'):
+        return None  # 空文件或只有表头
+    return lines[-1].split(b',', 1)[0].decode()
+
+
+def _header(path):
+    with open(path, encoding='utf-8') as f:
+        return f.readline().strip().split(',')
+
+
+class RateLimiter:
+    """asyncio 令牌桶限速器
+
+    Args:
+        rate (float): 每秒允许的请求数
+        burst (int, optional): 令牌桶容量（允许的瞬时突发数）
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._last is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._last = loop.time()
+                self._tokens = 1
+            self._tokens -= 1
+
+
+class CollectorManager:
+    """多合约并发采集与增量更新
+
+    Args:
+        symbols (list[str]): 合约代码
+        source (callable, optional): 数据源，缺省为 akshare 新浪日线接口
+        period (str, optional): 周期，决定文件名 {symbol}_{period}.csv
+        data_dir (str, optional): 行情目录，与 BackTester 一致为 data
+        workers (int, optional): 并发请求数（线程池大小）
+        rate (float, optional): 每秒最多请求数，None 为不限速
+        retries (int, optional): 失败后的重试次数
+        backoff (float, optional): 首次重试等待秒数，之后每次翻倍
+        max_age (float, optional): 距上次成功采集不足该秒数的合约直接使用本地缓存
+    """
+
+    CACHE_FILE = 'collector_cache.json'
+
+    def __init__(self, symbols, source=None, period='daily', data_dir='data', workers=8,
+                 rate=None, retries=3, backoff=0.5, max_age=None):
+        self.symbols = list(symbols)
+        self.source = source or akshare_daily
+        self.period = period
+        self.data_dir = data_dir
+        self.workers = workers
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.max_age = max_age
+        try:
+            self._incremental = 'start_date' in inspect.signature(self.source).parameters
+        except (TypeError, ValueError):
+            self._incremental = False
+
+    def csv_path(self, symbol):
+        return os.path.join(self.data_dir, f"{symbol}_{self.period}.csv")
+
+    @property
+    def cache_path(self):
+        return os.path.join(self.data_dir, self.CACHE_FILE)
+
+    def _load_cache(self):
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    async def _fetch(self, symbol, start, executor, limiter):
+        """带限速与重试的单次请求，返回 (原始数据, 尝试次数)"""
+        loop = asyncio.get_running_loop()
+        kwargs = {'start_date': start} if self._incremental and start else {}
+        for attempt in range(self.retries + 1):
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                raw = await loop.run_in_executor(executor, lambda: self.source(symbol, **kwargs))
+                return raw, attempt + 1
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _collect_one(self, symbol, cache, executor, limiter):
+        t0 = time.perf_counter()
+        path = self.csv_path(symbol)
+        entry = cache.get(symbol)
+        if self.max_age and entry and os.path.exists(path) and time.time() - entry['fetched'] < self.max_age:
+            return {'symbol': symbol, 'status': 'cached', 'rows': 0, 'attempts': 0, 'seconds': 0.0}
+
+        last = last_timestamp(path)
+        try:
+            raw, attempts = await self._fetch(symbol, last, executor, limiter)
+        except Exception as e:
+            return {'symbol': symbol, 'status': 'failed', 'rows': 0, 'attempts': self.retries + 1,
+                    'seconds': time.perf_counter() - t0, 'error': repr(e)}
+
+        df = normalize_daily(raw)
+        if last is None:
+            df.to_csv(path, index=False)
+            status = 'full'
+        else:
+            # 时间格式固定，字符串比较即时间比较
+            df = df[df['datetime'] > last]
+            if len(df):
+                df[_header(path)].to_csv(path, mode='a', header=False, index=False)
+            status = 'incremental' if len(df) else 'uptodate'
+        cache[symbol] = {'fetched': time.time(), 'last': df['datetime'].iloc[-1] if len(df) else last}
+        return {'symbol': symbol, 'status': status, 'rows': len(df), 'attempts': attempts,
+                'seconds': time.perf_counter() - t0}
+
+    async def collect_async(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        cache = self._load_cache()
+        limiter = RateLimiter(self.rate, burst=self.workers) if self.rate else None
+        with ThreadPoolExecutor(self.workers) as executor:
+            sem = asyncio.Semaphore(self.workers)
+
+            async def bounded(symbol):
+                async with sem:
+                    return await self._collect_one(symbol, cache, executor, limiter)
+
+            results = await asyncio.gather(*(bounded(s) for s in self.symbols))
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+        return results
+
+    def collect(self):
+        """采集全部合约，返回每个合约的状态表
+
+        status: full 首次全量 / incremental 追加新K线 / uptodate 无新数据 / cached 未请求 / failed 重试后仍失败
+        """
+        report = pd.DataFrame(asyncio.run(self.collect_async()))
+        counts = report['status'].value_counts().to_dict()
+        LOG.info(f"采集完成 {len(report)} 个合约: {counts}，新增K线 {int(report['rows'].sum())} 根")
+        return report
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    if len(sys.argv) > 1:
+        # 用法: python -m utils.collector RB2505 HC2505 ...
+        CollectorManager(sys.argv[1:], workers=4, rate=2).collect()
+        sys.exit()
+
+    print("***并发采集与增量更新test（离线数据源）***")
+    from benchmark.synthetic import StubDailySource
+
+    with tempfile.TemporaryDirectory() as tmp:
+        symbols = [f"SYN{i:02d}01" for i in range(20)]
+        source = StubDailySource(end='2025-05-01', latency=0.01, fail_rate=0.2, seed=1)
+        manager = CollectorManager(symbols, source=source, data_dir=tmp, workers=8, rate=200, backoff=0.01,
+                                   retries=10)
+        first = manager.collect()
+        assert (first['status'] == 'full').all()
+
+        source.end = pd.Timestamp('2025-06-01')
+        second = manager.collect()
+        assert (second['status'] == 'incremental').all()
+
+        # 增量追加结果与一次性全量下载一致
+        fresh = os.path.join(tmp, 'fresh')
+        CollectorManager(symbols, source=StubDailySource(end='2025-06-01'), data_dir=fresh).collect()
+        for s in symbols:
+            a = pd.read_csv(manager.csv_path(s))
+            b = pd.read_csv(os.path.join(fresh, f"{s}_daily.csv"))
+            assert a.equals(b), s
+        print(f"增量结果与全量一致，最后时间戳 {last_timestamp(manager.csv_path(symbols[0]))}")
+
+        manager.max_age = 3600
+        calls = source.calls
+        third = manager.collect()
+        assert (third['status'] == 'cached').all() and source.calls == calls
+        print(f"缓存命中，未发起请求；失败重试次数合计 {int((first['attempts'] - 1).sum() + (second['attempts'] - 1).sum())}")
+        datetime_check = pd.read_csv(manager.csv_path(symbols[0]))['datetime'].iloc[-1]
+        assert datetime_check == pd.Timestamp('2025-05-30').strftime(DT_FORMAT)
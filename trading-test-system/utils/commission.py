@@ -1,4 +1,219 @@
+"""
+佣金与保证金
+
+commission.json 每个品种一项，整个文件只读取一次，解析为 CommissionSpec 放在 CommissionRegistry 中
+（文件修改后自动重新读取）。除基础费率外支持两个可选字段：
+
+    schedule  分时段费率：[{"start": "2025-01-01", "commission": 0.00012, "margin": 0.08}, ...]
+              按 start 升序，从该日起覆盖所列字段（commission / fixed_tax / margin），
+              未列出的字段沿用上一时段；第一个时段之前使用基础费率
+    tiers     按自然月累计成交手数分档的手续费系数：[{"volume": 0, "rate": 1.0}, {"volume": 500, "rate": 0.8}]
+              每笔成交按成交前当月已成交手数所在档位计费
+
+CommissionSpec 的 commission / margin / fill_costs 对成交数组批量计算，供向量化引擎使用；
+GenericCommInfo 是同一套规则在 backtrader 中的逐笔实现，费率随时间变化时需要 bind(data) 取得当前K线时间。
+"""
+import bisect
+import json
+import os
+import re
+from datetime import datetime
+
 import backtrader as bt
+import numpy as np
+
+from utils.store import date2num_array
+
+COMMISSION_PATH = os.path.join('data', 'commission', 'commission.json')
+COMMTYPES = {
+    "COMM_FIXED": bt.CommInfoBase.COMM_FIXED,
+    "COMM_PERC": bt.CommInfoBase.COMM_PERC
+}
+SCHEDULE_FIELDS = ('commission', 'fixed_tax', 'margin')
+
+
+def _month(dtnum):
+    """backtrader datetime 数值 -> 自然月编号"""
+    d = bt.num2date(dtnum)
+    return d.year * 12 + d.month - 1
+
+
+def _dtnum(dt):
+    """datetime64 / 纳秒时间戳 / backtrader datetime 数值 -> backtrader datetime 数值数组"""
+    dt = np.asarray(dt)
+    if dt.dtype.kind == 'M':
+        dt = dt.astype('datetime64[ns]').astype(np.int64)
+    elif dt.dtype.kind == 'f':
+        return dt
+    return date2num_array(np.atleast_1d(dt)).reshape(dt.shape)
+
+
+class CommissionSpec:
+    """一个品种的佣金与保证金规则
+
+    Args:
+        commission (float): 按成交金额收取的费率
+        fixed_tax (float): 每手固定费用
+        mult (float): 合约乘数
+        margin (float): 保证金比例
+        commtype: backtrader 佣金类型
+        stocklike (bool): 是否为股票类
+        unit (int): 最小下单单位（传给策略）
+        schedule (list[dict]): 分时段费率
+        tiers (list[dict]): 按月成交量分档的手续费系数
+    """
+
+    __slots__ = ('name', 'commission', 'fixed_tax', 'mult', 'margin', 'commtype', 'stocklike', 'unit',
+                 'schedule', 'tiers', 'starts', 'segments', 'tier_volume', 'tier_rate')
+
+    def __init__(self, commission=0.0, fixed_tax=2, mult=1, margin=0.1, commtype=bt.CommInfoBase.COMM_FIXED,
+                 stocklike=False, unit=1, schedule=(), tiers=(), name=None):
+        self.name = name
+        self.commission = commission
+        self.fixed_tax = fixed_tax
+        self.mult = mult
+        self.margin = margin
+        self.commtype = COMMTYPES.get(commtype, commtype)
+        self.stocklike = stocklike
+        self.unit = unit
+        self.schedule = [dict(s) for s in schedule]
+        self.tiers = [dict(t) for t in tiers]
+
+        # 时段起点（backtrader datetime 数值）与各时段的 (commission, fixed_tax, margin)，第0段为基础费率
+        self.starts = []
+        self.segments = [(commission, fixed_tax, margin)]
+        for s in sorted(self.schedule, key=lambda s: s['start']):
+            unknown = set(s) - {'start', *SCHEDULE_FIELDS}
+            if unknown:
+                raise ValueError(f"schedule 中不支持的字段: {', '.join(sorted(unknown))}")
+            prev = dict(zip(SCHEDULE_FIELDS, self.segments[-1]))
+            prev.update({k: s[k] for k in SCHEDULE_FIELDS if k in s})
+            self.starts.append(bt.date2num(datetime.fromisoformat(str(s['start']))))
+            self.segments.append(tuple(prev[k] for k in SCHEDULE_FIELDS))
+
+        tiers = sorted(self.tiers, key=lambda t: t['volume'])
+        if tiers and tiers[0]['volume'] > 0:
+            tiers.insert(0, {'volume': 0, 'rate': 1.0})
+        self.tier_volume = [t['volume'] for t in tiers]
+        self.tier_rate = [t['rate'] for t in tiers]
+
+    @classmethod
+    def from_config(cls, name, config):
+        """commission.json 中的一项"""
+        return cls(name=name, **config)
+
+    @property
+    def static(self):
+        """费率是否与时间和成交量无关"""
+        return not self.starts and not self.tier_volume
+
+    def comm_kwargs(self):
+        """GenericCommInfo 的参数（没有 schedule / tiers 时与之前的格式一致）"""
+        kwargs = {k: getattr(self, k) for k in ('commission', 'fixed_tax', 'mult', 'stocklike', 'margin',
+                                                'commtype')}
+        if self.schedule:
+            kwargs['schedule'] = self.schedule
+        if self.tiers:
+            kwargs['tiers'] = self.tiers
+        return kwargs
+
+    def contract_specs(self):
+        """传给策略的合约参数"""
+        return {'mult': self.mult, 'margin': self.margin, 'unit': self.unit}
+
+    def rate_at(self, dtnum=None):
+        """某一时刻的 (commission, fixed_tax, margin)；dtnum 为 None 时为基础费率"""
+        if dtnum is None or not self.starts:
+            return self.segments[0]
+        return self.segments[bisect.bisect_right(self.starts, dtnum)]
+
+    def rates(self, dt):
+        """批量版 rate_at：返回 commission, fixed_tax, margin 三个数组"""
+        dtnum = _dtnum(dt)
+        seg = np.asarray(self.segments, dtype=np.float64)
+        idx = np.searchsorted(np.asarray(self.starts, dtype=np.float64), dtnum, side='right')
+        return seg[idx, 0], seg[idx, 1], seg[idx, 2]
+
+    def tier_rates(self, volume):
+        """成交前当月已成交手数 -> 手续费系数"""
+        if not self.tier_volume:
+            return np.ones(np.shape(volume))
+        idx = np.searchsorted(np.asarray(self.tier_volume, dtype=np.float64), volume, side='right') - 1
+        return np.asarray(self.tier_rate, dtype=np.float64)[idx]
+
+    def monthly_volume(self, size, dt=None):
+        """按成交顺序计算每笔成交前当月已成交的手数"""
+        lots = np.abs(np.asarray(size, dtype=np.float64))
+        before = np.cumsum(lots) - lots
+        if dt is None or not len(lots):
+            return before
+        month = np.array([_month(d) for d in _dtnum(dt)])
+        first = np.flatnonzero(np.r_[True, month[1:] != month[:-1]])
+        return before - np.repeat(before[first], np.diff(np.r_[first, len(lots)]))
+
+    def commission_costs(self, size, price, dt=None, volume=None):
+        """一组成交的手续费（与 GenericCommInfo._getcommission 逐笔结果一致）
+
+        Args:
+            size, price: 成交数量与价格数组
+            dt (optional): 成交时间，有 schedule / tiers 时需要
+            volume (optional): 每笔成交前当月已成交手数，缺省按 size 的顺序累计
+        """
+        size = np.abs(np.asarray(size, dtype=np.float64))
+        price = np.asarray(price, dtype=np.float64)
+        if self.starts and dt is not None:
+            commission, fixed_tax, _ = self.rates(dt)
+        else:
+            commission, fixed_tax, _ = self.segments[0]
+        comm = size * fixed_tax + size * price * commission
+        if self.tier_volume:
+            comm = comm * self.tier_rates(self.monthly_volume(size, dt) if volume is None else volume)
+        return comm
+
+    def margin_costs(self, size, price, dt=None):
+        """一组持仓/成交占用的保证金（abs(size) * GenericCommInfo.get_margin(price)）"""
+        margin = self.rates(dt)[2] if self.starts and dt is not None else self.segments[0][2]
+        return np.abs(size) * (np.asarray(price, dtype=np.float64) * self.mult * margin)
+
+    def fill_costs(self, fills):
+        """Recorder 的成交记录（FILL_DTYPE）-> 每笔成交的手续费与保证金"""
+        dt = fills['dt'] if not self.static else None
+        return {
+            'comm': self.commission_costs(fills['size'], fills['price'], dt),
+            'margin': self.margin_costs(fills['size'], fills['price'], dt),
+        }
+
+
+class CommissionRegistry:
+    """commission.json 中全部品种的 CommissionSpec"""
+
+    def __init__(self, path=COMMISSION_PATH):
+        self.path = path
+        with open(path, 'r') as f:
+            config = json.load(f)
+        self.specs = {name: CommissionSpec.from_config(name, c) for name, c in config.items()}
+
+    def __getitem__(self, name):
+        return self.specs[name]
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def names(self):
+        return list(self.specs)
+
+
+_REGISTRIES = {}
+
+
+def registry(path=COMMISSION_PATH):
+    """按文件路径缓存的 CommissionRegistry，文件修改时间变化时重新读取"""
+    key = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _REGISTRIES.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = _REGISTRIES[key] = (mtime, CommissionRegistry(path))
+    return cached[1]
 
 
 class GenericCommInfo(bt.CommInfoBase):
@@ -8,15 +223,123 @@ class GenericCommInfo(bt.CommInfoBase):
         ('margin', 0.1),
         ('commtype', bt.CommInfoBase.COMM_FIXED),
         ('stocklike', False),
-        ('fixed_tax', 2)
+        ('fixed_tax', 2),
+        ('schedule', ()),
+        ('tiers', ()),
     )
 
+    def __init__(self):
+        super().__init__()
+        self.spec = CommissionSpec(self.p.commission, self.p.fixed_tax, self.p.mult, self.p.margin,
+                                   self.p.commtype, self.p.stocklike, schedule=self.p.schedule,
+                                   tiers=self.p.tiers)
+        self._static = self.spec.static
+        self._clock = None
+        self.dt = None  # 未绑定数据源时由调用方设置的当前时间（backtrader datetime 数值）
+        self._month = None
+        self._volume = 0.0
+
+    def bind(self, data):
+        """费率随时间变化时，以该数据源的当前K线时间计费"""
+        self._clock = data
+        return self
+
+    def _now(self):
+        return self._clock.datetime[0] if self._clock is not None else self.dt
+
     def get_margin(self, price):
-        #print(price * self.p.mult * self.p.margin)
-        return price * self.p.mult * self.p.margin
-        
+        if self._static:
+            return price * self.p.mult * self.p.margin
+        return price * self.p.mult * self.spec.rate_at(self._now())[2]
+
     def _getcommission(self, size, price, pseudoexec):
-        fixed = abs(size) * self.p.fixed_tax
-        exchange = abs(size) * price * self.p.commission
-        # print(f"fix={fixed},交易所{exchange}")
-        return fixed + exchange
\ No newline at end of file
+        if self._static:
+            fixed = abs(size) * self.p.fixed_tax
+            exchange = abs(size) * price * self.p.commission
+            return fixed + exchange
+
+        now = self._now()
+        commission, fixed_tax, _ = self.spec.rate_at(now)
+        comm = abs(size) * fixed_tax + abs(size) * price * commission
+        if self.spec.tier_volume:
+            month = _month(now) if now is not None else None
+            if month != self._month:
+                self._month, self._volume = month, 0.0
+            rate = self.spec.tier_rate[bisect.bisect_right(self.spec.tier_volume, self._volume) - 1]
+            if not pseudoexec:  # confirmexec：成交确认后计入当月成交量
+                self._volume += abs(size)
+            comm *= rate
+        return comm
+
+
+def product_name(symbol):
+    """合约代码 -> commission.json 中的品种名，如 RB2505 -> RB"""
+    return re.match(r'[A-Za-z]+', symbol).group(0).upper()
+
+
+def load_commission(name, path=COMMISSION_PATH):
+    """commission.json 中某个品种的配置
+
+    Returns:
+        (dict, dict): GenericCommInfo 的参数；传给策略的合约参数 mult/margin/unit
+    """
+    spec = registry(path)[name]
+    return spec.comm_kwargs(), spec.contract_specs()
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import time
+
+    from engine.scheduler import run_single
+    from engine.vectorized import VectorizedDualMA
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.recorder import Recorder
+    from utils.sample import SAMPLE
+    from utils.store import COLUMNS, BarStore, feed_datetimes
+
+    print("***佣金与保证金***")
+    # 1. RB 与之前逐笔计算的结果一致（参数格式不变，结果库指纹不受影响）
+    comm, specs = load_commission('RB')
+    assert comm == {'commission': 0.0001, 'fixed_tax': 1.5, 'mult': 10, 'stocklike': False, 'margin': 0.07,
+                    'commtype': bt.CommInfoBase.COMM_FIXED}
+    assert specs == {'mult': 10, 'margin': 0.07, 'unit': 1}
+    assert registry() is registry()
+    ci = GenericCommInfo(**comm)
+    rng = np.random.default_rng(0)
+    n = 200_000
+    size = rng.integers(-5, 6, n).astype(np.float64)
+    price = np.round(rng.uniform(3000, 4000, n), 1)
+    t0 = time.perf_counter()
+    scalar = np.array([ci.getcommission(s, p) for s, p in zip(size, price)])
+    scalar_s = time.perf_counter() - t0
+    margin = np.array([ci.getoperationcost(s, p) for s, p in zip(size, price)])
+    t0 = time.perf_counter()
+    batch = ci.spec.commission_costs(size, price)
+    batch_s = time.perf_counter() - t0
+    assert np.array_equal(scalar, batch)
+    assert np.array_equal(margin, ci.spec.margin_costs(size, price))
+    print(f"RB {n:,} 笔成交: 逐笔 {scalar_s:.3f}s  批量 {batch_s * 1000:.1f}ms  结果完全一致")
+
+    # 2. 回测中的成交佣金 = fill_costs 批量结果，向量化引擎与回测一致（静态费率与分时段+分档费率）
+    bars = BarStore().load(*SAMPLE[1:])
+    matrix = np.vstack([feed_datetimes(bars['datetime'], bt.TimeFrame.Days)] +
+                       [np.asarray(bars[c], dtype=np.float64) for c in COLUMNS])
+    dynamic = {**comm,
+               'schedule': [{'start': '2024-10-01', 'commission': 0.00015, 'margin': 0.09},
+                            {'start': '2025-02-01', 'fixed_tax': 3.0}],
+               'tiers': [{'volume': 2, 'rate': 0.5}]}
+    for label, kwargs in (('RB', comm), ('分时段+分档', dynamic)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_single(matrix, bt.TimeFrame.Days, 1, kwargs, DualMovingAverageStrategy, specs, 10000,
+                                analyzers=[(Recorder, 'recorder', {'fields': ('value',)})])
+        fills = result.analyzers.recorder.result().fills
+        ci = GenericCommInfo(**kwargs)
+        costs = ci.spec.fill_costs(fills)
+        assert np.allclose(costs['comm'], fills['comm'], rtol=1e-12, atol=0), (costs['comm'], fills['comm'])
+        engine = VectorizedDualMA(bars, ci, specs)
+        engine.run(combos=[{}])
+        assert abs(engine.final_value[0] - result.broker.getvalue()) < 1e-8
+        print(f"{label}: {len(fills)} 笔成交佣金与回测一致，合计 {fills['comm'].sum():.4f}，"
+              f"期末资金 {result.broker.getvalue():.4f}（向量化引擎一致）")
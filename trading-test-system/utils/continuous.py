@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+主力连续合约
+
+把同一品种多个到期月份的合约（各自在列式存储中）按换月规则拼接成一条连续序列：
+
+1. 换月规则 roll：每个交易日持仓量（'oi'）或成交量（'volume'）最大的合约为当日主力，
+   主力只向更远月份切换、不回滚；主力变化后的下一个交易日起使用新合约（避免未来函数）
+2. 价格调整 adjust：
+   'none'  不调整
+   'back'  差值后复权：换月前的价格整体加上 新合约-旧合约 的价差，最新一段保持原价
+   'ratio' 比例后复权：换月前的价格整体乘以 新合约/旧合约 的比值
+   价差/比值取换月前一交易日两合约的收盘价
+
+结果作为一个普通品种写回列式存储，例如 RB_oi_back，BackTester 可以直接使用：
+
+    BackTester("RB", "RB_oi_back", "daily", beginning, end)
+
+额外保存两列：contract（当根K线所用合约在 meta.contracts 中的下标）和
+adjust（'back' 为加到原价上的差值，'ratio' 为乘到原价上的比例）；换月明细记在 meta.rolls。
+各合约只在末尾追加了新K线时做增量更新，只对新增日期判断主力并重新计算复权。
+"""
+import numpy as np
+import pandas as pd
+
+from utils.commission import product_name
+from utils.store import BarStore, COLUMNS
+
+ROLL_FIELDS = {'oi': 'openinterest', 'volume': 'volume'}
+ADJUSTMENTS = ('none', 'back', 'ratio')
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'settle']
+
+
+def _matrix(frames, contracts, ts):
+    """各合约在时间轴 ts 上的列：K × T，无K线处为NaN"""
+    out = {col: np.full((len(contracts), len(ts)), np.nan) for col in COLUMNS}
+    for k, contract in enumerate(contracts):
+        bars = frames[contract]
+        own = np.asarray(bars['datetime'])
+        lo = np.searchsorted(own, ts[0], side='left')
+        pos = np.searchsorted(ts, own[lo:])
+        for col in COLUMNS:
+            out[col][k, pos] = bars[col][lo:]
+    return out
+
+
+def _stitch(matrix, weight_col, first_active=None, prev_leader=0):
+    """逐日确定所用合约并拼接
+
+    Args:
+        first_active (int, optional): 第一根K线所用合约（增量更新时为缓存的最后一根）
+        prev_leader (int): 此前的主力合约下标，主力不会回到更早的合约
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): 保留的时间轴下标、每根所用合约、逐日主力
+    """
+    has = ~np.isnan(matrix['close'])
+    weight = np.where(has, np.nan_to_num(matrix[weight_col], nan=0.0), -np.inf)
+    leader = np.maximum.accumulate(np.maximum(np.argmax(weight, axis=0), prev_leader))
+
+    # 主力变化后的下一根K线起换用新合约
+    active = np.empty_like(leader)
+    active[0] = leader[0] if first_active is None else first_active
+    active[1:] = leader[:-1]
+    t = np.arange(len(leader))
+    missing = ~has[active, t]
+    active[missing] = leader[missing]
+    active = np.maximum.accumulate(active)
+
+    keep = np.flatnonzero(has[active, t])
+    return keep, active[keep], leader
+
+
+def _rolls(matrix, keep, active, offset=0, ts=None):
+    """换月明细：下标、日期、新旧合约及价差/比值"""
+    close = matrix['close']
+    rolls = []
+    for i in np.flatnonzero(active[1:] != active[:-1]) + 1:
+        old, new = int(active[i - 1]), int(active[i])
+        prev = keep[i - 1]
+        c_old, c_new = close[old, prev], close[new, prev]
+        if np.isnan(c_new):  # 新合约前一日无K线时改用当日
+            c_old, c_new = close[old, keep[i]], close[new, keep[i]]
+        if np.isnan(c_old) or np.isnan(c_new):
+            c_old = c_new = 1.0
+        rolls.append({
+            'index': int(offset + i),
+            'date': str(pd.Timestamp(int(ts[keep[i]])).date()),
+            'from': old,
+            'to': new,
+            'gap': float(c_new - c_old),
+            'ratio': float(c_new / c_old),
+        })
+    return rolls
+
+
+def adjustment(n, rolls, adjust):
+    """每根K线的复权量：'back' 为差值，'ratio' 为比例，'none' 为0"""
+    if adjust == 'ratio':
+        adj = np.ones(n)
+        for r in rolls:
+            adj[:r['index']] *= r['ratio']
+    else:
+        adj = np.zeros(n)
+        if adjust == 'back':
+            for r in rolls:
+                adj[:r['index']] += r['gap']
+    return adj
+
+
+class ContinuousContract:
+    """主力连续合约构建与缓存
+
+    Args:
+        contracts (list[str]): 各到期月份合约，如 ['RB2501', 'RB2505', 'RB2510']
+        period (str, optional): 周期. Defaults to 'daily'.
+        roll (str, optional): 'oi' 按持仓量，'volume' 按成交量. Defaults to 'oi'.
+        adjust (str, optional): 'none' / 'back' / 'ratio'. Defaults to 'back'.
+        store (BarStore, optional): 列式存储，合约与连续序列都在其中
+    """
+
+    def __init__(self, contracts, period='daily', roll='oi', adjust='back', store=None):
+        if roll not in ROLL_FIELDS:
+            raise ValueError(f"不支持的换月规则: {roll}")
+        if adjust not in ADJUSTMENTS:
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        self.contracts = sorted(contracts)
+        self.period = period
+        self.roll = roll
+        self.adjust = adjust
+        self.store = store or BarStore()
+
+    @property
+    def symbol(self):
+        """连续序列在列式存储中的名称，按换月规则区分缓存"""
+        return f"{product_name(self.contracts[0])}_{self.roll}_{self.adjust}"
+
+    def _frames(self):
+        return {c: self.store.load(c, self.period) for c in self.contracts}
+
+    @staticmethod
+    def _inputs(frames, last):
+        """各合约的行数、最后时间以及不晚于 last 的行数，用于判断缓存是否可增量更新"""
+        out = {}
+        for contract, bars in frames.items():
+            ts = np.asarray(bars['datetime'])
+            out[contract] = {
+                'rows': int(len(ts)),
+                'last': int(ts[-1]) if len(ts) else None,
+                'upto': int(np.searchsorted(ts, last, side='right')),
+            }
+        return out
+
+    def build(self, force=False):
+        """构建或更新连续序列
+
+        Returns:
+            str: 'cached'（已是最新）、'incremental'（增量更新）或 'full'（全量重建）
+        """
+        frames = self._frames()
+        if not force and self.store.exists(self.symbol, self.period):
+            meta = self.store.meta(self.symbol, self.period)
+            if meta.get('contracts') == self.contracts and meta.get('roll') == self.roll \
+                    and meta.get('adjust') == self.adjust:
+                inputs = self._inputs(frames, meta['last'])
+                if inputs == meta['inputs']:
+                    return 'cached'
+                if all(inputs[c]['upto'] == meta['inputs'][c]['upto']
+                       and inputs[c]['rows'] >= meta['inputs'][c]['rows'] for c in self.contracts):
+                    self._extend(frames, meta)
+                    return 'incremental'
+        self._full(frames)
+        return 'full'
+
+    def _full(self, frames):
+        ts = np.unique(np.concatenate([np.asarray(b['datetime']) for b in frames.values()]))
+        matrix = _matrix(frames, self.contracts, ts)
+        keep, active, leader = _stitch(matrix, ROLL_FIELDS[self.roll])
+        raw = {col: matrix[col][active, keep] for col in COLUMNS}
+        rolls = _rolls(matrix, keep, active, ts=ts)
+        self._write(frames, ts[keep], raw, active, rolls, int(leader[-1]))
+
+    def _extend(self, frames, meta):
+        cached = self.store.load(self.symbol, self.period, columns=['datetime'] + COLUMNS + ['contract', 'adjust'])
+        last = meta['last']
+
+        # 从缓存的最后一根K线开始的尾部时间轴，第一根只作为换月判断的上下文
+        ts = np.unique(np.concatenate([np.asarray(b['datetime']) for b in frames.values()]))
+        ts = ts[ts >= last]
+        matrix = _matrix(frames, self.contracts, ts)
+        keep, active, leader = _stitch(matrix, ROLL_FIELDS[self.roll],
+                                       first_active=int(cached['contract'][-1]),
+                                       prev_leader=meta['leader'])
+        n_cached = len(cached['close'])
+        rolls = meta['rolls'] + _rolls(matrix, keep, active, offset=n_cached - 1, ts=ts)
+
+        # 缓存部分去掉旧的复权量得到原价，与新增部分拼接后整体重新复权
+        adj = np.asarray(cached['adjust'])
+        raw = {}
+        for col in COLUMNS:
+            old = np.array(cached[col])
+            if col in PRICE_COLUMNS:
+                old = old / adj if self.adjust == 'ratio' else old - adj
+            raw[col] = np.concatenate([old, matrix[col][active[1:], keep[1:]]])
+        dts = np.concatenate([np.asarray(cached['datetime']), ts[keep[1:]]])
+        contract = np.concatenate([np.asarray(cached['contract'], dtype=np.int64), active[1:]])
+        self._write(frames, dts, raw, contract, rolls, int(leader[-1]))
+
+    def _write(self, frames, dts, raw, contract, rolls, leader):
+        adj = adjustment(len(dts), rolls, self.adjust)
+        df = pd.DataFrame({'datetime': dts.astype('datetime64[ns]')})
+        for col in COLUMNS:
+            values = raw[col]
+            if col in PRICE_COLUMNS:
+                values = values * adj if self.adjust == 'ratio' else values + adj
+            df[col] = values
+        df['contract'] = contract
+        df['adjust'] = adj
+        last = int(dts[-1])
+        meta = {
+            'contracts': self.contracts,
+            'roll': self.roll,
+            'adjust': self.adjust,
+            'rolls': rolls,
+            'leader': leader,
+            'last': last,
+            'inputs': self._inputs(frames, last),
+        }
+        self.store.write(self.symbol, self.period, df, extra_columns=['contract', 'adjust'], meta=meta)
+
+    def load(self, beginning=None, end=None):
+        """构建（必要时）并读取连续序列"""
+        self.build()
+        return self.store.load(self.symbol, self.period, beginning, end,
+                               columns=['datetime'] + COLUMNS + ['contract', 'adjust'])
+
+    def rolls(self):
+        """换月明细表"""
+        meta = self.store.meta(self.symbol, self.period)
+        df = pd.DataFrame(meta['rolls'])
+        if len(df):
+            df['from'] = [meta['contracts'][i] for i in df['from']]
+            df['to'] = [meta['contracts'][i] for i in df['to']]
+        return df
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+
+    from utils.store import ensure_store
+
+    if len(sys.argv) > 1:
+        # 用法: python -m utils.continuous RB2501 RB2505 RB2510 [--roll oi|volume] [--adjust none|back|ratio]
+        args = sys.argv[1:]
+        opts = {k: args[args.index(f'--{k}') + 1] for k in ('roll', 'adjust') if f'--{k}' in args}
+        contracts = [a for a in args if not a.startswith('--') and a not in opts.values()]
+        for c in contracts:
+            ensure_store(os.path.join('data', f"{c}_daily.csv"), c, 'daily')
+        cc = ContinuousContract(contracts, **opts)
+        print(f"{cc.symbol}: {cc.build()}")
+        print(cc.rolls().to_string(index=False))
+        sys.exit()
+
+    print("***连续合约构建test（合成数据）***")
+    from benchmark.synthetic import generate_bars
+
+    base = generate_bars(900, freq='B', start='2022-01-03', seed=1)
+    days = np.arange(len(base))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, 'store'))
+        contracts = []
+        for k in range(6):
+            # 每个合约上市约300个交易日，持仓量先升后降，与基础价格有固定升贴水
+            lo, hi = 120 * k, min(120 * k + 300, len(base))
+            df = base.iloc[lo:hi].copy()
+            basis = 30.0 * (k - 2)
+            for col in PRICE_COLUMNS:
+                df[col] = df[col] + basis
+            life = (days[lo:hi] - lo) / 300.0
+            df['openinterest'] = np.round(1e5 * np.sin(np.pi * life) + 10)
+            df['volume'] = np.round(df['openinterest'] / 10)
+            name = f"RB{22 + k // 2}{'05' if k % 2 == 0 else '10'}"
+            contracts.append(name)
+            store.write(name, 'daily', df)
+
+        for roll in ROLL_FIELDS:
+            for adjust in ADJUSTMENTS:
+                cc = ContinuousContract(contracts, roll=roll, adjust=adjust, store=store)
+                assert cc.build() == 'full' and cc.build() == 'cached'
+                bars = cc.load()
+                rolls = cc.rolls()
+                assert np.all(np.diff(np.asarray(bars['contract'])) >= 0)
+                # 复权后换月前一日的收盘价应等于新合约当日收盘价（再叠加之后各次换月的复权）
+                for r in cc.store.meta(cc.symbol, 'daily')['rolls']:
+                    i = r['index']
+                    new = store.load(contracts[r['to']], 'daily')
+                    j = np.searchsorted(new['datetime'], bars['datetime'][i - 1])
+                    target = new['close'][j] * bars['adjust'][i] if adjust == 'ratio' else \
+                        new['close'][j] + bars['adjust'][i]
+                    if adjust != 'none':
+                        assert np.isclose(bars['close'][i - 1], target, rtol=1e-12)
+                print(f"{cc.symbol}: {len(bars['close'])} 根, 换月 {len(rolls)} 次")
+
+        # 给当前主力合约追加一根K线：增量更新结果应与全量重建一致
+        last_contract = contracts[-1]
+        df = pd.DataFrame({k: np.asarray(v) for k, v in store.load(last_contract, 'daily').items()})
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        extra = df.iloc[[-1]].copy()
+        extra['datetime'] = extra['datetime'] + pd.Timedelta(days=3)
+        store.write(last_contract, 'daily', pd.concat([df, extra]))
+        for adjust in ADJUSTMENTS:
+            cc = ContinuousContract(contracts, adjust=adjust, store=store)
+            status = cc.build()
+            inc = {k: np.array(v) for k, v in cc.load().items()}
+            cc.build(force=True)
+            full = {k: np.array(v) for k, v in cc.load().items()}
+            same = all(np.allclose(inc[k], full[k], rtol=1e-12, atol=0) for k in full)
+            print(f"追加一根K线后 {cc.symbol}: {status}, 与全量重建一致: {same}")
+            assert status == 'incremental' and same
@@ -1,9 +1,28 @@
 # -*- coding: utf-8 -*-
 import os
-import akshare as ak
 import pandas as pd
 from abc import ABC, abstractmethod
 
+from utils.logger import get_logger
+
+LOG = get_logger('data')
+
+USED_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest', 'settle']
+DT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def akshare_daily(symbol):
+    """akshare日线接口（新浪），一次返回合约全部历史；akshare 仅在实际调用时导入"""
+    import akshare as ak
+    return ak.futures_zh_daily_sina(symbol=symbol)
+
+
+def normalize_daily(raw):
+    """把 futures_zh_daily_sina 格式（date/.../hold/settle）转换为回测使用的列格式"""
+    df = raw.rename(columns={'date': 'datetime', 'hold': 'openinterest'})
+    df['datetime'] = pd.to_datetime(df['datetime']).dt.strftime(DT_FORMAT)
+    return df[[c for c in USED_COLUMNS if c in df]].reset_index(drop=True)
+
 
 class DataCollector(ABC):
     """数据获取基类（抽象接口）"""
@@ -31,7 +50,7 @@ class DataCollector(ABC):
         if period == "daily":
             self.daily_data.to_csv(file_path, index=False)
             
-        print(f"{symbol}的{period}数据已保存至: {file_path}")
+        print(f"{self.symbol}的{period}数据已保存至: {file_path}")
 
 
 class AkshareCollector(DataCollector):
@@ -39,7 +58,14 @@ class AkshareCollector(DataCollector):
 
     Used API:
     - futures_zh_daily_sina(symbol="RB2505"): return all daily data of the contract at once
-    """  
+
+    Args:
+        source (callable, optional): replaces the akshare call, e.g. an offline stub. Defaults to akshare_daily.
+    """
+
+    def __init__(self, symbol, source=None):
+        super().__init__(symbol)
+        self.source = source or akshare_daily
     
     def get_daily_data(self,)-> pd.DataFrame:
         """Collect daily data from API(futures_zh_daily_sina)
@@ -51,22 +77,12 @@ class AkshareCollector(DataCollector):
             _type_: _description_
         """
         
-        print(f"[INFO] 加载{symbol}的所有日线数据...")
-
-        self.daily_data = ak.futures_zh_daily_sina(
-            symbol=self.symbol
-        )
+        LOG.info(f"加载{self.symbol}的所有日线数据...")
 
-        used_columns = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest']
-        bt_format = {'date': "datetime",
-                     'hold': 'openinterest'}
-        self.daily_data['date'] = pd.to_datetime(self.daily_data['date'])
-        self.daily_data['date'] = self.daily_data['date'].dt.strftime("%Y-%m-%d %H:%M:%S")
-        self.daily_data.set_index('date', inplace=True, drop=False)
-        self.daily_data.rename(columns=bt_format, inplace=True)
-        print(f"[INFO] {symbol}数据已取回...")
+        self.daily_data = normalize_daily(self.source(self.symbol))
+        LOG.info(f"{self.symbol}数据已取回...")
         
-        return self.daily_data[used_columns]
+        return self.daily_data
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""
+成交模型：滑点、按K线成交量限制的部分成交
+
+BackBroker 默认以下一根K线开盘价全额成交；跳空越过止损价的止损单按开盘价成交（而不是止损价），
+这一点 FillBroker 保持不变。FillModel 在此基础上增加：
+
+    slippage='fixed'   每手成交价偏移 slip 个价格单位
+    slippage='pct'     成交价偏移 price * slip
+    slippage='volume'  冲击成本：成交价偏移 price * slip * 成交手数 / K线成交量
+    participation      每根K线最多成交该K线成交量的这一比例（向下取整），剩余部分留到后续K线继续成交
+
+买入向上、卖出向下偏移，且不超出当根K线的最高/最低价；限价单（Limit / StopLimit）还不超出其限价。模型只在订单撮合时调用，不增加逐K线开销。
+prices / sizes 为批量版本，供向量化引擎对成交数组使用。
+"""
+import math
+
+import backtrader as bt
+import numpy as np
+
+SLIPPAGE = ('fixed', 'pct', 'volume')
+
+
+class FillModel:
+    """成交模型配置
+
+    Args:
+        slippage (str, optional): 'fixed' / 'pct' / 'volume'，None 为不加滑点
+        slip (float): 滑点参数：价格单位 / 比例 / 冲击系数
+        participation (float, optional): 单根K线成交量上限比例（0~1），None 为不限制
+        slip_stops (bool): 止损单成交是否也加滑点
+    """
+
+    def __init__(self, slippage=None, slip=0.0, participation=None, slip_stops=True):
+        if slippage is not None and slippage not in SLIPPAGE:
+            raise ValueError(f"未知的滑点类型: {slippage}（可选 {', '.join(SLIPPAGE)}）")
+        if participation is not None and not 0 < participation <= 1:
+            raise ValueError(f"participation 应在 (0, 1] 之间: {participation}")
+        self.slippage = slippage if slip else None
+        self.slip = slip
+        self.participation = participation
+        self.slip_stops = slip_stops
+
+    def __repr__(self):
+        return (f"FillModel(slippage={self.slippage!r}, slip={self.slip!r}, "
+                f"participation={self.participation!r}, slip_stops={self.slip_stops!r})")
+
+    def _offset(self, price, size, volume):
+        if self.slippage == 'fixed':
+            return self.slip
+        if self.slippage == 'pct':
+            return price * self.slip
+        return price * self.slip * abs(size) / volume if volume > 0 else price * self.slip
+
+    def price(self, price, size, volume, low, high):
+        """成交价：size>0 为买入，size<0 为卖出"""
+        if self.slippage is None:
+            return price
+        offset = self._offset(price, size, volume)
+        return min(price + offset, high) if size > 0 else max(price - offset, low)
+
+    def size(self, remsize, volume):
+        """本根K线可成交的手数（绝对值）"""
+        if self.participation is None:
+            return abs(remsize)
+        return min(abs(remsize), math.floor(volume * self.participation))
+
+    def __call__(self, order, price, ago):
+        """backtrader filler 接口"""
+        return self.size(order.executed.remsize, order.data.volume[ago])
+
+    def prices(self, price, size, volume, low, high):
+        """批量版 price"""
+        price = np.asarray(price, dtype=np.float64)
+        if self.slippage is None:
+            return price
+        size = np.asarray(size, dtype=np.float64)
+        volume = np.asarray(volume, dtype=np.float64)
+        if self.slippage == 'fixed':
+            offset = np.full_like(price, self.slip)
+        elif self.slippage == 'pct':
+            offset = price * self.slip
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                offset = np.where(volume > 0, price * self.slip * np.abs(size) / volume, price * self.slip)
+        return np.where(size > 0, np.minimum(price + offset, high), np.maximum(price - offset, low))
+
+    def sizes(self, remsize, volume):
+        """批量版 size"""
+        remsize = np.abs(np.asarray(remsize, dtype=np.float64))
+        if self.participation is None:
+            return remsize
+        return np.minimum(remsize, np.floor(np.asarray(volume, dtype=np.float64) * self.participation))
+
+
+class FillBroker(bt.brokers.BackBroker):
+    """按 FillModel 调整成交价与成交数量的 BackBroker"""
+
+    params = (('fillmodel', None),)
+
+    def __init__(self):
+        super().__init__()
+        model = self.p.fillmodel
+        if model is not None and model.participation is not None:
+            self.p.filler = model
+
+    def _execute(self, order, ago=None, price=None, cash=None, position=None, dtcoc=None):
+        model = self.p.fillmodel
+        # ago 为 None 时是提交时的伪成交（保证金检查），按原价计算
+        if (ago is not None and price is not None and model is not None and model.slippage is not None
+                and (model.slip_stops or order.exectype != bt.Order.Stop)):
+            data = order.data
+            volume = data.volume[ago]
+            size = model.size(order.executed.remsize, volume)
+            low, high = data.low[ago], data.high[ago]
+            if order.exectype in (bt.Order.Limit, bt.Order.StopLimit):
+                # 滑点不能让成交价劣于限价
+                limit = order.created.pricelimit if order.exectype == bt.Order.StopLimit else order.created.price
+                low, high = (low, min(high, limit)) if order.isbuy() else (max(low, limit), high)
+            price = model.price(price, size if order.isbuy() else -size, volume, low, high)
+        return super()._execute(order, ago=ago, price=price, cash=cash, position=position, dtcoc=dtcoc)
+
+
+if __name__ == "__main__":
+    from utils.sample import SAMPLE_VALUE, run_sample
+
+    print("***成交模型***")
+    # 批量版与逐笔版一致
+    rng = np.random.default_rng(0)
+    n = 10_000
+    model = FillModel('volume', 0.5, participation=0.01)
+    price, size = rng.uniform(3000, 4000, n), rng.integers(-20, 21, n).astype(float)
+    volume = rng.integers(0, 3000, n).astype(float)
+    low, high = price - rng.uniform(0, 50, n), price + rng.uniform(0, 50, n)
+    batch = model.prices(price, size, volume, low, high)
+    assert np.array_equal(batch, [model.price(*a) for a in zip(price, size, volume, low, high)])
+    assert np.array_equal(model.sizes(size, volume), [model.size(s, v) for s, v in zip(size, volume)])
+
+    for label, fill_model in (('默认 BackBroker', None), ('不加滑点的 FillModel', FillModel()),
+                              ('固定滑点 2', FillModel('fixed', 2)), ('比例滑点 0.05%', FillModel('pct', 0.0005)),
+                              ('冲击成本 + 成交量 0.002%', FillModel('volume', 0.5, participation=0.00002))):
+        tester = run_sample(fill_model=fill_model)
+        fills = tester.record.fills
+        print(f"{label:<24} 成交 {len(fills):>3} 笔  期末资金 {tester.cerebro.broker.getvalue():.4f}")
+        if fill_model is None or fill_model.slippage is None and fill_model.participation is None:
+            assert round(tester.cerebro.broker.getvalue(), 4) == SAMPLE_VALUE
+
+    # 成交量上限很低时开平仓单分多根K线成交，纯多头策略的持仓不应变为负数
+    for participation in (1e-7, 5e-7, 1e-6, 2e-6, 1e-5):
+        tester = run_sample(fill_model=FillModel(participation=participation))
+        assert tester.record.position.min() >= 0, (participation, tester.record.position.min())
+    print("低成交量上限下持仓均非负")
+
+    # 限价单加滑点后成交价仍不劣于限价
+    class _LimitOrders(bt.Strategy):
+        fills = []
+
+        def next(self):
+            if len(self) % 5 or self.broker.get_orders_open():
+                return
+            if self.position:
+                self.sell(exectype=bt.Order.Limit, price=self.data.close[0])
+            else:
+                self.buy(exectype=bt.Order.Limit, price=self.data.close[0])
+
+        def notify_order(self, order):
+            if order.status == order.Completed:
+                self.fills.append((order.isbuy(), order.executed.price, order.created.price))
+
+    run_sample(_LimitOrders, fill_model=FillModel('fixed', 20))
+    assert _LimitOrders.fills
+    assert all(price <= limit if buy else price >= limit for buy, price, limit in _LimitOrders.fills)
+    print(f"限价单 {len(_LimitOrders.fills)} 笔成交均不劣于限价")
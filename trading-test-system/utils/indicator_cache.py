@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+进程级指标缓存
+
+参数优化时每个参数组合都会重新实例化策略，SMA/RSI 等指标在相同数据、相同参数下
+被反复计算。这里按 (输入序列指纹, 指标类型, 参数) 缓存计算结果（numpy数组），
+总内存有上限，超出后按LRU淘汰。
+
+多进程优化（maxcpus>1）时每个工作进程各有一份缓存，计数器也按进程统计。
+"""
+import array
+import hashlib
+from collections import OrderedDict
+
+import backtrader as bt
+import numpy as np
+
+from utils.indicators import sma, rsi
+
+
+class IndicatorCache:
+    """带内存上限的LRU指标缓存
+
+    Args:
+        max_bytes (int, optional): 缓存数组总字节数上限. Defaults to 256MB.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._store = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        """命中则返回缓存数组，否则调用 compute() 计算并写入缓存"""
+        values = self._store.get(key)
+        if values is not None:
+            self._store.move_to_end(key)
+            self.hits += 1
+            return values
+
+        self.misses += 1
+        values = compute()
+        values.setflags(write=False)  # 多个指标共享同一数组，禁止原地修改
+        if values.nbytes <= self.max_bytes:
+            self._store[key] = values
+            self.nbytes += values.nbytes
+            self._evict()
+        return values
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._store:
+            _, values = self._store.popitem(last=False)
+            self.nbytes -= values.nbytes
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        """调整内存上限，必要时立即淘汰"""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """清空缓存并重置计数器"""
+        self._store.clear()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._store),
+            'nbytes': self.nbytes,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+# 进程级共享实例
+INDICATOR_CACHE = IndicatorCache()
+
+
+def series_fingerprint(line, size):
+    """对输入序列内容求摘要，作为缓存键中的"数据身份"；结果记在line对象上避免重复计算"""
+    memo = getattr(line, '_cache_fingerprint', None)
+    if memo is not None and memo[0] == size:
+        return memo[1]
+    values = np.frombuffer(line.array, dtype=np.float64, count=size)
+    digest = hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+    line._cache_fingerprint = (size, digest)
+    return digest
+
+
+class CachedIndicator(bt.Indicator):
+    """从 INDICATOR_CACHE 取整段指标值的单线指标基类
+
+    仅在数据已预加载（preload=True，BackTester的默认方式）时可用，
+    子类实现 minperiod() 和 compute(values)。
+    """
+    lines = ('value',)
+
+    def __init__(self):
+        self.addminperiod(self.minperiod())
+        self._values = None
+
+    def minperiod(self):
+        raise NotImplementedError
+
+    def compute(self, values):
+        raise NotImplementedError
+
+    def cached_values(self):
+        if self._values is None:
+            line = self.data.lines[0]
+            size = self.data.buflen()
+            params = tuple(self.params._getkwargs().items())
+            key = (series_fingerprint(line, size), type(self).__name__, params)
+            self._values = INDICATOR_CACHE.get(key, lambda: self.compute(
+                np.frombuffer(line.array, dtype=np.float64, count=size).copy()))
+        return self._values
+
+    def next(self):
+        self.lines.value[0] = self.cached_values()[len(self) - 1]
+
+    def once(self, start, end):
+        dst = self.lines.value.array
+        chunk = array.array('d')
+        chunk.frombytes(self.cached_values()[start:end].tobytes())
+        dst[start:end] = chunk
+
+
+class CachedSMA(CachedIndicator):
+    """与 bt.indicators.SMA 数值一致的缓存版本"""
+    alias = ('CachedSimpleMovingAverage',)
+    params = (('period', 30),)
+
+    def minperiod(self):
+        return self.p.period
+
+    def compute(self, values):
+        return sma(values, self.p.period)
+
+
+class CachedRSI(CachedIndicator):
+    """与 bt.indicators.RSI（默认参数）数值一致的缓存版本"""
+    params = (('period', 14),)
+
+    def minperiod(self):
+        return self.p.period + 1
+
+    def compute(self, values):
+        return rsi(values, self.p.period)
+
+
+def is_preloaded(data):
+    """数据是否已整段加载到内存（策略__init__时即可判断）"""
+    return data.buflen() > 0
+
+
+def cached_sma(data, period):
+    """数据已预加载时返回缓存版SMA，否则退回 bt.indicators.SMA"""
+    if is_preloaded(data):
+        return CachedSMA(data, period=period)
+    return bt.indicators.SMA(data, period=period)
+
+
+def cached_rsi(data, period):
+    """数据已预加载时返回缓存版RSI，否则退回 bt.indicators.RSI"""
+    if is_preloaded(data):
+        return CachedRSI(data, period=period)
+    return bt.indicators.RelativeStrengthIndex(data, period=period)
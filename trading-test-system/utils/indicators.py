@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+基于NumPy的指标计算，数值与backtrader对应指标在 runonce 模式下的结果一致
+
+被向量化引擎（engine.vectorized）和指标缓存（utils.indicator_cache）共用；
+Incremental* 为逐根更新的同口径版本，供实时/模拟盘运行时（engine.live）使用
+"""
+import math
+
+import numpy as np
+
+
+def sma(close, period):
+    """简单移动平均，前period-1个值为nan"""
+    out = np.full(len(close), np.nan)
+    if len(close) >= period:
+        csum = np.concatenate(([0.0], np.cumsum(close)))
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def smma(values, period, start):
+    """平滑移动平均（Wilder），与backtrader ExponentialSmoothing 的递推顺序一致
+
+    Args:
+        values: 输入序列
+        period: 周期
+        start: 输入序列第一个有效值的下标
+    """
+    out = np.full(len(values), np.nan)
+    seed = start + period - 1
+    if seed >= len(values):
+        return out
+    alpha = 1.0 / period
+    alpha1 = 1.0 - alpha
+    prev = out[seed] = values[start:seed + 1].sum() / period
+    for i in range(seed + 1, len(values)):
+        prev = out[i] = prev * alpha1 + values[i] * alpha
+    return out
+
+
+def rsi(close, period):
+    """RSI，对应 bt.indicators.RelativeStrengthIndex 的默认参数"""
+    diff = np.empty(len(close))
+    diff[0] = np.nan
+    diff[1:] = close[1:] - close[:-1]
+    up = smma(np.maximum(diff, 0.0), period, 1)
+    down = smma(np.maximum(-diff, 0.0), period, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 - 100.0 / (1.0 + up / down)
+
+
+def crossover(fast, slow, start):
+    """bt.ind.CrossOver：1 上穿，-1 下穿，0 无交叉
+
+    Args:
+        start: 两条均线都有值的第一个下标
+    """
+    n = len(fast)
+    out = np.full(n, np.nan)
+    if start + 1 >= n:
+        return out
+    diff = fast - slow
+    # NonZeroDifference：差值为0时沿用上一个非零差值
+    idx = np.arange(n)
+    keep = (diff != 0) | (idx == start)
+    keep[:start] = False
+    last = np.maximum.accumulate(np.where(keep, idx, 0))
+    nzd = diff[last]
+
+    prev = nzd[start:-1]
+    cur_fast, cur_slow = fast[start + 1:], slow[start + 1:]
+    up = (prev < 0) & (cur_fast > cur_slow)
+    down = (prev > 0) & (cur_fast < cur_slow)
+    out[start + 1:] = up.astype(float) - down.astype(float)
+    return out
+
+
+class IncrementalSMA:
+    """逐根更新的简单移动平均，每根K线 O(1)
+
+    维护窗口环形缓冲区与滚动和；每 period 次更新用 math.fsum 重算一次滚动和，
+    避免长时间运行的浮点累积误差。
+    """
+    __slots__ = ('period', 'window', 'pos', 'count', 'total')
+
+    def __init__(self, period):
+        self.period = period
+        self.window = [0.0] * period
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+
+    def update(self, value):
+        """加入一根K线，返回当前值（不足 period 根时为nan）"""
+        old = self.window[self.pos]
+        self.window[self.pos] = value
+        self.pos = (self.pos + 1) % self.period
+        self.count += 1
+        if self.pos == 0:
+            self.total = math.fsum(self.window)
+        else:
+            self.total += value - (old if self.count > self.period else 0.0)
+        return self.total / self.period if self.count >= self.period else math.nan
+
+    def state(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['period'])
+        for k in cls.__slots__:
+            setattr(obj, k, state[k])
+        return obj
+
+
+class IncrementalRSI:
+    """逐根更新的 RSI，递推方式与 rsi() / bt.indicators.RSI 一致，每根K线 O(1)"""
+    __slots__ = ('period', 'prev_close', 'count', 'seed_up', 'seed_down', 'up', 'down')
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.count = 0  # 已有的涨跌幅个数
+        self.seed_up = []
+        self.seed_down = []
+        self.up = math.nan
+        self.down = math.nan
+
+    def update(self, close):
+        prev, self.prev_close = self.prev_close, close
+        if prev is None:
+            return math.nan
+        diff = close - prev
+        upday, downday = max(diff, 0.0), max(-diff, 0.0)
+        self.count += 1
+        if self.count < self.period:
+            self.seed_up.append(upday)
+            self.seed_down.append(downday)
+            return math.nan
+        if self.count == self.period:
+            # 首个值为前 period 个涨跌幅的简单平均，之后按 Wilder 平滑递推
+            self.up = math.fsum(self.seed_up + [upday]) / self.period
+            self.down = math.fsum(self.seed_down + [downday]) / self.period
+            self.seed_up, self.seed_down = [], []
+        else:
+            alpha = 1.0 / self.period
+            self.up = self.up * (1.0 - alpha) + upday * alpha
+            self.down = self.down * (1.0 - alpha) + downday * alpha
+        if self.down == 0.0:
+            return math.nan if self.up == 0.0 else 100.0
+        return 100.0 - 100.0 / (1.0 + self.up / self.down)
+
+    def state(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls(state['period'])
+        for k in cls.__slots__:
+            setattr(obj, k, state[k])
+        return obj
+
+
+class IncrementalCrossOver:
+    """逐根更新的 bt.ind.CrossOver：1 上穿，-1 下穿，0 无交叉，两条均线就绪前及首根为nan"""
+    __slots__ = ('nzd',)
+
+    def __init__(self):
+        self.nzd = None  # NonZeroDifference 的上一个值
+
+    def update(self, fast, slow):
+        if math.isnan(fast) or math.isnan(slow):
+            return math.nan
+        diff = fast - slow
+        prev = self.nzd
+        self.nzd = diff if diff or prev is None else prev
+        if prev is None:
+            return math.nan
+        return float(prev < 0 and fast > slow) - float(prev > 0 and fast < slow)
+
+    def state(self):
+        return {'nzd': self.nzd}
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls()
+        obj.nzd = state['nzd']
+        return obj
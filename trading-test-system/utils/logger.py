@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+结构化、按级别过滤的日志
+
+所有模块通过 get_logger 取得 'trading' 下的子日志器，字段放在 extra 的 fields 中：
+
+    log = get_logger('strategy')
+    if log.isEnabledFor(logging.INFO):   # 热点路径先判断级别，关闭时不拼接字符串
+        log.info("买入", extra={'bar': dt, 'fields': {'price': 3500.0, 'size': 2}})
+
+控制台格式与原来的彩色 print 相同：[K线时间] [级别] 消息 key=value ...；
+configure(fmt='json') 时每条日志输出一行JSON，便于批量运行后检索。
+set_quiet() 把级别提到 WARNING，策略中的成交日志整段跳过（无格式化、无I/O）；
+quiet() 只在 with 块内静默，退出时恢复原来的级别。
+"""
+import contextlib
+import json
+import logging
+import sys
+
+LOGGER_NAME = 'trading'
+
+_COLORS = {
+    logging.DEBUG: '\033[90m',     # 灰色
+    logging.INFO: '\033[94m',      # 蓝色
+    logging.WARNING: '\033[91m',   # 红色
+    logging.ERROR: '\033[91m',
+}
+_RESET = '\033[0m'
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """每次写入时取当前的 sys.stdout，redirect_stdout 与工作进程的输出重定向仍然生效"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class ConsoleFormatter(logging.Formatter):
+    """[K线时间] [级别] 消息 key=value，可选ANSI颜色"""
+
+    def __init__(self, color=True):
+        super().__init__()
+        self.color = color
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None)
+        msg = record.getMessage()
+        if fields:
+            msg += ' ' + ' '.join(f"{k}={v}" for k, v in fields.items())
+        bar = getattr(record, 'bar', None)
+        text = f"[{bar}] [{record.levelname}] {msg}" if bar else f"[{record.levelname}] {msg}"
+        if self.color and record.levelno in _COLORS:
+            return f"{_COLORS[record.levelno]}{text}{_RESET}"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行JSON：time/level/logger/bar/msg + fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        bar = getattr(record, 'bar', None)
+        if bar:
+            entry['bar'] = bar
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure(level='INFO', fmt='console', color=True):
+    """设置 'trading' 日志器的级别与输出格式（重复调用会替换之前的配置）
+
+    Args:
+        level (str|int): DEBUG/INFO/WARNING/ERROR
+        fmt (str): 'console' 彩色文本，'json' 每行一条JSON
+        color (bool): 控制台格式是否带ANSI颜色
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = _StdoutHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else ConsoleFormatter(color))
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    return root
+
+
+def set_quiet(quiet=True):
+    """静默模式只输出 WARNING 及以上"""
+    logging.getLogger(LOGGER_NAME).setLevel(logging.WARNING if quiet else logging.INFO)
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """with 块内只输出 WARNING 及以上，退出时恢复原级别；enabled 为 False 时不改变级别"""
+    logger = logging.getLogger(LOGGER_NAME)
+    level = logger.level
+    if enabled:
+        logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def get_logger(name=None):
+    """取得 'trading' 或其子日志器，首次使用时按默认配置（INFO、彩色控制台）初始化"""
+    root = logging.getLogger(LOGGER_NAME)
+    if not root.handlers:
+        configure()
+    return root.getChild(name) if name else root
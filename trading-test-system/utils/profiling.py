@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+回测性能剖析
+
+BackTester(profile=...) 时启用；未启用时不挂分析器、不包装任何方法，回测路径与原来完全相同。
+
+1. 阶段计时：BackTester 的 加载数据（CSV转换 + 数据源）、回测（cerebro.run）、报告、绘图等，
+   以及 ProfileAnalyzer 测得的 指标计算（runonce 下的 _once）和 主循环（分析器 start 到 stop）
+2. 回调计数与累计耗时：策略的 next 及其重写过的 prenext/nextstart/notify_*，
+   broker.next（撮合、佣金与保证金），其他分析器的 _next
+3. 可选 cProfile（主循环内累计耗时最多的函数）与 tracemalloc（内存峰值、分配最多的代码行）
+
+单次回测的结果由 ProfileAnalyzer.get_analysis() 以普通 dict 返回，可随 optreturn 或进程池任务结果回传，
+Profiler.merge 汇总（多进程时耗时为各进程之和），to_json 导出：
+
+    tester = BackTester("RB", "RB2505", "daily", beginning, end, profile=Profiler(cprofile=True))
+    tester.add_strategy(DualMovingAverageStrategy)
+    tester.run()
+    print(tester.profiler.summary())
+    tester.profiler.to_json('profile.json')
+"""
+import contextlib
+import json
+import os
+import time
+
+import backtrader as bt
+
+# 只在策略类重写时才包装的回调（next 总是包装）
+CALLBACKS = ('prenext', 'nextstart', 'notify_order', 'notify_trade', 'notify_cashvalue', 'notify_fund')
+_MISSING = object()
+
+
+def _add(table, name, count, seconds):
+    row = table.setdefault(name, [0, 0.0])
+    row[0] += count
+    row[1] += seconds
+
+
+class Profiler:
+    """性能剖析配置与汇总结果
+
+    Args:
+        cprofile (bool): 每次回测的主循环用 cProfile 采样函数耗时
+        tracemalloc (bool): 每次回测的主循环用 tracemalloc 记录内存分配
+        top (int): cProfile / tracemalloc 每次回测保留的条目数
+    """
+
+    def __init__(self, cprofile=False, tracemalloc=False, top=20):
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.top = top
+        self.runs = 0
+        self.phases = {}      # 阶段 -> [次数, 累计秒]
+        self.calls = {}       # 回调 -> [次数, 累计秒]
+        self.functions = {}   # cProfile 函数 -> [调用次数, 自身耗时, 累计耗时]
+        self.memory = {}      # tracemalloc 代码行 -> 字节（各次回测取最大）
+        self.peak_bytes = 0
+
+    def options(self):
+        return {'cprofile': self.cprofile, 'tracemalloc': self.tracemalloc, 'top': self.top}
+
+    def analyzer(self):
+        """(分析器类, 名称, 参数)，格式同 run_single 的 analyzers"""
+        return ProfileAnalyzer, 'profiler', self.options()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """累计一个阶段的墙钟时间"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            _add(self.phases, name, 1, time.perf_counter() - t0)
+
+    def merge(self, report):
+        """并入 ProfileAnalyzer.get_analysis()、另一个 Profiler 或其 to_dict() 的结果"""
+        if isinstance(report, Profiler):
+            report = report.to_dict()
+        self.runs += report['runs']
+        for table, key in ((self.phases, 'phases'), (self.calls, 'calls')):
+            for name, row in report[key].items():
+                _add(table, name, row['count'], row['seconds'])
+        for name, row in report['functions'].items():
+            acc = self.functions.setdefault(name, [0, 0.0, 0.0])
+            acc[0] += row['ncalls']
+            acc[1] += row['tottime']
+            acc[2] += row['cumtime']
+        for site, size in report['memory'].items():
+            self.memory[site] = max(self.memory.get(site, 0), size)
+        self.peak_bytes = max(self.peak_bytes, report['peak_bytes'])
+        return self
+
+    def to_dict(self):
+        by_time = lambda table: sorted(table.items(), key=lambda kv: -kv[1][1])
+        return {
+            'runs': self.runs,
+            'phases': {k: {'count': c, 'seconds': s} for k, (c, s) in self.phases.items()},
+            'calls': {k: {'count': c, 'seconds': s} for k, (c, s) in by_time(self.calls)},
+            'functions': {k: {'ncalls': n, 'tottime': tt, 'cumtime': ct}
+                          for k, (n, tt, ct) in sorted(self.functions.items(), key=lambda kv: -kv[1][2])},
+            'memory': dict(sorted(self.memory.items(), key=lambda kv: -kv[1])),
+            'peak_bytes': self.peak_bytes,
+        }
+
+    def to_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def summary(self, limit=10):
+        """可打印的汇总表"""
+        lines = [f"\n========== 性能剖析（{self.runs} 次回测）=========="]
+        for title, table in (('阶段', self.phases), ('回调', self.calls)):
+            if not table:
+                continue
+            lines.append(f"{title:<24}{'次数':>10}{'累计(s)':>11}{'平均(us)':>11}")
+            rows = table.items() if table is self.phases else sorted(table.items(), key=lambda kv: -kv[1][1])
+            for name, (count, seconds) in rows:
+                lines.append(f"{name:<26}{count:>10}{seconds:>12.4f}{seconds / max(count, 1) * 1e6:>12.1f}")
+        if self.functions:
+            lines.append(f"{'函数（cProfile）':<40}{'调用次数':>10}{'自身(s)':>10}{'累计(s)':>10}")
+            for name, (n, tt, ct) in sorted(self.functions.items(), key=lambda kv: -kv[1][2])[:limit]:
+                lines.append(f"{name[-44:]:<44}{n:>12}{tt:>11.4f}{ct:>11.4f}")
+        if self.peak_bytes:
+            lines.append(f"内存峰值（tracemalloc）: {self.peak_bytes / 2**20:.2f} MB")
+            for site, size in sorted(self.memory.items(), key=lambda kv: -kv[1])[:limit]:
+                lines.append(f"  {site[-60:]:<62}{size / 1024:>10.1f} KB")
+        return "\n".join(lines)
+
+
+class ProfileAnalyzer(bt.Analyzer):
+    """记录一次回测的回调耗时，start 时以实例属性包装方法、stop 时还原
+
+    get_analysis() 返回与 Profiler.to_dict() 相同格式的 dict
+    """
+    params = (('cprofile', False), ('tracemalloc', False), ('top', 20))
+
+    def __init__(self):
+        self.profile = Profiler(self.p.cprofile, self.p.tracemalloc, self.p.top)
+        self.profile.runs = 1
+        self._wrapped = []
+        self._cprofile = None
+        self._owns_tracemalloc = False
+        self.rets = self.profile.to_dict()
+
+    def _wrap(self, obj, attr, name, table):
+        func = getattr(obj, attr)
+        row = table.setdefault(name, [0, 0.0])
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                row[0] += 1
+                row[1] += clock() - t0
+
+        self._wrapped.append((obj, attr, vars(obj).get(attr, _MISSING)))
+        setattr(obj, attr, timed)
+
+    def start(self):
+        strategy, profile = self.strategy, self.profile
+        # cerebro 通过属性查找调用这些方法，实例属性即可覆盖类方法
+        self._wrap(strategy, '_once', '指标计算', profile.phases)
+        self._wrap(strategy, 'next', 'strategy.next', profile.calls)
+        for name in CALLBACKS:
+            if getattr(type(strategy), name) is not getattr(bt.Strategy, name):
+                self._wrap(strategy, name, f'strategy.{name}', profile.calls)
+        self._wrap(strategy.broker, 'next', 'broker.next', profile.calls)
+        for name, analyzer in strategy.analyzers.getitems():
+            if analyzer is not self:
+                self._wrap(analyzer, '_next', f'analyzer.{name}', profile.calls)
+
+        if self.p.tracemalloc:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+            tracemalloc.reset_peak()
+        if self.p.cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._t0 = time.perf_counter()
+
+    def stop(self):
+        elapsed = time.perf_counter() - self._t0
+        profile = self.profile
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.p.tracemalloc:
+            import tracemalloc
+            # 在 cProfile 整理结果之前取快照，剖析器自身的分配不计入
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')])
+            profile.peak_bytes = tracemalloc.get_traced_memory()[1]
+            for stat in snapshot.statistics('lineno')[:self.p.top]:
+                frame = stat.traceback[0]
+                profile.memory[f"{os.path.basename(frame.filename)}:{frame.lineno}"] = stat.size
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+
+        if self._cprofile is not None:
+            import pstats
+            stats = pstats.Stats(self._cprofile).stats
+            top = sorted(stats.items(), key=lambda kv: -kv[1][3])[:self.p.top]
+            for (filename, line, func), (_, ncalls, tottime, cumtime, _) in top:
+                profile.functions[f"{os.path.basename(filename)}:{line}({func})"] = [ncalls, tottime, cumtime]
+            self._cprofile = None
+
+        # 还原被包装的方法，cerebro 可以再次运行或被 pickle 到工作进程
+        for obj, attr, previous in reversed(self._wrapped):
+            if previous is _MISSING:
+                delattr(obj, attr)
+            else:
+                setattr(obj, attr, previous)
+        self._wrapped = []
+        _add(profile.phases, '主循环', 1, elapsed)
+        self.rets = profile.to_dict()
+
+    def get_analysis(self):
+        return self.rets
+
+
+if __name__ == "__main__":
+    import io
+
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.sample import SAMPLE_VALUE, run_sample, sample_tester
+
+    print("***性能剖析***")
+    values = {}
+    for label, profile in (('未启用', None), ('计时', Profiler()), ('计时 + cProfile + tracemalloc',
+                                                                  Profiler(cprofile=True, tracemalloc=True, top=5))):
+        tester = run_sample(profile=profile)
+        values[label] = round(tester.cerebro.broker.getvalue(), 4)
+        assert not vars(tester.cerebro.broker).get('next'), "broker.next 未还原"
+        if profile is not None:
+            report = profile.to_dict()
+            assert report['runs'] == 1 and report['calls']['broker.next']['count'] == 221
+            print(profile.summary(limit=5))
+    assert set(values.values()) == {SAMPLE_VALUE}, values
+    print(f"\n三种方式期末资金一致: {values['未启用']}")
+
+    # 自适应搜索与滚动检验的每次 backtrader 回测同样计入（直接调用引擎，不写出CSV）
+    from engine.search import TPESearch, backtrader_evaluator
+    from engine.walkforward import WalkForward
+
+    profile = Profiler()
+    grid = {'fast_period': range(5, 8), 'slow_period': range(15, 18)}
+    tester = sample_tester(profile=profile)
+    with contextlib.redirect_stdout(io.StringIO()):
+        TPESearch(*backtrader_evaluator(tester, DualMovingAverageStrategy)).run(grid, budget=4)
+        assert profile.runs == 4, profile.runs
+        WalkForward(tester, DualMovingAverageStrategy, grid, in_sample=120, out_sample=25, workers=2).run()
+    assert profile.runs > 4 and profile.calls['strategy.next'][0] > 0
+    print(f"自适应搜索 + 滚动检验: {profile.runs} 次回测")
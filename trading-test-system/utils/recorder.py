@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+数组化的逐K线记录器
+
+替代策略中逐根K线 append 的 Python 列表（每个 float 对象约 32 字节）：
+1. 账户价值、现金、持仓按数据长度预分配 numpy 缓冲区，每根K线只做一次下标写入
+2. 成交写入结构化数组（按需倍增扩容），已平仓交易为 __slots__ 对象 TradeRecord
+3. result() 返回裁剪后的 RunRecord，dumps()/loads() 为紧凑的二进制序列化，
+   工作进程回传权益曲线时代替 pickle 整个分析器或列表
+
+    cerebro.addanalyzer(Recorder, _name='recorder')
+    record = strategy.analyzers.recorder.result()
+    record.equity, record.fills, record.trades
+
+与 prenext 一并记录（包含指标预热阶段），first_next 为策略第一次执行 next 的下标。
+"""
+import io
+
+import backtrader as bt
+import numpy as np
+
+# 可记录的逐K线字段及类型
+FIELDS = {'value': np.float64, 'cash': np.float64, 'position': np.float64}
+FILL_DTYPE = np.dtype([('dt', 'f8'), ('size', 'f8'), ('price', 'f8'), ('value', 'f8'), ('comm', 'f8')])
+TRADE_DTYPE = np.dtype([('dtopen', 'f8'), ('dtclose', 'f8'), ('size', 'f8'), ('price', 'f8'),
+                        ('pnl', 'f8'), ('pnlcomm', 'f8'), ('commission', 'f8'), ('barlen', 'i4')])
+
+
+class TradeRecord:
+    """一笔已平仓交易（时间为 backtrader 的 date2num 数值）"""
+    __slots__ = TRADE_DTYPE.names
+
+    def __init__(self, dtopen, dtclose, size, price, pnl, pnlcomm, commission, barlen):
+        self.dtopen = dtopen
+        self.dtclose = dtclose
+        self.size = size
+        self.price = price
+        self.pnl = pnl
+        self.pnlcomm = pnlcomm
+        self.commission = commission
+        self.barlen = barlen
+
+    def astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"TradeRecord(size={self.size}, price={self.price}, pnlcomm={self.pnlcomm:.2f}, barlen={self.barlen})"
+
+
+class _Growable:
+    """按容量倍增的结构化数组，append 摊还 O(1)"""
+    __slots__ = ('array', 'size')
+
+    def __init__(self, dtype, capacity=64):
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, row):
+        if self.size == len(self.array):
+            self.array = np.resize(self.array, 2 * len(self.array))
+        self.array[self.size] = row
+        self.size += 1
+
+    def view(self):
+        return self.array[:self.size]
+
+
+class RunRecord:
+    """单次回测的记录结果
+
+    Attributes:
+        datetime (np.ndarray): 每根K线的 date2num 时间
+        equity / cash / position (np.ndarray): 逐K线记录的字段，未记录的为 None
+        fills (np.ndarray): FILL_DTYPE 结构化数组
+        trades (np.ndarray): TRADE_DTYPE 结构化数组
+        first_next (int): 策略第一次执行 next 的下标（之前为指标预热）
+    """
+    __slots__ = ('datetime', 'equity', 'cash', 'position', 'fills', 'trades', 'first_next')
+
+    def __init__(self, datetime, equity=None, cash=None, position=None, fills=None, trades=None, first_next=0):
+        self.datetime = datetime
+        self.equity = equity
+        self.cash = cash
+        self.position = position
+        self.fills = np.empty(0, FILL_DTYPE) if fills is None else fills
+        self.trades = np.empty(0, TRADE_DTYPE) if trades is None else trades
+        self.first_next = first_next
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, k).nbytes for k in self.__slots__[:-1] if getattr(self, k) is not None)
+
+    def dumps(self):
+        """紧凑序列化：各数组原样写入一个未压缩的 npz"""
+        buf = io.BytesIO()
+        arrays = {k: getattr(self, k) for k in self.__slots__[:-1] if getattr(self, k) is not None}
+        np.savez(buf, first_next=np.int64(self.first_next), **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def loads(cls, data):
+        with np.load(io.BytesIO(data)) as npz:
+            kwargs = {k: npz[k] for k in npz.files}
+        kwargs['first_next'] = int(kwargs['first_next'])
+        return cls(**kwargs)
+
+
+class Recorder(bt.Analyzer):
+    """预分配数组记录账户价值/现金/持仓、成交与已平仓交易
+
+    参数:
+    fields: 逐K线记录的字段，FIELDS 的子集（默认账户价值和持仓）
+    """
+    params = (
+        ('fields', ('value', 'position')),
+    )
+
+    def start(self):
+        # 预加载时数据长度已知，一次分配；实时数据从小容量开始倍增
+        n = max(self.strategy.data.buflen(), 1)
+        self.buffers = {f: np.empty(n, dtype=FIELDS[f]) for f in self.p.fields}
+        self.dt = np.empty(n, dtype=np.float64)
+        self.i = 0
+        self.first_next = None
+        self.fills = _Growable(FILL_DTYPE)
+        self.trades = []
+        self._sizes = {}  # 交易ref -> 开仓手数
+
+    def _grow(self):
+        n = 2 * len(self.dt)
+        self.dt = np.resize(self.dt, n)
+        self.buffers = {f: np.resize(b, n) for f, b in self.buffers.items()}
+
+    def _record(self):
+        i = self.i
+        if i == len(self.dt):
+            self._grow()
+        broker = self.strategy.broker
+        self.dt[i] = self.strategy.datetime[0]
+        for field, buf in self.buffers.items():
+            if field == 'value':
+                buf[i] = broker.getvalue()
+            elif field == 'cash':
+                buf[i] = broker.getcash()
+            else:
+                buf[i] = self.strategy.position.size
+        self.i = i + 1
+
+    def prenext(self):
+        self._record()
+
+    def nextstart(self):
+        self.first_next = self.i
+        self._record()
+
+    def next(self):
+        self._record()
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            ex = order.executed
+            self.fills.append((order.data.datetime[0], ex.size, ex.price, ex.value, ex.comm))
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self._sizes[trade.ref] = trade.size
+        elif trade.isclosed:
+            self.trades.append(TradeRecord(trade.dtopen, trade.dtclose, self._sizes.pop(trade.ref, 0.0),
+                                           trade.price, trade.pnl, trade.pnlcomm, trade.commission,
+                                           trade.barlen))
+
+    def result(self):
+        """裁剪到实际长度的 RunRecord（数组为视图，不复制）"""
+        n = self.i
+        trades = np.array([t.astuple() for t in self.trades], dtype=TRADE_DTYPE)
+        return RunRecord(
+            datetime=self.dt[:n],
+            equity=self.buffers['value'][:n] if 'value' in self.buffers else None,
+            cash=self.buffers['cash'][:n] if 'cash' in self.buffers else None,
+            position=self.buffers['position'][:n] if 'position' in self.buffers else None,
+            fills=self.fills.view(),
+            trades=trades,
+            first_next=self.first_next if self.first_next is not None else n,
+        )
+
+    def get_analysis(self):
+        return self.result()
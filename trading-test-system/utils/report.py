@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+参数优化结果报告
+
+原来的绘图对每个指标、每对参数各做一次 pivot_table，用 seaborn 逐格标注数值，并为前三个参数画三维曲面，
+几万行的结果集上又慢又占内存。这里分成两步：
+
+1. OptimizationReport.aggregate：参数列一次编码为整数下标，每个指标用 np.bincount 算出
+   所有参数对的均值矩阵和每个参数的边际均值/最大值（结果集每个指标只遍历一遍）
+2. render / write：所有指标的热力图和边际曲线画在同一张图上、一次保存；
+   格子数超过 annotate_max 时不逐格标注，刻度抽稀；HTML 内嵌该图、参数范围和前若干名组合
+
+    report = OptimizationReport.aggregate(df)
+    png, html = report.write('.')
+"""
+import base64
+import html
+import itertools
+import os
+
+import numpy as np
+
+from utils.analytics import METRICS
+
+# 绘制的指标，以及越小越好（颜色反转）的指标
+PLOT_METRICS = ['夏普比率', '最大回撤 (%)', '总收益率 (%)']
+LOWER_IS_BETTER = {'最大回撤 (%)'}
+_FONTS = ['Microsoft YaHei', 'SimHei', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei', 'DejaVu Sans']
+
+
+def _group_stats(codes, size, values):
+    """按整数下标分组的均值与最大值（忽略 NaN；空组为 NaN）"""
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    counts = np.bincount(codes, minlength=size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(codes, weights=values, minlength=size) / counts
+    best = np.full(size, -np.inf)
+    np.maximum.at(best, codes, values)
+    best[counts == 0] = np.nan
+    return mean, best
+
+
+def _ticks(n, limit=15):
+    return np.unique(np.linspace(0, n - 1, min(n, limit)).round().astype(int))
+
+
+class OptimizationReport:
+    """聚合后的优化结果：参数取值、参数对均值矩阵、边际曲线与最优组合
+
+    Attributes:
+        params (list): 参数列名
+        values (dict): 参数 -> 排序后的取值
+        pivots (dict): (指标, x参数, y参数) -> 均值矩阵，行对应 y 的取值、列对应 x 的取值
+        marginals (dict): (指标, 参数) -> (均值, 最大值)
+        best (pd.DataFrame): 按夏普比率排序的前若干行
+        rows (int): 结果集行数
+    """
+
+    def __init__(self, params, values, pivots, marginals, best, rows, metrics):
+        self.params = params
+        self.values = values
+        self.pivots = pivots
+        self.marginals = marginals
+        self.best = best
+        self.rows = rows
+        self.metrics = metrics
+
+    @classmethod
+    def aggregate(cls, df, metrics=PLOT_METRICS, max_params=3, top=20):
+        """从优化结果 DataFrame 一次算出所有图表需要的数组
+
+        Args:
+            metrics (list): 绘制的指标（结果中不存在的跳过）
+            max_params (int): 参与热力图/边际曲线的参数个数上限（取前几个参数列）
+            top (int): 报告中列出的最优组合数
+        """
+        import pandas as pd
+
+        params = [c for c in df.columns if c not in METRICS]
+        metrics = [m for m in metrics if m in df.columns]
+        plotted = params[:max_params]
+        codes, values = {}, {}
+        for p in plotted:
+            codes[p], values[p] = pd.factorize(df[p], sort=True)
+            values[p] = np.asarray(values[p])
+
+        pivots, marginals = {}, {}
+        for metric in metrics:
+            y = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=np.float64)
+            for p in plotted:
+                marginals[metric, p] = _group_stats(codes[p], len(values[p]), y)
+            for x_col, y_col in itertools.combinations(plotted, 2):
+                nx, ny = len(values[x_col]), len(values[y_col])
+                mean, _ = _group_stats(codes[y_col] * nx + codes[x_col], nx * ny, y)
+                pivots[metric, x_col, y_col] = mean.reshape(ny, nx)
+
+        best = df
+        if '夏普比率' in df.columns:
+            best = df.assign(_key=pd.to_numeric(df['夏普比率'], errors='coerce')).nlargest(top, '_key')
+            best = best.drop(columns='_key')
+        return cls(params, values, pivots, marginals, best.head(top), len(df), metrics)
+
+    def render(self, path, annotate_max=400, dpi=100):
+        """把所有指标的热力图与边际曲线画在一张图上并保存为 PNG
+
+        每行一个指标：先是各参数对的热力图，再是每个参数的边际均值/最大值曲线
+        """
+        import matplotlib
+        from matplotlib.figure import Figure
+
+        plotted = list(self.values)
+        pairs = list(itertools.combinations(plotted, 2))
+        ncols = max(len(pairs) + len(plotted), 1)
+        nrows = max(len(self.metrics), 1)
+        with matplotlib.rc_context({'font.sans-serif': _FONTS, 'axes.unicode_minus': False}):
+            # 不经过 pyplot：无界面环境下也不创建窗口，图对象用完即释放
+            fig = Figure(figsize=(4.2 * ncols, 3.4 * nrows), dpi=dpi, layout='constrained')
+            axes = fig.subplots(nrows, ncols, squeeze=False)
+            for row, metric in enumerate(self.metrics):
+                cmap = 'RdYlGn_r' if metric in LOWER_IS_BETTER else 'RdYlGn'
+                for col, (x_col, y_col) in enumerate(pairs):
+                    self._heatmap(fig, axes[row, col], metric, x_col, y_col, cmap, annotate_max)
+                for col, p in enumerate(plotted, len(pairs)):
+                    self._marginal(axes[row, col], metric, p)
+            fig.suptitle(f"参数优化结果（{self.rows:,} 个组合）")
+            fig.savefig(path)
+        return path
+
+    def _heatmap(self, fig, ax, metric, x_col, y_col, cmap, annotate_max):
+        matrix = self.pivots[metric, x_col, y_col]
+        image = ax.imshow(matrix, cmap=cmap, aspect='auto', origin='lower', interpolation='nearest')
+        fig.colorbar(image, ax=ax)
+        xs, ys = self.values[x_col], self.values[y_col]
+        xt, yt = _ticks(len(xs)), _ticks(len(ys))
+        ax.set_xticks(xt, [str(v) for v in xs[xt]], rotation=45, fontsize=7)
+        ax.set_yticks(yt, [str(v) for v in ys[yt]], fontsize=7)
+        ax.set_xlabel(x_col)
+        ax.set_ylabel(y_col)
+        ax.set_title(metric, fontsize=9)
+        if matrix.size <= annotate_max:
+            for (i, j), v in np.ndenumerate(matrix):
+                if not np.isnan(v):
+                    ax.text(j, i, f"{v:.2f}", ha='center', va='center', fontsize=6)
+
+    def _marginal(self, ax, metric, p):
+        mean, best = self.marginals[metric, p]
+        xs = self.values[p]
+        numeric = np.issubdtype(xs.dtype, np.number)
+        pos = xs if numeric else np.arange(len(xs))
+        ax.plot(pos, mean, label='均值')
+        ax.plot(pos, best, linestyle='--', label='最大')
+        if not numeric:
+            ax.set_xticks(pos, [str(v) for v in xs], rotation=45, fontsize=7)
+        ax.set_xlabel(p)
+        ax.set_title(f"{metric}（边际）", fontsize=9)
+        ax.legend(fontsize=7)
+
+    def to_html(self, png_path=None):
+        """静态 HTML：参数范围、最优组合表，以及内嵌的 PNG"""
+        ranges = "".join(
+            f"<tr><td>{html.escape(str(p))}</td><td>{len(v)}</td>"
+            f"<td>{html.escape(str(v[0]))} ~ {html.escape(str(v[-1]))}</td></tr>"
+            for p, v in self.values.items())
+        image = ""
+        if png_path is not None:
+            with open(png_path, 'rb') as f:
+                image = f"<img src='data:image/png;base64,{base64.b64encode(f.read()).decode()}'>"
+        table = self.best.to_html(index=False, float_format=lambda v: f"{v:.4f}", border=0)
+        return f"""<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="utf-8"><title>参数优化报告</title>
+<style>body{{font-family:sans-serif;margin:24px}}table{{border-collapse:collapse;font-size:13px}}
+td,th{{padding:3px 8px;border-bottom:1px solid #ddd;text-align:right}}img{{max-width:100%}}</style></head>
+<body><h2>参数优化报告</h2><p>共 {self.rows:,} 个参数组合</p>
+<h3>参数范围</h3><table><tr><th>参数</th><th>取值个数</th><th>范围</th></tr>{ranges}</table>
+<h3>前 {len(self.best)} 名（按夏普比率）</h3>{table}
+<h3>热力图与边际曲线</h3>{image}
+</body></html>
+"""
+
+    def write(self, out_dir='.', name='优化报告', **render_kwargs):
+        """写出 {name}.png 与内嵌该图的 {name}.html，返回两个路径"""
+        os.makedirs(out_dir, exist_ok=True)
+        png = self.render(os.path.join(out_dir, f"{name}.png"), **render_kwargs)
+        path = os.path.join(out_dir, f"{name}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_html(png))
+        return png, path
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    import pandas as pd
+
+    print("***优化结果报告***")
+    rng = np.random.default_rng(0)
+    grid = pd.DataFrame([{'fast_period': f, 'slow_period': s, 'rsi_upper': r}
+                         for f in range(5, 15) for s in range(20, 40, 2) for r in (70, 75, 80)])
+    n = len(grid)
+    df = grid.assign(**{m: rng.normal(size=n) for m in METRICS})
+    df.loc[::7, '夏普比率'] = None
+
+    report = OptimizationReport.aggregate(df)
+    # 与 pandas pivot_table / groupby 的结果一致
+    for metric in report.metrics:
+        for (m, x_col, y_col), matrix in report.pivots.items():
+            if m == metric:
+                expected = df.pivot_table(values=metric, index=y_col, columns=x_col, aggfunc='mean')
+                assert np.allclose(matrix, expected.to_numpy(), equal_nan=True)
+        for p in report.values:
+            mean, best = report.marginals[metric, p]
+            grouped = df.groupby(p)[metric]
+            assert np.allclose(mean, grouped.mean()) and np.allclose(best, grouped.max())
+    with tempfile.TemporaryDirectory() as tmp:
+        png, path = report.write(tmp)
+        print(f"{n} 行 -> {len(report.pivots)} 张热力图，PNG {os.path.getsize(png) / 1024:.0f} KB，"
+              f"HTML {os.path.getsize(path) / 1024:.0f} KB")
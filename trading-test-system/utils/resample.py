@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+分钟/tick数据的流式导入与K线重采样
+
+按块读取CSV（pd.read_csv(chunksize=...)），每块用numpy向量化地聚合成K线，
+最后一根未完成的K线留到下一块继续合并，因此内存占用只与块大小和输出K线数有关，
+与原始文件大小无关。一次读取可同时生成多个周期，结果按 period 写入列式存储：
+
+    ingest('data/RB2505_tick.csv', 'RB2505', periods=('1m', '5m', '15m', '60m', 'daily'))
+    BackTester("RB", "RB2505", "5m", beginning, end)
+
+输入格式：
+    tick   datetime, price, volume[, openinterest][, amount]
+    K线    datetime, open, high, low, close, volume[, openinterest][, settle | amount]（时间为K线结束时间）
+    amount 为成交额；没有 amount 时由 settle × volume 还原，两者都没有时按 close × volume 估算
+
+输出约定：
+    分钟线  区间左闭右开 [t, t+周期)，时间标签为结束时间 t+周期（与常见行情软件一致）
+    日线    按自然日聚合（可用 day_shift 把夜盘归到下一交易日），时间标签为交易日当日0点
+    settle  本K线的成交量加权均价
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from backtrader import TimeFrame
+
+from utils.store import BarStore, COLUMNS, NS_PER_DAY, period_timeframe
+
+_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'openinterest', 'amount']
+
+
+def read_chunks(path, chunksize=1_000_000, dtformat=None, cumulative_volume=False):
+    """按块读取tick或K线CSV，统一成K线字段
+
+    Args:
+        dtformat (str, optional): datetime列格式，给定时解析更快
+        cumulative_volume (bool, optional): tick成交量为当日累计值时设为True，按差分还原
+
+    Yields:
+        (dict, bool): 列名 -> numpy数组（datetime为int64纳秒）；是否为K线输入
+    """
+    last_volume = None
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        ts = pd.to_datetime(chunk['datetime'], format=dtformat).to_numpy().astype('datetime64[ns]').astype(np.int64)
+        is_bar = 'close' in chunk
+        if is_bar:
+            cols = {col: chunk[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close')}
+        else:
+            price = chunk['price'].to_numpy(dtype=np.float64)
+            cols = {col: price for col in ('open', 'high', 'low', 'close')}
+
+        volume = chunk['volume'].to_numpy(dtype=np.float64) if 'volume' in chunk else np.zeros(len(ts))
+        if cumulative_volume:
+            prev = np.concatenate([[volume[0] if last_volume is None else last_volume], volume[:-1]])
+            last_volume = volume[-1]
+            volume = np.maximum(volume - prev, 0.0)  # 累计量归零（新交易日）时按0处理
+        cols['volume'] = volume
+        cols['openinterest'] = chunk['openinterest'].to_numpy(dtype=np.float64) \
+            if 'openinterest' in chunk else np.zeros(len(ts))
+        if 'amount' in chunk:
+            cols['amount'] = chunk['amount'].to_numpy(dtype=np.float64)
+        elif 'settle' in chunk:
+            cols['amount'] = chunk['settle'].to_numpy(dtype=np.float64) * volume
+        else:
+            cols['amount'] = cols['close'] * volume
+        cols['datetime'] = ts
+        yield cols, is_bar
+
+
+class BarResampler:
+    """流式K线重采样器
+
+    Args:
+        period (str): 目标周期，'1m'/'5m'/'15m'/'60m' 等分钟周期或 'daily'
+        day_shift (float, optional): 日线分组前把时间后移的小时数（如夜盘21点开盘可设为3）
+    """
+
+    def __init__(self, period, day_shift=0):
+        timeframe, compression = period_timeframe(period)
+        self.period = period
+        self.daily = timeframe >= TimeFrame.Days
+        if timeframe not in (TimeFrame.Minutes, TimeFrame.Days):
+            raise ValueError(f"不支持重采样到周期: {period}")
+        self.size = NS_PER_DAY if self.daily else compression * 60 * 10**9
+        self.shift = int(day_shift * 3600 * 10**9) if self.daily else 0
+        self._carry = None  # 上一块最后一根未完成的K线
+
+    def _keys(self, ts, is_bar):
+        # K线输入的时间为结束时间，减1纳秒后归入其所在区间
+        return (ts - (1 if is_bar else 0) + self.shift) // self.size
+
+    def update(self, cols, is_bar=False):
+        """输入一块数据（按时间升序），返回其中已完成的K线"""
+        keys = self._keys(cols['datetime'], is_bar)
+        fields = {f: cols[f] for f in _FIELDS}
+        if self._carry is not None:
+            carry_key, carry = self._carry
+            keys = np.concatenate([[carry_key], keys])
+            fields = {f: np.concatenate([[carry[f]], fields[f]]) for f in _FIELDS}
+
+        bars = self._aggregate(keys, fields)
+        if not len(bars['key']):
+            return bars
+        # 最后一根可能还有后续数据，留到下一块
+        self._carry = (bars['key'][-1], {f: bars[f][-1] for f in _FIELDS})
+        return {k: v[:-1] for k, v in bars.items()}
+
+    def flush(self):
+        """输入结束，返回最后一根K线"""
+        if self._carry is None:
+            return self._aggregate(np.empty(0, dtype=np.int64), {f: np.empty(0) for f in _FIELDS})
+        key, carry = self._carry
+        self._carry = None
+        return {'key': np.array([key]), **{f: np.array([carry[f]]) for f in _FIELDS}}
+
+    @staticmethod
+    def _aggregate(keys, fields):
+        if not len(keys):
+            return {'key': keys, **fields}
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        ends = np.concatenate([starts[1:], [len(keys)]]) - 1
+        return {
+            'key': keys[starts],
+            'open': fields['open'][starts],
+            'high': np.maximum.reduceat(fields['high'], starts),
+            'low': np.minimum.reduceat(fields['low'], starts),
+            'close': fields['close'][ends],
+            'volume': np.add.reduceat(fields['volume'], starts),
+            'openinterest': fields['openinterest'][ends],
+            'amount': np.add.reduceat(fields['amount'], starts),
+        }
+
+    def to_frame(self, parts):
+        """把 update/flush 的输出拼成与 BarStore.write 兼容的DataFrame"""
+        bars = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+        labels = bars['key'] * self.size if self.daily else (bars['key'] + 1) * self.size
+        volume = bars['volume']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            settle = np.where(volume > 0, bars['amount'] / volume, bars['close'])
+        df = pd.DataFrame({'datetime': labels.astype('datetime64[ns]')})
+        for col in COLUMNS:
+            df[col] = settle if col == 'settle' else bars[col]
+        return df
+
+
+def resample(cols, period, is_bar=False, day_shift=0):
+    """一次性重采样内存中的数据（read_chunks 单块的格式）"""
+    r = BarResampler(period, day_shift)
+    return r.to_frame([r.update(cols, is_bar), r.flush()])
+
+
+def ingest(path, symbol, periods=('1m', '5m', '15m', '60m', 'daily'), store=None,
+           chunksize=1_000_000, dtformat=None, cumulative_volume=False, day_shift=0):
+    """流式读取tick/分钟CSV，一次生成多个周期并写入列式存储
+
+    Returns:
+        dict: 输入行数、耗时、每秒处理行数以及各周期输出的K线数
+    """
+    store = store or BarStore()
+    resamplers = {p: BarResampler(p, day_shift) for p in periods}
+    parts = {p: [] for p in periods}
+    rows = 0
+    t0 = time.perf_counter()
+    for cols, is_bar in read_chunks(path, chunksize, dtformat, cumulative_volume):
+        rows += len(cols['datetime'])
+        for p, r in resamplers.items():
+            parts[p].append(r.update(cols, is_bar))
+
+    bars = {}
+    for p, r in resamplers.items():
+        parts[p].append(r.flush())
+        df = r.to_frame(parts[p])
+        store.write(symbol, p, df, source=path)
+        bars[p] = len(df)
+    elapsed = time.perf_counter() - t0
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed else 0.0,
+            'bars': bars}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2:
+        # 用法: python -m utils.resample data/RB2505_tick.csv RB2505 [1m 5m 15m 60m daily]
+        stats = ingest(sys.argv[1], sys.argv[2], periods=tuple(sys.argv[3:]) or
+                       ('1m', '5m', '15m', '60m', 'daily'))
+        print(stats)
+        sys.exit()
+
+    print("***重采样与pandas.resample一致性test***")
+    from benchmark.synthetic import generate_ticks
+
+    ticks = generate_ticks(200_000, seed=3)
+    cols = {
+        'datetime': ticks['datetime'].to_numpy().astype('datetime64[ns]').astype(np.int64),
+        **{c: ticks['price'].to_numpy() for c in ('open', 'high', 'low', 'close')},
+        'volume': ticks['volume'].to_numpy(dtype=np.float64),
+        'openinterest': ticks['openinterest'].to_numpy(dtype=np.float64),
+    }
+    cols['amount'] = cols['close'] * cols['volume']
+
+    frame = ticks.set_index('datetime')
+    for period, rule in (('1m', '1min'), ('5m', '5min'), ('60m', '60min'), ('daily', '1D')):
+        # 分块结果与一次性结果一致
+        r = BarResampler(period)
+        parts = [r.update({k: v[i:i + 7_777] for k, v in cols.items()}) for i in range(0, len(ticks), 7_777)]
+        chunked = r.to_frame(parts + [r.flush()])
+        whole = resample(cols, period)
+        assert chunked.equals(whole), period
+
+        # 与 pandas.resample 对照（分钟线右标签、日线左标签）
+        label = 'left' if period == 'daily' else 'right'
+        g = frame.resample(rule, closed='left', label=label)
+        expected = pd.DataFrame({
+            'open': g['price'].first(), 'high': g['price'].max(), 'low': g['price'].min(),
+            'close': g['price'].last(), 'volume': g['volume'].sum(),
+            'openinterest': g['openinterest'].last(),
+        }).dropna()
+        got = whole.set_index('datetime')[expected.columns]
+        assert np.allclose(got.to_numpy(), expected.to_numpy()) and (got.index == expected.index).all(), period
+        print(f"{period:>6}: {len(whole)} 根，与pandas.resample一致")
+
+    # 1分钟K线CSV（带 settle 列，或 amount 列）再合成为5分钟K线，应与直接由tick合成一致
+    import os
+    import tempfile
+
+    one = resample(cols, '1m')
+    expected = resample(cols, '5m')[COLUMNS].to_numpy()
+    with tempfile.TemporaryDirectory() as tmp:
+        for extra in ('settle', 'amount'):
+            path = os.path.join(tmp, f'1m_{extra}.csv')
+            csv = one[['datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest']]
+            csv = csv.assign(**{extra: one['settle'] if extra == 'settle' else one['settle'] * one['volume']})
+            csv.to_csv(path, index=False)
+            r = BarResampler('5m')
+            parts = [r.update(c, is_bar) for c, is_bar in read_chunks(path, chunksize=10_000)]
+            five = r.to_frame(parts + [r.flush()])
+            assert np.allclose(five[COLUMNS].to_numpy(), expected), extra
+    print("1m CSV（settle / amount 列）-> 5m 与 tick -> 5m 一致")
+
+    # day_shift=3：21点开盘的夜盘归入下一交易日，日线标签为该交易日0点
+    night = pd.to_datetime(['2025-01-06 21:00', '2025-01-07 09:00', '2025-01-07 21:30'])
+    ticks = {'datetime': night.to_numpy().astype('datetime64[ns]').astype(np.int64),
+             **{f: np.array([1.0, 2.0, 3.0]) for f in ('open', 'high', 'low', 'close', 'amount')},
+             'volume': np.ones(3), 'openinterest': np.zeros(3)}
+    days = resample(ticks, 'daily', day_shift=3)
+    assert list(days['datetime']) == list(pd.to_datetime(['2025-01-07', '2025-01-08'])), days['datetime']
+    assert list(days['volume']) == [2.0, 1.0]
+    print("day_shift=3：21点夜盘归入下一交易日的日线")
@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""
+参数优化结果库（SQLite，只追加）
+
+每个参数组合回测完成即写入一行，主键为 (策略名, 数据指纹, 参数)，
+中断后重新运行时跳过已有的组合；绘图与报告直接从库中读取。
+
+    data/store/results.sqlite
+        results(strategy, fingerprint, params, metrics, created)
+
+params/metrics 以JSON文本保存，params 按参数名排序以保证同一组合的键唯一。
+
+RunCache 是单次回测（BackTester.run）的结果缓存，键为内容地址：
+数据指纹（区间K线 + 资金/佣金/合约参数/成交模型）+ 策略源码 + 回测相关模块及其在仓库内（传递）导入的模块源码 + 策略参数，
+命中时直接返回保存的绩效指标与 RunRecord（权益曲线、成交、交易），总大小超限时按最近使用时间淘汰。
+
+    data/store/runs.sqlite
+        runs(key, strategy, fingerprint, params, analysis, record, value, elapsed, nbytes, created, used)
+"""
+import ast
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    strategy    TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    metrics     TEXT NOT NULL,
+    created     REAL NOT NULL,
+    PRIMARY KEY (strategy, fingerprint, params)
+)
+"""
+
+
+def _plain(value):
+    """numpy标量 -> Python标量，供json序列化"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+def param_key(params):
+    """参数字典的规范化JSON文本，用作主键的一部分"""
+    return json.dumps(sorted(params.items()), default=_plain, ensure_ascii=False)
+
+
+def data_fingerprint(bars, **context):
+    """回测输入的指纹：区间内K线数据 + 影响结果的其他设置（资金、佣金、合约参数等）"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(bars):
+        h.update(name.encode())
+        h.update(np.ascontiguousarray(bars[name]).tobytes())
+    h.update(json.dumps(context, sort_keys=True, default=_plain).encode())
+    return h.hexdigest()
+
+
+class ResultStore:
+    """只追加的优化结果库，首次使用时才创建文件
+
+    Args:
+        path (str, optional): SQLite文件路径. Defaults to 'data/store/results.sqlite'.
+    """
+
+    def __init__(self, path=os.path.join('data', 'store', 'results.sqlite')):
+        self.path = path
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def __getstate__(self):
+        # cerebro多进程优化时会连同回调一起pickle，连接不随之复制
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def append(self, strategy, fingerprint, records, param_names):
+        """写入一批记录并立即提交；已存在的键保持不变
+
+        Args:
+            records (list[dict]): 参数 + 指标的记录（与 _collect_performance 输出一致）
+            param_names (Iterable[str]): 记录中属于参数的列名
+        """
+        param_names = set(param_names)
+        now = time.time()
+        rows = []
+        for record in records:
+            params = {k: v for k, v in record.items() if k in param_names}
+            metrics = {k: v for k, v in record.items() if k not in param_names}
+            rows.append((strategy, fingerprint, param_key(params),
+                         json.dumps(metrics, default=_plain, ensure_ascii=False), now))
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def done_keys(self, strategy, fingerprint):
+        """已完成组合的 param_key 集合"""
+        cur = self.conn.execute(
+            "SELECT params FROM results WHERE strategy = ? AND fingerprint = ?",
+            (strategy, fingerprint))
+        return {row[0] for row in cur}
+
+    def records(self, strategy, fingerprint=None, keys=None):
+        """读取记录，keys 给定时只返回这些 param_key 对应的组合
+
+        Returns:
+            list[dict]: 参数 + 指标，按写入顺序
+        """
+        sql = "SELECT params, metrics FROM results WHERE strategy = ?"
+        args = [strategy]
+        if fingerprint is not None:
+            sql += " AND fingerprint = ?"
+            args.append(fingerprint)
+        out = []
+        for params, metrics in self.conn.execute(sql + " ORDER BY rowid", args):
+            if keys is not None and params not in keys:
+                continue
+            out.append({**dict(json.loads(params)), **json.loads(metrics)})
+        return out
+
+    def load(self, strategy, fingerprint=None, keys=None):
+        """以DataFrame形式读取记录"""
+        import pandas as pd
+        return pd.DataFrame(self.records(strategy, fingerprint, keys))
+
+    def delete(self, strategy, fingerprint=None):
+        """删除某策略（某数据指纹）下的全部记录"""
+        sql = "DELETE FROM results WHERE strategy = ?"
+        args = [strategy]
+        if fingerprint is not None:
+            sql += " AND fingerprint = ?"
+            args.append(fingerprint)
+        with self.conn:
+            return self.conn.execute(sql, args).rowcount
+
+
+# 影响单次回测结果的模块：源码变化后缓存自动失效
+CODE_MODULES = ('backtest_runner', 'utils.analytics', 'utils.recorder', 'utils.commission', 'utils.fills',
+                'utils.store')
+# 仓库根目录（trading-test-system），只追踪此目录下的模块
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RUN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key         TEXT PRIMARY KEY,
+    strategy    TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    analysis    TEXT NOT NULL,
+    record      BLOB NOT NULL,
+    value       REAL NOT NULL,
+    elapsed     REAL NOT NULL,
+    nbytes      INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    used        REAL NOT NULL
+)
+"""
+
+
+def _hash_source(h, obj):
+    """源文件内容；取不到源文件时（交互式定义的类）退回各方法的字节码"""
+    try:
+        with open(inspect.getsourcefile(obj), 'rb') as f:
+            h.update(f.read())
+    except (OSError, TypeError):
+        h.update(obj.__qualname__.encode())
+        for value in vars(obj).values():
+            code = getattr(value, '__code__', None)
+            if code is not None:
+                h.update(marshal.dumps(code))
+
+
+def _module_file(name):
+    """仓库内模块的源文件路径；第三方库与标准库返回 None"""
+    base = os.path.join(_ROOT, *name.split('.'))
+    for path in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _local_imports(path):
+    """源文件中（含函数内的延迟导入，不含 __main__ 自检）导入的仓库内模块的源文件"""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), path)
+    package = os.path.relpath(os.path.dirname(path), _ROOT).replace(os.sep, '.').strip('.')
+    # 模块末尾 if __name__ == "__main__" 自检中的导入不参与回测
+    body = [node for node in tree.body
+            if not (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+                    and getattr(node.test.left, 'id', None) == '__name__')]
+    names = []
+    for node in (n for top in body for n in ast.walk(top)):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            if node.level:
+                parts = package.split('.') if package else []
+                module = '.'.join(parts[:len(parts) - node.level + 1] + ([module] if module else []))
+            # from 包 import 子模块 时子模块本身也要追踪
+            names += [module] + [f"{module}.{alias.name}" if module else alias.name for alias in node.names]
+    return {f for f in map(_module_file, filter(None, names)) if f is not None}
+
+
+def _code_files(paths):
+    """paths 及其在仓库内传递导入的所有源文件"""
+    files, pending = set(), {os.path.abspath(p) for p in paths}
+    while pending:
+        path = pending.pop()
+        if path not in files:
+            files.add(path)
+            pending |= _local_imports(path)
+    return files
+
+
+def code_fingerprint(strategy):
+    """策略类（及其非 backtrader 基类）、CODE_MODULES 及它们在仓库内传递导入的所有模块的源码指纹
+
+    导入关系从源码静态解析，策略间接依赖的指标、缓存等模块改动后缓存同样失效
+    """
+    h = hashlib.blake2b(digest_size=16)
+    roots = [_module_file(name) for name in CODE_MODULES]
+    for cls in strategy.__mro__:
+        if cls.__module__.split('.')[0] not in ('backtrader', 'builtins'):
+            h.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+            try:
+                path = inspect.getsourcefile(cls)
+            except TypeError:
+                path = None
+            if path and os.path.isfile(path):
+                roots.append(path)
+            else:  # 交互式定义的类
+                _hash_source(h, cls)
+    for path in sorted(_code_files(roots)):
+        h.update(os.path.relpath(path, _ROOT).encode())
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class _CachedAnalyzer:
+    """缓存命中时代替分析器：get_analysis()/result() 返回保存的结果"""
+
+    def __init__(self, analysis):
+        self._analysis = analysis
+
+    def get_analysis(self):
+        return self._analysis
+
+    result = get_analysis
+
+
+class RunCache:
+    """单次回测结果缓存（SQLite），总大小超过 max_bytes 时按最近使用时间淘汰
+
+    Args:
+        path (str, optional): SQLite文件路径. Defaults to 'data/store/runs.sqlite'.
+        max_bytes (int, optional): 缓存的记录数组 + 指标的总字节数上限. Defaults to 256MB.
+    """
+
+    def __init__(self, path=os.path.join('data', 'store', 'runs.sqlite'), max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._code = {}  # 策略类 -> 源码指纹（同一进程内源码不会变化）
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved = 0.0  # 命中节省的回测秒数（原回测耗时 - 读取耗时）
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_RUN_SCHEMA)
+        return self._conn
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def key(self, fingerprint, strategy, params):
+        """缓存键：数据指纹 + 源码指纹 + 策略名 + 参数"""
+        if strategy not in self._code:
+            self._code[strategy] = code_fingerprint(strategy)
+        h = hashlib.blake2b(digest_size=16)
+        for part in (fingerprint, self._code[strategy], strategy.__name__, param_key(params)):
+            h.update(part.encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        """命中时返回 OptReturn 形式的结果（.analyzers.performance / .analyzers.recorder、.value、.elapsed），否则 None"""
+        import backtrader as bt
+        from backtrader.metabase import ItemCollection
+        from utils.recorder import RunRecord
+
+        t0 = time.perf_counter()
+        row = self.conn.execute("SELECT params, analysis, record, value, elapsed FROM runs WHERE key = ?",
+                                (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        params, analysis, record, value, elapsed = row
+        with self.conn:
+            self.conn.execute("UPDATE runs SET used = ? WHERE key = ?", (time.time(), key))
+        analyzers = ItemCollection()
+        analyzers.append(_CachedAnalyzer(json.loads(analysis)), name='performance')
+        analyzers.append(_CachedAnalyzer(RunRecord.loads(record)), name='recorder')
+        self.hits += 1
+        self.saved += max(elapsed - (time.perf_counter() - t0), 0.0)
+        return bt.OptReturn(dict(json.loads(params)), analyzers=analyzers, value=value, elapsed=elapsed)
+
+    def put(self, key, strategy, fingerprint, params, analysis, record, value, elapsed):
+        """写入一次回测的结果
+
+        Args:
+            analysis (dict): Performance 分析器的 get_analysis()
+            record (RunRecord): Recorder 的记录
+            value (float): 期末资金
+            elapsed (float): 回测耗时（秒），命中时据此统计节省的时间
+        """
+        text = json.dumps(analysis, default=_plain, ensure_ascii=False)
+        blob = record.dumps()
+        nbytes = len(text.encode()) + len(blob)
+        if nbytes > self.max_bytes:
+            return False
+        now = time.time()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (key, strategy.__name__, fingerprint, param_key(params), text, blob,
+                               float(value), elapsed, nbytes, now, now))
+        self._evict()
+        return True
+
+    def _evict(self):
+        total = self.nbytes
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, nbytes in self.conn.execute("SELECT key, nbytes FROM runs ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= nbytes
+        with self.conn:
+            self.conn.executemany("DELETE FROM runs WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def resize(self, max_bytes):
+        """调整大小上限，必要时立即淘汰"""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def invalidate(self, strategy=None, fingerprint=None):
+        """删除某策略名 / 某数据指纹下的缓存，都不给定时清空；返回删除的条数"""
+        sql, args = "DELETE FROM runs WHERE 1 = 1", []
+        if strategy is not None:
+            sql += " AND strategy = ?"
+            args.append(strategy if isinstance(strategy, str) else strategy.__name__)
+        if fingerprint is not None:
+            sql += " AND fingerprint = ?"
+            args.append(fingerprint)
+        with self.conn:
+            return self.conn.execute(sql, args).rowcount
+
+    @property
+    def nbytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM runs").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        entries, nbytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM runs").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'nbytes': nbytes,
+            'hit_rate': self.hits / total if total else 0.0,
+            'saved_s': self.saved,
+        }
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import tempfile
+
+    from strategy.dual_ma import DualMovingAverageStrategy
+    from utils.sample import SAMPLE_VALUE, sample_tester
+
+    print("***回测结果缓存***")
+    # 代码指纹覆盖策略间接导入的模块（指标、指标缓存、回测入口）
+    covered = _code_files([_module_file(name) for name in CODE_MODULES]
+                          + [inspect.getsourcefile(DualMovingAverageStrategy)])
+    assert {_module_file(m) for m in ('utils.indicators', 'utils.indicator_cache', 'backtest_runner')} <= covered
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RunCache(os.path.join(tmp, 'runs.sqlite'))
+
+        def run(**params):
+            tester = sample_tester(cache=cache)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tester.add_strategy(DualMovingAverageStrategy, **params)
+                result = tester.run(plot=False)[0]
+            return tester, result
+
+        first, strategy = run()
+        second, hit = run()
+        assert round(hit.value, 4) == SAMPLE_VALUE
+        assert np.array_equal(first.record.equity, second.record.equity)
+        assert np.array_equal(first.record.fills, second.record.fills)
+        assert hit.analyzers.performance.get_analysis() == strategy.analyzers.performance.get_analysis()
+        run(fast_period=5)  # 参数不同，未命中
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2 and cache.stats()['entries'] == 2
+
+        # 超出大小上限时淘汰最久未使用的（fast_period=5 之后 run() 又被使用过）
+        run()
+        cache.resize(cache.nbytes - 1)
+        assert cache.stats()['entries'] == 1 and run()[1].value == hit.value
+        assert cache.invalidate(DualMovingAverageStrategy) == 1 and cache.stats()['entries'] == 0
+        stats = cache.stats()
+        print(f"命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.1%}, "
+              f"淘汰 {stats['evictions']} 条, 节省 {stats['saved_s'] * 1e3:.1f}ms")
+        cache.close()
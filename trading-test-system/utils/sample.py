@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+自检、测试与基准共用的样例回测
+
+RB2505 日线 2024-05-01 ~ 2025-06-01。DualMovingAverageStrategy 默认参数在该区间的期末资金为 SAMPLE_VALUE、
+成交 SAMPLE_FILLS 笔，各模块 __main__ 自检与 tests/ 以此为一致性基准：
+
+    tester = run_sample(fill_model=FillModel('fixed', 2))
+    tester = sample_tester(cache=cache)
+"""
+import contextlib
+import io
+from datetime import datetime
+
+# BackTester 的前五个参数：品种名、合约、周期、开始、结束
+SAMPLE = ("RB", "RB2505", "daily", datetime(2024, 5, 1), datetime(2025, 6, 1))
+SAMPLE_VALUE = 19438.2537
+SAMPLE_FILLS = 19
+
+
+def sample_tester(**kwargs):
+    """样例区间的 BackTester（缺省无界面），构造时的输出被丢弃
+
+    Args:
+        **kwargs: BackTester 的其他参数，如 fill_model、profile、cache
+    """
+    from backtest_runner import BackTester
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return BackTester(*SAMPLE, **{'headless': True, **kwargs})
+
+
+def run_sample(strategy=None, params=None, **kwargs):
+    """在样例区间上回测策略并返回 tester，回测输出被丢弃
+
+    Args:
+        strategy: 策略类，缺省为 DualMovingAverageStrategy
+        params (dict, optional): 策略参数
+        **kwargs: 同 sample_tester
+    """
+    if strategy is None:
+        from strategy.dual_ma import DualMovingAverageStrategy as strategy
+
+    tester = sample_tester(**kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tester.add_strategy(strategy, **(params or {}))
+        tester.run(plot=False)
+    return tester
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+列式二进制K线存储
+
+每个 (symbol, period) 一个目录，每列一个 .npy 文件：
+
+    data/store/RB2505_daily/
+        meta.json
+        datetime.npy        int64，纳秒时间戳
+        open.npy ...        float64，open/high/low/close/volume/openinterest/settle
+
+读取时用 np.load(mmap_mode='r') 做内存映射，按时间戳列二分查找出回测区间，
+不再逐行解析CSV文本和 strptime。
+"""
+import array
+import json
+import os
+import shutil
+from datetime import timedelta
+from fractions import Fraction
+
+import backtrader as bt
+import numpy as np
+from backtrader import TimeFrame
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'openinterest', 'settle']
+
+# backtrader 日线数据的时间戳会被对齐到交易时段结束
+SESSION_END = timedelta(hours=23, minutes=59, seconds=59, microseconds=999990)
+
+NS_PER_DAY = 86400 * 10**9
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+
+def period_timeframe(period):
+    """把 BackTester 的 period 字符串映射为 backtrader 的 (timeframe, compression)
+
+    支持 daily / weekly / monthly 以及 1m、5m、60m 这类分钟周期
+    """
+    named = {
+        'daily': (TimeFrame.Days, 1),
+        'weekly': (TimeFrame.Weeks, 1),
+        'monthly': (TimeFrame.Months, 1),
+    }
+    if period in named:
+        return named[period]
+    if period.endswith('m') and period[:-1].isdigit():
+        return TimeFrame.Minutes, int(period[:-1])
+    raise ValueError(f"不支持的周期: {period}")
+
+
+def _tod_fraction(us):
+    """一天内的微秒数 -> date2num 的小数部分，复现 math.fsum 的正确舍入"""
+    hour, rem = divmod(us, 3600 * 10**6)
+    minute, rem = divmod(rem, 60 * 10**6)
+    second, micro = divmod(rem, 10**6)
+    terms = (hour / 24.0, minute / 1440.0, second / 86400.0, micro / 86400e6)
+    exact = sum(Fraction(t) for t in terms)
+    # 整数部分落在 [2**19, 2**20) 时最小精度为 2**-33
+    return float(Fraction(round(exact * 2**33), 2**33))
+
+
+def _ns(dt):
+    """datetime/字符串 -> int64纳秒时间戳（不依赖pandas，避免为一次区间查找加载它）"""
+    return int(np.datetime64(dt, 'ns').astype(np.int64))
+
+
+def date2num_array(ns):
+    """向量化的 backtrader date2num，对纳秒时间戳数组逐位复现其结果"""
+    days, rem = np.divmod(np.asarray(ns, dtype=np.int64), NS_PER_DAY)
+    ordinal = (days + _EPOCH_ORDINAL).astype(np.float64)
+    if len(ordinal) and (ordinal.min() < 2**19 or ordinal.max() >= 2**20 - 1):
+        import pandas as pd
+        dts = pd.to_datetime(ns).to_pydatetime()
+        return np.array([bt.date2num(dt) for dt in dts])
+    uniq, inv = np.unique(rem // 1000, return_inverse=True)
+    frac = np.array([_tod_fraction(int(u)) for u in uniq])
+    return ordinal + frac[inv.ravel()]
+
+
+class BarStore:
+    """按 (symbol, period) 组织的列式K线存储
+
+    Args:
+        root (str, optional): 存储根目录. Defaults to 'data/store'.
+    """
+
+    def __init__(self, root=os.path.join('data', 'store')):
+        self.root = root
+
+    def path(self, symbol, period):
+        return os.path.join(self.root, f"{symbol}_{period}")
+
+    def exists(self, symbol, period):
+        return os.path.exists(os.path.join(self.path(symbol, period), 'meta.json'))
+
+    def meta(self, symbol, period):
+        with open(os.path.join(self.path(symbol, period), 'meta.json'), 'r') as f:
+            return json.load(f)
+
+    def write(self, symbol, period, df, source=None, extra_columns=(), meta=None):
+        """写入（覆盖）一个品种周期的全部K线
+
+        Args:
+            df (pd.DataFrame): 含 datetime 列及 COLUMNS 中的部分列，缺失列按0填充
+                （与 GenericCSVData 的 nullvalue=0 一致）
+            source (str, optional): 源CSV路径，记录其修改时间用于判断是否过期
+            extra_columns (Iterable[str], optional): COLUMNS 之外需要一并保存的数值列
+            meta (dict, optional): 附加写入 meta.json 的信息
+        """
+        import pandas as pd
+        dt = pd.to_datetime(df['datetime'])
+        order = np.argsort(dt.to_numpy(), kind='stable')
+        cols = {'datetime': dt.to_numpy().astype('datetime64[ns]').astype(np.int64)[order]}
+        for col in COLUMNS:
+            if col in df:
+                values = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+                cols[col] = values.to_numpy(dtype=np.float64)[order]
+            else:
+                cols[col] = np.zeros(len(df))
+        for col in extra_columns:
+            cols[col] = pd.to_numeric(df[col]).to_numpy(dtype=np.float64)[order]
+
+        meta = {**(meta or {}), 'symbol': symbol, 'period': period, 'rows': int(len(df)),
+                'columns': ['datetime'] + COLUMNS + list(extra_columns)}
+        if source is not None:
+            meta['source'] = os.path.abspath(source)
+            meta['source_mtime'] = os.path.getmtime(source)
+
+        # 先写临时目录再整体替换，避免读到写了一半的文件
+        target = self.path(symbol, period)
+        tmp = target + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, values in cols.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        return target
+
+    def is_stale(self, symbol, period, source):
+        """源CSV比存储更新时返回True"""
+        if not self.exists(symbol, period):
+            return True
+        return self.meta(symbol, period).get('source_mtime', 0) < os.path.getmtime(source)
+
+    def bounds(self, ts, beginning=None, end=None, daily=False):
+        """在时间戳列上二分查找 [beginning, end] 对应的下标范围
+
+        日线按 backtrader 的方式把K线时间对齐到当日 SESSION_END 后再比较，
+        这里通过平移查找边界实现，而不是改写整列。
+        """
+        lo, hi = 0, len(ts)
+        if daily:
+            session_end = SESSION_END // timedelta(microseconds=1) * 1000
+            if beginning is not None:
+                start = -(-(_ns(beginning) - session_end) // NS_PER_DAY) * NS_PER_DAY  # 向上取整到日
+                lo = np.searchsorted(ts, start, side='left')
+            if end is not None:
+                stop = ((_ns(end) - session_end) // NS_PER_DAY + 1) * NS_PER_DAY
+                hi = np.searchsorted(ts, stop, side='left')
+        else:
+            if beginning is not None:
+                lo = np.searchsorted(ts, _ns(beginning), side='left')
+            if end is not None:
+                hi = np.searchsorted(ts, _ns(end), side='right')
+        return int(lo), int(max(lo, hi))
+
+    def load(self, symbol, period, beginning=None, end=None, columns=None):
+        """内存映射读取并切片
+
+        Returns:
+            dict: 列名 -> 只读numpy视图（datetime为int64纳秒时间戳）
+        """
+        base = self.path(symbol, period)
+        columns = columns or ['datetime'] + COLUMNS
+        ts = np.load(os.path.join(base, 'datetime.npy'), mmap_mode='r')
+        daily = period_timeframe(period)[0] >= TimeFrame.Days
+        lo, hi = self.bounds(ts, beginning, end, daily=daily)
+
+        bars = {}
+        for col in columns:
+            values = ts if col == 'datetime' else np.load(os.path.join(base, f"{col}.npy"), mmap_mode='r')
+            bars[col] = values[lo:hi]
+        return bars
+
+
+def convert_csv(csv_path, store=None, symbol=None, period=None):
+    """把现有CSV（data/下的行情文件或 AkshareCollector.save_to_csv 输出）转换为列式存储
+
+    symbol/period 缺省时从文件名 `{symbol}_{period}.csv` 推断
+    """
+    store = store or BarStore()
+    if symbol is None or period is None:
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        inferred_symbol, _, inferred_period = stem.rpartition('_')
+        symbol = symbol or inferred_symbol
+        period = period or inferred_period
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    return store.write(symbol, period, df, source=csv_path)
+
+
+def ensure_store(csv_path, symbol, period, store=None):
+    """存储不存在或比CSV旧时重新转换，返回 BarStore"""
+    store = store or BarStore()
+    if store.is_stale(symbol, period, csv_path):
+        convert_csv(csv_path, store, symbol, period)
+    return store
+
+
+def feed_datetimes(ns, timeframe):
+    """纳秒时间戳 -> backtrader 数据源中的 datetime 数值，日线对齐到交易时段结束"""
+    dtnum = date2num_array(ns)
+    if timeframe >= TimeFrame.Days:
+        # 与CSV数据源一致：日线时间对齐到交易时段结束
+        eos = date2num_array(
+            (np.asarray(ns) // NS_PER_DAY) * NS_PER_DAY
+            + int(SESSION_END.total_seconds() * 10**6) * 1000)
+        dtnum = np.maximum(dtnum, eos)
+    return dtnum
+
+
+class ColumnarData(bt.feed.DataBase):
+    """由numpy列数组驱动的数据源基类
+
+    子类在 start 中设置 self._dtnum（datetime数值）和 self._cols（列名 -> 数组）。
+    预加载（cerebro默认）时整段写入line缓冲区，不逐根调用 _load。
+    """
+    lines = ('settle',)
+
+    def _load(self):
+        if self._idx >= len(self._dtnum):
+            return False
+        i = self._idx
+        self.lines.datetime[0] = self._dtnum[i]
+        for col in COLUMNS:
+            getattr(self.lines, col)[0] = self._cols[col][i]
+        self._idx += 1
+        return True
+
+    def preload(self):
+        buffers = [getattr(self.lines, col).array for col in ['datetime'] + COLUMNS]
+        if self._filters or self._ffilters or \
+                not all(isinstance(b, array.array) and not len(b) for b in buffers):
+            return super(ColumnarData, self).preload()
+
+        sources = [self._dtnum] + [self._cols[col] for col in COLUMNS]
+        for buf, values in zip(buffers, sources):
+            buf.frombytes(np.ascontiguousarray(values[self._idx:], dtype=np.float64).tobytes())
+        self._idx = len(self._dtnum)
+        self._last()
+        self.home()
+
+
+class BarStoreData(ColumnarData):
+    """从 BarStore 内存映射读取K线的 backtrader 数据源
+
+    fromdate/todate 在 start 时通过二分查找切片。
+    """
+    params = (
+        ('symbol', None),
+        ('period', 'daily'),
+        ('store', None),
+    )
+
+    def start(self):
+        super(BarStoreData, self).start()
+        store = self.p.store or BarStore()
+        self._cols = store.load(self.p.symbol, self.p.period, self.p.fromdate, self.p.todate)
+        self._dtnum = feed_datetimes(self._cols['datetime'], self.p.timeframe)
+        self._idx = 0
+
+
+class ArrayData(ColumnarData):
+    """直接使用内存中数组的数据源（例如优化进程池中的共享内存视图）
+
+    Args:
+        dtnum: 已换算好的 datetime 数值（见 feed_datetimes）
+        columns (dict): COLUMNS 中各列的数组
+    """
+    params = (
+        ('dtnum', None),
+        ('columns', None),
+    )
+
+    def start(self):
+        super(ArrayData, self).start()
+        self._dtnum = self.p.dtnum
+        self._cols = self.p.columns
+        self._idx = 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    print("***列式存储转换***")
+    # 用法: python -m utils.store data/RB2505_daily.csv [更多CSV...]
+    for csv_path in sys.argv[1:] or [os.path.join('data', 'RB2505_daily.csv')]:
+        target = convert_csv(csv_path)
+        print(f"{csv_path} -> {target}")